@@ -0,0 +1,116 @@
+"""
+Check which replica set members serve each API route's MongoDB reads.
+
+Connects the API in-process to MONGO_URI (a replica set), issues catalog and
+auth requests and records, through PyMongo command monitoring, the server
+every command was sent to. Catalog routes should read from secondaries under
+CATALOG_READ_PREFERENCE; auth routes must stay on the primary. Exits 1 when
+a route is misrouted.
+
+Usage (from backend/, with a seeded catalog):
+  MONGO_URI="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0" \\
+    python benchmarks/check_read_routing.py
+
+A throwaway local replica set for this check:
+  for p in 27017 27018 27019; do mkdir -p /tmp/rs/$p; mongod --replSet rs0 --port $p --dbpath /tmp/rs/$p --fork --logpath /tmp/rs/$p.log; done
+  mongosh --port 27017 --eval 'rs.initiate({_id: "rs0", members: [0, 1, 2].map(i => ({_id: i, host: "localhost:" + (27017 + i)}))})'
+  python benchmarks/seed_catalog.py --products 100000 --drop
+"""
+import asyncio
+import json
+import os
+import sys
+from collections import Counter, defaultdict
+
+import httpx
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+READ_COMMANDS = {"find", "aggregate", "count", "distinct", "getMore"}
+
+CATALOG_REQUESTS = [
+    "/api/products/?limit=24",
+    "/api/products/?gender=women&sort_by=price&limit=24",
+    "/api/products/search?q=shirt",
+    "/api/products/categories/by-gender",
+    "/api/products/brands/list",
+    "/api/products/top-deals?limit=12",
+]
+# An unknown email still looks the user up, which is the read that must see fresh writes
+AUTH_REQUESTS = [
+    ("POST", "/api/auth/login", {"email": "read-routing-check@savekaro.pk", "password": "not-a-password"}),
+]
+
+
+class RoutingListener(monitoring.CommandListener):
+    """Collects the server address of every read command while a route is being exercised"""
+
+    def __init__(self):
+        self.route = None
+        self.reads = defaultdict(Counter)
+
+    def started(self, event):
+        if self.route and event.command_name in READ_COMMANDS:
+            self.reads[self.route][event.connection_id] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def run():
+    listener = RoutingListener()
+    monitoring.register(listener)
+
+    import database
+    from config import settings
+    from main import app
+
+    await database.connect_to_mongo()
+    try:
+        client = database.Database.client
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://check") as http:
+            # Let the driver discover the topology before attributing reads
+            await client.admin.command("ping")
+            for path in CATALOG_REQUESTS:
+                listener.route = ("catalog", path)
+                await http.get(path)
+            for method, path, body in AUTH_REQUESTS:
+                listener.route = ("auth", path)
+                await http.request(method, path, json=body)
+            listener.route = None
+
+        primary = client.primary
+        secondaries = client.secondaries
+        report = {
+            "read_preference": settings.CATALOG_READ_PREFERENCE,
+            "max_staleness_seconds": settings.CATALOG_MAX_STALENESS_SECONDS,
+            "primary": ":".join(map(str, primary)) if primary else None,
+            "secondaries": sorted(":".join(map(str, s)) for s in secondaries),
+            "routes": [],
+        }
+        misrouted = []
+        for (group, path), servers in listener.reads.items():
+            on_primary = sum(n for address, n in servers.items() if address == primary)
+            on_secondary = sum(servers.values()) - on_primary
+            report["routes"].append({"group": group, "path": path, "primary": on_primary, "secondary": on_secondary})
+            if group == "auth" and on_secondary:
+                misrouted.append(path)
+            # Under secondaryPreferred a primary read means every secondary lagged past max staleness
+            if group == "catalog" and secondaries and on_primary and \
+                    settings.CATALOG_READ_PREFERENCE in ("secondary", "secondaryPreferred"):
+                misrouted.append(path)
+        report["misrouted"] = misrouted
+        if not secondaries:
+            report["warning"] = "No secondaries discovered; is MONGO_URI a replica set?"
+        print(json.dumps(report, indent=2))
+        return 1 if misrouted else 0
+    finally:
+        await database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
@@ -0,0 +1,236 @@
+"""
+Fixed-concurrency load test for the catalog API.
+
+Drives a weighted mix of listing (filters, sorts, pages), search, product
+detail, categories-by-gender and favorites requests against a running API
+and reports RPS and p50/p95/p99 latency per route as JSON, so results can be
+diffed between commits.
+
+Usage (API running against a catalog seeded by seed_catalog.py):
+  python benchmarks/load_test.py --base-url http://localhost:8000 --concurrency 32 --duration 60 --output bench.json
+  python benchmarks/load_test.py --compare bench-main.json --output bench-branch.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+SORTS = ["discount_percent", "price", "-price"]
+PAGE_SIZES = [24, 50, 100]
+SEARCH_TERMS = ["shirt", "kurta", "lawn", "jeans", "sweater", "printed", "3 pc", "dress", "men", "black"]
+
+# Route template -> relative weight in the request mix
+MIX = {
+    "GET /api/products/": 55,
+    "GET /api/products/search": 10,
+    "GET /api/products/{product_id}": 20,
+    "GET /api/products/categories/by-gender": 5,
+    "GET /api/auth/favorites": 10,
+}
+
+
+class Workload:
+    """Builds realistic requests from the catalog the API is serving"""
+
+    def __init__(self, rng: random.Random, brands, categories, product_ids, token):
+        self.rng = rng
+        self.brands = brands
+        self.categories = categories
+        self.product_ids = product_ids
+        self.token = token
+        self.routes = list(MIX)
+        self.weights = [MIX[r] for r in self.routes]
+
+    def listing_params(self):
+        rng = self.rng
+        params = {"sort_by": rng.choice(SORTS), "limit": rng.choice(PAGE_SIZES)}
+        # Most visitors look at the first pages; a few go deep
+        params["skip"] = params["limit"] * min(int(rng.expovariate(0.7)), 40)
+        if rng.random() < 0.5:
+            params["gender"] = rng.choice(["men", "women"])
+        if rng.random() < 0.4 and self.categories:
+            params["category"] = rng.choice(self.categories)
+        if rng.random() < 0.3 and self.brands:
+            params["brand"] = rng.choice(self.brands)
+        if rng.random() < 0.2:
+            params["min_discount"] = rng.choice([20, 30, 40, 50])
+        if rng.random() < 0.15:
+            params["size"] = rng.choice(["S", "M", "L", "XL"])
+        if rng.random() < 0.15:
+            low = rng.choice([500, 1000, 2000])
+            params["min_price"] = low
+            params["max_price"] = low * rng.choice([2, 3, 5])
+        return params
+
+    def next_request(self):
+        route = self.rng.choices(self.routes, self.weights)[0]
+        headers = {}
+        if route == "GET /api/products/":
+            return route, "/api/products/", self.listing_params(), headers
+        if route == "GET /api/products/search":
+            return route, "/api/products/search", {"q": self.rng.choice(SEARCH_TERMS), "limit": 20}, headers
+        if route == "GET /api/products/{product_id}":
+            return route, f"/api/products/{self.rng.choice(self.product_ids)}", {}, headers
+        if route == "GET /api/products/categories/by-gender":
+            return route, "/api/products/categories/by-gender", {}, headers
+        headers["Authorization"] = f"Bearer {self.token}"
+        return route, "/api/auth/favorites", {}, headers
+
+
+async def prepare(client: httpx.AsyncClient, rng: random.Random, favorites: int) -> Workload:
+    """Discover filter values and product ids, and create a user with favorites"""
+    brands = (await client.get("/api/products/brands/list")).json()
+    categories = (await client.get("/api/products/categories/list")).json()
+
+    product_ids = []
+    for skip in range(0, 1000, 100):
+        page = (await client.get("/api/products/", params={"limit": 100, "skip": skip})).json()
+        product_ids.extend(p["_id"] for p in page.get("products", []))
+    if not product_ids:
+        raise SystemExit("The API returned no products; seed the catalog first (seed_catalog.py)")
+
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    resp = await client.post("/api/auth/register", json={"email": email, "password": "bench-password", "name": "Bench"})
+    resp.raise_for_status()
+    token = resp.json()["access_token"]
+    for pid in rng.sample(product_ids, min(favorites, len(product_ids))):
+        await client.post("/api/auth/favorites/add", json={"product_id": pid},
+                          headers={"Authorization": f"Bearer {token}"})
+
+    return Workload(rng, brands, categories, product_ids, token)
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        workload = await prepare(client, rng, args.favorites)
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        recording = False
+
+        async def worker():
+            while True:
+                route, path, params, headers = workload.next_request()
+                started = time.perf_counter()
+                try:
+                    resp = await client.get(path, params=params, headers=headers)
+                    ok = resp.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                elapsed = time.perf_counter() - started
+                if recording:
+                    latencies[route].append(elapsed)
+                    if not ok:
+                        errors[route] += 1
+
+        workers = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+        await asyncio.sleep(args.warmup)
+        recording = True
+        measured_from = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        recording = False
+        measured = time.perf_counter() - measured_from
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    return summarize(args, latencies, errors, measured)
+
+
+def pct(ordered, p):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+
+
+def summarize(args, latencies, errors, measured):
+    routes = {}
+    for route in MIX:
+        ordered = sorted(latencies.get(route, []))
+        routes[route] = {
+            "requests": len(ordered),
+            "errors": errors.get(route, 0),
+            "rps": round(len(ordered) / measured, 2),
+            "p50_ms": pct(ordered, 0.50),
+            "p95_ms": pct(ordered, 0.95),
+            "p99_ms": pct(ordered, 0.99),
+            "max_ms": pct(ordered, 1.0),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else None,
+        }
+    everything = sorted(x for samples in latencies.values() for x in samples)
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration_sec": args.duration,
+            "warmup_sec": args.warmup,
+            "seed": args.seed,
+        },
+        "total": {
+            "requests": len(everything),
+            "errors": sum(errors.values()),
+            "rps": round(len(everything) / measured, 2),
+            "p50_ms": pct(everything, 0.50),
+            "p95_ms": pct(everything, 0.95),
+            "p99_ms": pct(everything, 0.99),
+        },
+        "routes": routes,
+    }
+
+
+def print_comparison(baseline: dict, current: dict):
+    print(f"{'route':45} {'rps':>18} {'p50 ms':>18} {'p99 ms':>18}")
+    rows = [("TOTAL", baseline["total"], current["total"])]
+    rows += [(r, baseline["routes"].get(r, {}), current["routes"][r]) for r in current["routes"]]
+    for name, old, new in rows:
+        cells = []
+        for key in ("rps", "p50_ms", "p99_ms"):
+            a, b = old.get(key), new.get(key)
+            change = f"{(b - a) / a * 100:+.1f}%" if a and b is not None else "n/a"
+            cells.append(f"{b} ({change})")
+        print(f"{name:45} {cells[0]:>18} {cells[1]:>18} {cells[2]:>18}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog API load test")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before recording")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--favorites", type=int, default=25, help="Favorites added to the benchmark user")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write results JSON to this file (default: stdout)")
+    parser.add_argument("--compare", help="Baseline results JSON to print deltas against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
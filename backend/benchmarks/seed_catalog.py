@@ -0,0 +1,130 @@
+"""
+Seed a benchmark MongoDB database from the bundled scraper fixtures.
+
+The records in scraper/outfitters.json, bonanza.json and limelight.json are
+copied with synthetic variations (url, title, price, discount, sizes) until
+the target size is reached, then indexed like MongoPipeline does.
+
+Usage (from backend/):
+  python benchmarks/seed_catalog.py --products 100000 --drop
+  python benchmarks/seed_catalog.py --products 1000000 --db savekaro_bench --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import BulkWriteError
+
+FIXTURES = ["outfitters.json", "bonanza.json", "limelight.json"]
+SCRAPER_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "scraper")
+SIZES = ["XS", "S", "M", "L", "XL", "XXL"]
+
+
+def load_fixtures():
+    records = []
+    for name in FIXTURES:
+        with open(os.path.join(SCRAPER_DIR, name), "r", encoding="utf-8") as f:
+            records.extend(json.load(f))
+    return records
+
+
+def synthesize(base: dict, copy: int, rng: random.Random) -> dict:
+    """Return a variation of a fixture record; copy 0 keeps prices unchanged"""
+    doc = dict(base)
+    doc.pop("_id", None)
+    if copy:
+        doc["url"] = f"{base['url']}?bench={copy}"
+        doc["title"] = f"{base['title']} #{copy}"
+        original = round(base["original_price"] * rng.uniform(0.8, 1.25))
+        discount = max(5, min(80, base["discount_percent"] + rng.randint(-15, 15)))
+        doc["original_price"] = float(original)
+        doc["price"] = float(round(original * (100 - discount) / 100))
+        doc["discount_percent"] = discount
+    doc["scraped_at"] = datetime.datetime.utcnow() - datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 14))
+    # Same shape as the scraper's slimmed variants and available_sizes
+    doc["variants"] = [
+        {"size": size, "in_stock": rng.random() > 0.3, "inventory_quantity": rng.randint(1, 20)}
+        for size in sorted(rng.sample(SIZES, rng.randint(1, len(SIZES))), key=SIZES.index)
+    ]
+    doc["available_sizes"] = [v["size"] for v in doc["variants"] if v["in_stock"]]
+    return doc
+
+
+def create_indexes(col):
+    # Same indexes as scraper/pk_deals/pipelines.py MongoPipeline.open_spider
+    col.create_index([("brand", ASCENDING)])
+    col.create_index([("discount_percent", ASCENDING)])
+    col.create_index([("gender", ASCENDING), ("category", ASCENDING)])
+    col.create_index([("source", ASCENDING)])
+    col.create_index([("available_sizes", ASCENDING), ("discount_percent", ASCENDING)])
+    col.create_index([("brand", ASCENDING), ("crawl_generation", ASCENDING)])
+    col.create_index([("favorite_count", DESCENDING)], name="favorite_count",
+                     partialFilterExpression={"favorite_count": {"$gt": 0}})
+    col.create_index(
+        [("url", ASCENDING)],
+        name="url_unique_string_only",
+        unique=True,
+        partialFilterExpression={"url": {"$type": "string"}}
+    )
+
+
+def insert_batch(col, batch) -> int:
+    """Insert a batch, skipping urls that already exist (re-runs without --drop)"""
+    try:
+        return len(col.insert_many(batch, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        return e.details.get("nInserted", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a benchmark catalog from scraper fixtures")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="savekaro_bench", help="Target database (never point this at production)")
+    parser.add_argument("--collection", default="products")
+    parser.add_argument("--products", type=int, default=100_000, help="Total number of products to insert")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42, help="Random seed, for repeatable catalogs")
+    parser.add_argument("--drop", action="store_true", help="Drop the collection first")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    fixtures = load_fixtures()
+    client = MongoClient(args.mongo_uri)
+    col = client[args.db][args.collection]
+
+    if args.drop:
+        col.drop()
+    create_indexes(col)
+
+    started = time.perf_counter()
+    generated = 0
+    inserted = 0
+    batch = []
+    copy = 0
+    while generated < args.products:
+        for base in fixtures:
+            if generated >= args.products:
+                break
+            batch.append(synthesize(base, copy, rng))
+            generated += 1
+            if len(batch) >= args.batch_size:
+                inserted += insert_batch(col, batch)
+                batch = []
+                sys.stdout.write(f"\rInserted {inserted:,}/{args.products:,}")
+                sys.stdout.flush()
+        copy += 1
+    if batch:
+        inserted += insert_batch(col, batch)
+
+    elapsed = time.perf_counter() - started
+    print(f"\rInserted {inserted:,} products into {args.db}.{args.collection} in {elapsed:.1f}s")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
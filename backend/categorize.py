@@ -0,0 +1,33 @@
+import re
+from typing import Optional
+
+# Mirrors the category vocabulary of scraper/pk_deals/utils/categorize.py, so
+# ?category= is an equality match on the stored codes
+TYPE_KEYWORDS = {
+    "sweater": ["sweater", "sweat", "cardigan", "pullover"],
+    "hoodie": ["hoodie", "hooded"],
+    "jacket": ["jacket", "puffer", "bomber", "coat"],
+    "t-shirt": ["t-shirt", "tee", "tshirt"],
+    "shirt": ["shirt", "button down"],
+    "kurta": ["kurta", "kurti", "kameez"],
+    "shalwar": ["shalwar", "trouser", "pants"],
+    "jeans": ["jeans", "denim"],
+    "sweatshirt": ["sweatshirt"],
+    "tracksuit": ["tracksuit", "track suit"],
+    "dress": ["dress", "maxi", "frock"],
+    "suit": ["suit", "2 piece", "3 piece", "unstitched", "stitched"],
+}
+CATEGORIES = tuple(TYPE_KEYWORDS) + ("pants", "other")
+
+def normalize_category(value: Optional[str]) -> str:
+    """Stored category code for user input like "Kurti", "Sweaters" or "t-shirt"; unmatched is "other\""""
+    text = re.sub(r"\s+", " ", value or "").strip().lower()
+    if text in CATEGORIES:
+        return text
+    for category, keys in TYPE_KEYWORDS.items():
+        if any(k in text for k in keys):
+            return category
+    # The one fallback of the scraper's detect_type the keywords above do not already catch
+    if "pant" in text:
+        return "pants"
+    return "other"
@@ -0,0 +1,80 @@
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+from fastapi import HTTPException
+
+from config import settings
+from metrics import coalesce_inflight, coalesced_calls, record_cache_lookup
+
+
+def query_key(op: str, *parts) -> str:
+    """Normalized key for a Mongo call: operation plus its arguments with dict keys sorted"""
+    return op + ":" + json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Share one in-flight coroutine between concurrent callers with the same key.
+
+    The first caller (the leader) starts the call as a task; callers arriving
+    while it runs await the same task instead of issuing their own. The result,
+    or the exception, is handed to every waiter and the key is forgotten as soon
+    as the call finishes, so nothing is cached beyond the call itself.
+
+    Each waiter gives up after ``timeout`` seconds with a 504. A call that
+    every waiter has abandoned is cancelled and its key dropped, so a stuck
+    query cannot hold on to all later requests for the same page.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, _Flight] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], op: str = "", timeout: float = None) -> Any:
+        if not settings.COALESCE_ENABLED:
+            return await fn()
+        if timeout is None:
+            timeout = settings.COALESCE_TIMEOUT_SECONDS
+
+        flight = self._flights.get(key)
+        # Joining a call already in flight is the hit: the request costs no Mongo round trip
+        record_cache_lookup(f"coalesce_{self.name}", flight is not None)
+        if flight is None:
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda _task: self._forget(key, flight))
+            coalesce_inflight.inc((self.name,))
+            coalesced_calls.inc((self.name, op, "leader"))
+        else:
+            coalesced_calls.inc((self.name, op, "coalesced"))
+
+        flight.waiters += 1
+        try:
+            # shield: a waiter timing out or disconnecting must not cancel the shared call
+            return await asyncio.wait_for(asyncio.shield(flight.task), timeout)
+        except asyncio.TimeoutError:
+            coalesced_calls.inc((self.name, op, "timeout"))
+            raise HTTPException(status_code=504, detail="Catalog query timed out")
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+            coalesce_inflight.dec((self.name,))
+        if flight.task.done() and not flight.task.cancelled():
+            # Mark the exception retrieved; the waiters have already re-raised it
+            flight.task.exception()
+
+
+catalog_flights = SingleFlight("catalog")
@@ -7,10 +7,84 @@ class Settings(BaseSettings):
     MONGO_URI: str = "mongodb://localhost:27017"
     DB_NAME: str = "fwd_project"
     COLLECTION_NAME: str = "products"
+
+    # MongoDB Connection Pool (per worker process)
+    MONGO_MAX_POOL_SIZE: int = 100  # Max connections per worker
+    MONGO_MIN_POOL_SIZE: int = 0  # Connections kept warm per worker
+    MONGO_MAX_IDLE_TIME_MS: int = 60000  # Close pooled connections idle longer than this
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 2000  # Fail a request instead of queueing forever on an exhausted pool
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_CONNECT_TIMEOUT_MS: int = 5000
+    MONGO_SOCKET_TIMEOUT_MS: int = 20000
+    MONGO_COMPRESSORS: str = ""  # Wire compression, e.g. "zstd,snappy,zlib" (empty = off)
+    MONGO_ZLIB_COMPRESSION_LEVEL: int = 6
+    MONGO_APP_NAME: str = "savekaro-api"
+
+    # Read Routing
+    CATALOG_READ_PREFERENCE: str = "secondaryPreferred"  # Catalog routes (/api/products); auth always reads the primary
+    CATALOG_MAX_STALENESS_SECONDS: int = 90  # Skip secondaries lagging more than this (-1 = no bound, else >= 90)
+
+    # Catalog Export
+    EXPORT_BATCH_SIZE: int = 1000  # Documents fetched per cursor batch by /api/products/export
+
+    # Top Deals
+    TOP_DEALS_COLLECTION: str = "top_deals"  # Ranked lists written by the scraper (pk_deals.ranking)
+
+    # Deal Event Stream
+    DEAL_EVENTS_COLLECTION: str = "deal_events"  # Capped collection the scraper appends deal events to
+    DEAL_STREAM_QUEUE_SIZE: int = 100  # Events buffered per SSE connection before it starts dropping
+    DEAL_STREAM_KEEPALIVE_SECONDS: float = 15  # Comment frame interval so proxies keep idle streams open
+    DEAL_STREAM_RETRY_SECONDS: float = 2  # Backoff when the change stream / tailable cursor ends
+    DEAL_STREAM_REPLAY_LIMIT: int = 100  # Events replayed after a reconnect with Last-Event-ID
+
+    # Request Coalescing
+    COALESCE_ENABLED: bool = True  # Identical concurrent catalog queries share one Mongo call
+    COALESCE_TIMEOUT_SECONDS: float = 10  # Longest a request waits on a shared call before a 504
+
+    # Catalog Snapshot (requires numpy)
+    SNAPSHOT_ENABLED: bool = False  # Serve listings from an in-memory columnar copy of the catalog, MongoDB as fallback
+    SNAPSHOT_POLL_SECONDS: float = 60  # How often each worker checks for a finished crawl to reload
+    SNAPSHOT_SETTLE_SECONDS: float = 300  # Reload once no crawl has finished for this long
+    SNAPSHOT_MAX_RELOAD_DELAY_SECONDS: float = 1800  # ...but no later than this after the first unloaded crawl
+    SNAPSHOT_CARD_CACHE_SIZE: int = 20000  # Decoded listing documents kept per worker
+    CRAWL_RUNS_COLLECTION: str = "crawl_runs"  # Crawl summaries written by the scraper at spider close
+    CRAWL_REFRESHES_COLLECTION: str = "crawl_refreshes"  # Coordinated refreshes (pk_deals.coordinator)
+
+    # Favorites
+    FAVORITES_COLLECTION: str = "favorites"  # One document per (user, saved product)
+    FAVORITES_PAGE_SIZE: int = 100  # Default page size of /api/auth/favorites
+
+    # Readiness Check
+    READINESS_TIMEOUT_MS: int = 1000  # Deadline for the Mongo ping
+    READINESS_MAX_CHECKOUT_WAIT_MS: float = 500  # Report not ready when p95 pool wait exceeds this
+
+    # Metrics
+    METRICS_SHARED_DIR: str = ""  # Directory where workers publish metrics so /metrics covers all of them
+    METRICS_FLUSH_INTERVAL: float = 5  # Seconds between per-worker metric snapshots
+
+    # Slow Query Log
+    SLOW_QUERY_THRESHOLD_MS: float = 200  # Log Mongo commands slower than this
+    SLOW_QUERY_EXPLAIN_SAMPLES: int = 3  # Capture explain("executionStats") for the first N hits of each shape
+    SLOW_QUERY_FLUSH_INTERVAL: float = 30  # Seconds between flushes to the slow_query_shapes collection
+
+    # Admin
+    ADMIN_TOKEN: str = ""  # Required in the X-Admin-Token header for /api/admin (empty = admin API disabled)
+
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:5173"]
     SECRET_KEY: str = secrets.token_hex(32)  # Generate a random key if not provided
+
+    # Server Settings
+    ENVIRONMENT: str = "development"  # "production" runs multiple workers without the reloader
+    WORKERS: int = 0  # Production worker processes (0 = one per CPU core)
+    SERVER_LOOP: str = "uvloop"  # Event loop implementation in production (uvloop/asyncio/auto)
+    SERVER_HTTP: str = "httptools"  # HTTP parser in production (httptools/h11/auto)
+    KEEP_ALIVE_TIMEOUT: int = 75  # Seconds to hold idle keep-alive connections (keep above the proxy's)
+    GRACEFUL_SHUTDOWN_TIMEOUT: int = 30  # Seconds to drain in-flight requests on SIGTERM
+    SERVER_BACKLOG: int = 2048  # Pending connections the socket queues per worker
+    LIMIT_CONCURRENCY: int = 0  # Max concurrent connections per worker before 503 (0 = unlimited)
+    FORWARDED_ALLOW_IPS: str = "*"  # Proxies trusted for X-Forwarded-* headers
     
     # Email Settings
     SMTP_HOST: str = "smtp.gmail.com"
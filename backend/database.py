@@ -1,9 +1,27 @@
+import asyncio
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
 from config import settings
+from monitoring import pool_monitor
+from metrics import mongo_command_metrics
+from slow_queries import slow_query_recorder
+from deal_stream import deal_hub
+from snapshot import catalog_snapshot
+from favorites import ensure_favorite_indexes
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
 
 class Database:
     client: AsyncIOMotorClient = None
     db = None
+    catalog_db = None  # same database, reading with CATALOG_READ_PREFERENCE
 
 async def get_database():
     """Get the database instance"""
@@ -11,22 +29,110 @@ async def get_database():
         raise RuntimeError("Database not connected. Call connect_to_mongo() first.")
     return Database.db
 
+async def get_catalog_database():
+    """The database for catalog reads, which may be served by a secondary"""
+    if Database.catalog_db is None:
+        raise RuntimeError("Database not connected. Call connect_to_mongo() first.")
+    return Database.catalog_db
+
 async def get_collection():
-    db = await get_database()
+    """The products collection for catalog reads (see get_catalog_database)"""
+    db = await get_catalog_database()
     return db[settings.COLLECTION_NAME]
 
+def catalog_read_preference():
+    """Read preference for catalog routes, from CATALOG_READ_PREFERENCE / CATALOG_MAX_STALENESS_SECONDS"""
+    mode = READ_PREFERENCES.get(settings.CATALOG_READ_PREFERENCE)
+    if mode is None:
+        raise ValueError(
+            f"CATALOG_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCES)}, "
+            f"not {settings.CATALOG_READ_PREFERENCE!r}"
+        )
+    if mode is Primary:
+        return Primary()
+    return mode(max_staleness=settings.CATALOG_MAX_STALENESS_SECONDS)
+
 async def connect_to_mongo():
     """Connect to MongoDB on startup"""
-    Database.client = AsyncIOMotorClient(settings.MONGO_URI)
+    options = dict(
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+        appname=settings.MONGO_APP_NAME,
+        event_listeners=[pool_monitor, mongo_command_metrics, slow_query_recorder],
+    )
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = settings.MONGO_COMPRESSORS
+        options["zlibCompressionLevel"] = settings.MONGO_ZLIB_COMPRESSION_LEVEL
+    Database.client = AsyncIOMotorClient(settings.MONGO_URI, **options)
     Database.db = Database.client[settings.DB_NAME]
+    # Writes, auth and the deal stream stay on the primary; on a standalone server
+    # or a replica set without secondaries every read lands on the primary anyway
+    Database.catalog_db = Database.db.with_options(read_preference=catalog_read_preference())
+    try:
+        await ensure_favorite_indexes(Database.db)
+    except Exception as e:
+        print(f"Could not create favorites indexes: {e}")
+    slow_query_recorder.start(Database.db)
+    deal_hub.start(Database.db)
+    catalog_snapshot.start(Database.catalog_db)
     print(f"Connected to MongoDB: {settings.DB_NAME}")
 
 async def close_mongo_connection():
     """Close MongoDB connection on shutdown"""
     if Database.client:
+        await deal_hub.stop()
+        await catalog_snapshot.stop()
+        try:
+            await slow_query_recorder.stop(Database.db)
+        except Exception as e:
+            print(f"Failed to flush slow query log: {e}")
         Database.client.close()
     print("Closed MongoDB connection")
 
+async def check_mongo_ready() -> dict:
+    """Ping MongoDB within the readiness deadline and report pool pressure"""
+    pool = pool_monitor.snapshot()
+    result = {"ready": False, "mongo": "down", "ping_ms": None, "pool": pool}
+
+    if Database.client is None:
+        result["error"] = "Database not connected"
+        return result
+
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(
+            Database.client.admin.command("ping"),
+            timeout=settings.READINESS_TIMEOUT_MS / 1000
+        )
+    except asyncio.TimeoutError:
+        result["error"] = f"Ping exceeded {settings.READINESS_TIMEOUT_MS}ms"
+        return result
+    except Exception as e:
+        result["error"] = str(e)
+        return result
+
+    result["mongo"] = "up"
+    result["ping_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+    # MONGO_MAX_POOL_SIZE is per server, so a replica set is saturated only when one of its pools is
+    saturated = any(
+        p["in_use_connections"] >= settings.MONGO_MAX_POOL_SIZE and p["waiting_for_connection"] > 0
+        for p in pool["pools"]
+    )
+    slow_checkout = pool["checkout_wait_ms"]["p95"] > settings.READINESS_MAX_CHECKOUT_WAIT_MS
+    if saturated:
+        result["error"] = "Connection pool exhausted"
+    elif slow_checkout:
+        result["error"] = "Connection pool checkout wait too high"
+    else:
+        result["ready"] = True
+    return result
+
 # For convenience, create a global db reference
 db = None
 
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import OperationFailure, PyMongoError
+
+from categorize import normalize_category
+from config import settings
+from metrics import Counter, Gauge
+
+logger = logging.getLogger("savekaro.deal_stream")
+
+DEAL_EVENT_FIELDS = (
+    "type", "product_id", "title", "brand", "category", "gender", "price", "original_price",
+    "discount_percent", "previous_discount", "image_url", "url", "at",
+)
+
+deal_stream_subscribers = Gauge(
+    "deal_stream_subscribers",
+    "Open /api/products/stream connections",
+)
+deal_stream_events = Counter(
+    "deal_stream_events_total",
+    "Deal events fanned out to subscribers by result (delivered/dropped)",
+    ("result",),
+)
+
+
+def _encode(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def format_event(doc: dict) -> bytes:
+    """Render a deal_events document as one SSE frame"""
+    data = {f: doc.get(f) for f in DEAL_EVENT_FIELDS}
+    payload = json.dumps(data, default=_encode, separators=(",", ":"))
+    return f"id: {doc['_id']}\nevent: {doc.get('type', 'deal')}\ndata: {payload}\n\n".encode("utf-8")
+
+
+class Subscription:
+    """One SSE connection: its filters and a bounded queue of encoded frames"""
+
+    __slots__ = ("brand", "category", "gender", "queue", "dropped")
+
+    def __init__(self, brand: Optional[str], category: Optional[str], gender: Optional[str], maxsize: int):
+        self.brand = brand.lower() if brand else None
+        self.category = normalize_category(category) if category else None
+        self.gender = gender.lower() if gender else None
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def matches(self, doc: dict) -> bool:
+        return (
+            (self.brand is None or (doc.get("brand") or "").lower() == self.brand)
+            and (self.category is None or (doc.get("category") or "").lower() == self.category)
+            and (self.gender is None or (doc.get("gender") or "").lower() == self.gender)
+        )
+
+
+class DealHub:
+    """Fans deal events out to SSE subscribers of this worker.
+
+    The scraper appends compact events to the capped ``deal_events``
+    collection. A single background task per worker follows it, through a
+    change stream when the deployment supports one (replica set / Atlas) or
+    a tailable cursor otherwise, and each event is encoded once and handed
+    to every matching subscriber's bounded queue. Idle connections cost one
+    small queue each; a subscriber that falls behind loses events instead of
+    holding memory. After an error the source resumes from the last event
+    it saw (change stream resume token or last tailed _id).
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._task = None
+        # Where the event source left off, so a reconnect picks up the events
+        # written while it was down instead of starting from "now"
+        self._resume_token = None
+        self._last_event_id = None
+
+    # ----- subscribers -----
+
+    def subscribe(self, brand=None, category=None, gender=None) -> Subscription:
+        sub = Subscription(brand, category, gender, settings.DEAL_STREAM_QUEUE_SIZE)
+        self._subscribers.add(sub)
+        deal_stream_subscribers.inc()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        if sub in self._subscribers:
+            self._subscribers.discard(sub)
+            deal_stream_subscribers.dec()
+
+    def publish(self, doc: dict):
+        frame = None
+        delivered = dropped = 0
+        for sub in self._subscribers:
+            if not sub.matches(doc):
+                continue
+            if frame is None:
+                frame = format_event(doc)
+            try:
+                sub.queue.put_nowait(frame)
+                delivered += 1
+            except asyncio.QueueFull:
+                sub.dropped += 1
+                dropped += 1
+        if delivered:
+            deal_stream_events.inc(("delivered",), delivered)
+        if dropped:
+            deal_stream_events.inc(("dropped",), dropped)
+
+    # ----- event source (runs on the event loop) -----
+
+    def start(self, db):
+        self._task = asyncio.create_task(self._follow(db[settings.DEAL_EVENTS_COLLECTION]))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _follow(self, collection):
+        use_change_stream = True
+        while True:
+            try:
+                if use_change_stream:
+                    await self._watch(collection)
+                else:
+                    await self._tail(collection)
+            except OperationFailure as e:
+                if use_change_stream and self._resume_token is not None:
+                    # The token fell off the oplog; events in the gap are lost, start from now
+                    logger.warning("Cannot resume deal event change stream (%s); restarting it", e)
+                    self._resume_token = None
+                    continue
+                if use_change_stream:
+                    # Standalone servers have no change streams (code 40573)
+                    logger.info("Change streams unavailable (%s); tailing %s instead", e, collection.name)
+                    use_change_stream = False
+                    continue
+                logger.warning("Deal event tail failed: %s", e)
+            except PyMongoError as e:
+                logger.warning("Deal event stream interrupted: %s", e)
+            await asyncio.sleep(settings.DEAL_STREAM_RETRY_SECONDS)
+
+    async def _watch(self, collection):
+        async with collection.watch(
+            [{"$match": {"operationType": "insert"}}], resume_after=self._resume_token
+        ) as stream:
+            async for change in stream:
+                self._resume_token = change["_id"]
+                self.publish(change["fullDocument"])
+
+    async def _tail(self, collection):
+        if self._last_event_id is None:
+            # Start after the newest event so the first connect does not replay history
+            latest = await collection.find_one(sort=[("$natural", -1)])
+            self._last_event_id = latest["_id"] if latest else None
+        while True:
+            last_id = self._last_event_id
+            query = {"_id": {"$gt": last_id}} if last_id else {}
+            cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+            while cursor.alive:
+                async for doc in cursor:
+                    self._last_event_id = doc["_id"]
+                    self.publish(doc)
+            # Tailable cursors die on an empty capped collection; poll until events arrive
+            await asyncio.sleep(settings.DEAL_STREAM_RETRY_SECONDS)
+
+
+async def recent_events(db, after_id: str, limit: int):
+    """Events newer than an SSE Last-Event-ID, for clients that reconnect"""
+    try:
+        oid = ObjectId(after_id)
+    except Exception:
+        return []
+    cursor = db[settings.DEAL_EVENTS_COLLECTION].find({"_id": {"$gt": oid}}).sort("_id", 1).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+deal_hub = DealHub()
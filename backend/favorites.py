@@ -0,0 +1,84 @@
+from datetime import datetime
+from typing import List, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+from config import settings
+
+# One document per saved product: {user_id, product_id, saved_at}. The unique
+# (user_id, product_id) index makes add idempotent and covers the id lookups,
+# (user_id, saved_at) serves the newest-first listing, and (product_id) finds
+# who saved a product. products.favorite_count is kept in step with $inc.
+FAVORITE_INDEXES = [
+    ([("user_id", ASCENDING), ("product_id", ASCENDING)], {"name": "user_product_unique", "unique": True}),
+    ([("user_id", ASCENDING), ("saved_at", DESCENDING)], {"name": "user_saved_at"}),
+    ([("product_id", ASCENDING)], {"name": "product"}),
+]
+# Partial, so it only holds products someone has saved
+FAVORITE_COUNT_INDEX = (
+    [("favorite_count", DESCENDING)],
+    {"name": "favorite_count", "partialFilterExpression": {"favorite_count": {"$gt": 0}}},
+)
+
+
+async def ensure_favorite_indexes(db):
+    collection = db[settings.FAVORITES_COLLECTION]
+    for keys, options in FAVORITE_INDEXES:
+        await collection.create_index(keys, **options)
+
+
+async def add_favorite(db, user_id: ObjectId, product_id: ObjectId) -> bool:
+    """Save a product for a user; True when it was not saved before"""
+    try:
+        result = await db[settings.FAVORITES_COLLECTION].update_one(
+            {"user_id": user_id, "product_id": product_id},
+            {"$setOnInsert": {"saved_at": datetime.utcnow()}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # A concurrent add of the same pair won the upsert
+        return False
+    if result.upserted_id is None:
+        return False
+    await db[settings.COLLECTION_NAME].update_one({"_id": product_id}, {"$inc": {"favorite_count": 1}})
+    return True
+
+
+async def remove_favorite(db, user_id: ObjectId, product_id: ObjectId) -> bool:
+    """Unsave a product; True when it had been saved"""
+    result = await db[settings.FAVORITES_COLLECTION].delete_one({"user_id": user_id, "product_id": product_id})
+    if not result.deleted_count:
+        return False
+    await db[settings.COLLECTION_NAME].update_one(
+        {"_id": product_id, "favorite_count": {"$gt": 0}}, {"$inc": {"favorite_count": -1}}
+    )
+    return True
+
+
+async def favorite_ids(db, user_id: ObjectId) -> List[str]:
+    """Ids of every product the user saved (an index-only scan)"""
+    cursor = db[settings.FAVORITES_COLLECTION].find({"user_id": user_id}, {"product_id": 1, "_id": 0})
+    return [str(doc["product_id"]) async for doc in cursor]
+
+
+async def list_favorites(db, user_id: ObjectId, skip: int, limit: int) -> Tuple[int, List[dict]]:
+    """(total saved, one page of saved products, newest first)"""
+    favorites = db[settings.FAVORITES_COLLECTION]
+    total = await favorites.count_documents({"user_id": user_id})
+    cursor = favorites.find({"user_id": user_id}, {"product_id": 1, "_id": 0}) \
+        .sort("saved_at", DESCENDING).skip(skip).limit(limit)
+    page = [doc["product_id"] async for doc in cursor]
+
+    found = {}
+    async for product in db[settings.COLLECTION_NAME].find({"_id": {"$in": page}}):
+        found[product["_id"]] = product
+    products = []
+    # Products archived since they were saved drop out of the page
+    for product_id in page:
+        product = found.get(product_id)
+        if product is not None:
+            product["_id"] = str(product["_id"])
+            products.append(product)
+    return total, products
@@ -1,17 +1,34 @@
+import asyncio
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 from config import settings
-from database import connect_to_mongo, close_mongo_connection
-from routes import products, auth
+from database import connect_to_mongo, close_mongo_connection, check_mongo_ready
+from metrics import InstrumentedRoute, render_prometheus, write_shared_snapshot
+from routes import products, auth, admin
+
+async def publish_metrics():
+    """Periodically share this worker's metrics with its siblings"""
+    while True:
+        await asyncio.sleep(settings.METRICS_FLUSH_INTERVAL)
+        try:
+            write_shared_snapshot()
+        except OSError as e:
+            print(f"Failed to publish metrics: {e}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Handle startup and shutdown events"""
-    # Startup
+    # Startup - runs once in every worker process, so each worker owns its
+    # own Motor client and connection pool (clients must not cross a fork)
     await connect_to_mongo()
+    metrics_task = asyncio.create_task(publish_metrics()) if settings.METRICS_SHARED_DIR else None
     yield
     # Shutdown
+    if metrics_task:
+        metrics_task.cancel()
     await close_mongo_connection()
 
 # Create FastAPI app
@@ -21,6 +38,7 @@ app = FastAPI(
     version="1.0.0",
     lifespan=lifespan
 )
+app.router.route_class = InstrumentedRoute
 
 # Configure CORS
 app.add_middleware(
@@ -34,6 +52,7 @@ app.add_middleware(
 # Include routers
 app.include_router(products.router)
 app.include_router(auth.router)
+app.include_router(admin.router)
 
 @app.get("/")
 async def root():
@@ -50,11 +69,51 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
-if __name__ == "__main__":
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: pings MongoDB and reports connection pool pressure.
+
+    Returns 503 when Mongo is unreachable within the deadline or the pool is
+    exhausted, so the load balancer stops routing to this worker.
+    """
+    result = await check_mongo_ready()
+    return JSONResponse(
+        status_code=200 if result["ready"] else 503,
+        content={"status": "ready" if result["ready"] else "not_ready", **result}
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: per-route latency/in-flight, Mongo command timings, pool and cache counters"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+def run_server():
+    """Start uvicorn in development (auto-reload) or production (multi-worker) mode"""
     import uvicorn
+
+    if settings.ENVIRONMENT.lower() != "production":
+        uvicorn.run(
+            "main:app",
+            host=settings.API_HOST,
+            port=settings.API_PORT,
+            reload=True
+        )
+        return
+
     uvicorn.run(
         "main:app",
         host=settings.API_HOST,
         port=settings.API_PORT,
-        reload=True
+        workers=settings.WORKERS or os.cpu_count() or 1,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        timeout_keep_alive=settings.KEEP_ALIVE_TIMEOUT,
+        timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_TIMEOUT,
+        backlog=settings.SERVER_BACKLOG,
+        limit_concurrency=settings.LIMIT_CONCURRENCY or None,
+        forwarded_allow_ips=settings.FORWARDED_ALLOW_IPS,
+        proxy_headers=True
     )
+
+if __name__ == "__main__":
+    run_server()
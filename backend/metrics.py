@@ -0,0 +1,327 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+from config import settings
+
+# Latency buckets in seconds, shared by HTTP and Mongo histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    """Base class for a labelled metric kept in process memory"""
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def samples(self) -> Dict[Tuple[str, ...], object]:
+        with self._lock:
+            return {k: (list(v) if isinstance(v, list) else v) for k, v in self._values.items()}
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: Tuple[str, ...] = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def set(self, labels: Tuple[str, ...] = (), value: float = 0):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram. Stores per-bucket counts followed by sum and count."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                # one slot per bucket, one for +Inf, then sum and count
+                row = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            row[idx] += 1
+            row[-2] += value
+            row[-1] += 1
+
+
+REGISTRY: List[_Metric] = []
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being handled by route template",
+    ("method", "route"),
+)
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency by collection and operation",
+    ("collection", "operation", "status"),
+)
+cache_requests = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss)",
+    ("cache", "result"),
+)
+coalesced_calls = Counter(
+    "coalesced_calls_total",
+    "Coalesced Mongo calls by group, operation and role (leader ran the call, coalesced shared it, timeout gave up)",
+    ("group", "operation", "role"),
+)
+coalesce_inflight = Gauge(
+    "coalesce_inflight_keys",
+    "Distinct shared Mongo calls currently in flight",
+    ("group",),
+)
+snapshot_queries = Counter(
+    "snapshot_queries_total",
+    "Product listings by catalog snapshot outcome (served, fallback to MongoDB, unavailable before the first load)",
+    ("result",),
+)
+snapshot_products = Gauge(
+    "snapshot_products",
+    "Products in this worker's catalog snapshot",
+)
+mongo_pool_connections = Gauge(
+    "mongo_pool_connections",
+    "MongoDB pool connections by state (open/in_use/waiting)",
+    ("state",),
+)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Count a cache hit or miss for the given cache"""
+    cache_requests.inc((cache, "hit" if hit else "miss"))
+
+
+class _StreamedResponse:
+    """ASGI wrapper that finishes a request's metrics once its body is sent.
+
+    A StreamingResponse handler returns before any of the body is produced,
+    so export and SSE requests are measured around sending the body instead.
+    """
+
+    def __init__(self, response, finish):
+        self.response = response
+        self.finish = finish
+
+    async def __call__(self, scope, receive, send):
+        status = str(self.response.status_code)
+        try:
+            await self.response(scope, receive, send)
+        except Exception:
+            status = "500"
+            raise
+        finally:
+            self.finish(status)
+
+
+class InstrumentedRoute(APIRoute):
+    """APIRoute that records latency and in-flight requests under the route template.
+
+    Labelling by template (``/api/products/{product_id}``) rather than the raw
+    path keeps the number of series bounded. Streaming responses stay in flight
+    until their body has been sent or the client has gone.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def instrumented_handler(request):
+            key = (request.method, route)
+            started = time.perf_counter()
+
+            def finish(status):
+                http_requests_in_flight.dec(key)
+                http_request_duration.observe(key + (status,), time.perf_counter() - started)
+
+            status = "500"
+            http_requests_in_flight.inc(key)
+            try:
+                response = await handler(request)
+                status = str(response.status_code)
+            except HTTPException as e:
+                status = str(e.status_code)
+                finish(status)
+                raise
+            except BaseException:
+                finish(status)
+                raise
+            if isinstance(response, StreamingResponse):
+                return _StreamedResponse(response, finish)
+            finish(status)
+            return response
+
+        return instrumented_handler
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command the API issues via PyMongo command monitoring"""
+
+    def __init__(self):
+        self._pending: Dict[int, Tuple[str, str]] = {}
+
+    def started(self, event):
+        name = event.command_name
+        if name == "getMore":
+            collection = event.command.get("collection")
+        else:
+            collection = event.command.get(name)
+        if not isinstance(collection, str):
+            collection = ""
+        self._pending[event.request_id] = (collection, name)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+    def _finish(self, event, status):
+        labels = self._pending.pop(event.request_id, None)
+        if labels is None:
+            return
+        mongo_command_duration.observe(labels + (status,), event.duration_micros / 1e6)
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+# ===== EXPOSITION =====
+
+def _local_snapshot() -> dict:
+    from monitoring import pool_monitor
+
+    pool = pool_monitor.snapshot()
+    mongo_pool_connections.set(("open",), pool["open_connections"])
+    mongo_pool_connections.set(("in_use",), pool["in_use_connections"])
+    mongo_pool_connections.set(("waiting",), pool["waiting_for_connection"])
+
+    return {
+        m.name: {json.dumps(list(labels)): value for labels, value in m.samples().items()}
+        for m in REGISTRY
+    }
+
+
+def _merge(into: dict, other: dict):
+    for name, series in other.items():
+        target = into.setdefault(name, {})
+        for labels, value in series.items():
+            current = target.get(labels)
+            if current is None:
+                target[labels] = value
+            elif isinstance(value, list):
+                target[labels] = [a + b for a, b in zip(current, value)]
+            else:
+                target[labels] = current + value
+
+
+def _shared_path(pid: int) -> str:
+    return os.path.join(settings.METRICS_SHARED_DIR, f"metrics-{pid}.json")
+
+
+def write_shared_snapshot():
+    """Publish this worker's metrics so any worker can serve the combined view"""
+    if not settings.METRICS_SHARED_DIR:
+        return
+    os.makedirs(settings.METRICS_SHARED_DIR, exist_ok=True)
+    path = _shared_path(os.getpid())
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(_local_snapshot(), f)
+    os.replace(tmp, path)
+
+
+def collect() -> dict:
+    """Metrics for this worker, merged with fresh snapshots from sibling workers"""
+    combined = _local_snapshot()
+    if not settings.METRICS_SHARED_DIR or not os.path.isdir(settings.METRICS_SHARED_DIR):
+        return combined
+
+    own = _shared_path(os.getpid())
+    max_age = settings.METRICS_FLUSH_INTERVAL * 3
+    now = time.time()
+    for entry in os.scandir(settings.METRICS_SHARED_DIR):
+        if not entry.name.endswith(".json") or entry.path == own:
+            continue
+        try:
+            if now - entry.stat().st_mtime > max_age:
+                continue
+            with open(entry.path) as f:
+                _merge(combined, json.load(f))
+        except (OSError, ValueError):
+            continue
+    return combined
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus() -> str:
+    """Render all metrics in the Prometheus text exposition format"""
+    data = collect()
+    lines = []
+    for m in REGISTRY:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.type}")
+        for key, value in sorted(data.get(m.name, {}).items()):
+            labels = json.loads(key)
+            if m.type == "histogram":
+                cumulative = 0
+                for bound, count in zip(m.buckets + (float("inf"),), value[:-2]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{m.name}_bucket{_format_labels(m.labelnames, labels, ('le', le))} {cumulative}")
+                lines.append(f"{m.name}_sum{_format_labels(m.labelnames, labels)} {value[-2]}")
+                lines.append(f"{m.name}_count{_format_labels(m.labelnames, labels)} {value[-1]}")
+            else:
+                lines.append(f"{m.name}{_format_labels(m.labelnames, labels)} {value}")
+    return "\n".join(lines) + "\n"
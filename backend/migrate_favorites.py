@@ -0,0 +1,116 @@
+"""
+Move favorites from the users.favorites arrays into the favorites collection.
+
+For every user that still has a ``favorites`` array, one favorites document
+is upserted per valid product id and the array is then removed, only if it
+is unchanged since it was read. Afterwards products.favorite_count is
+recomputed from the collection. Re-running is safe: existing pairs are left
+alone and the recount makes the counters exact again. Use --recount-only to
+repair the counters on their own.
+
+Usage (from backend/):
+  python migrate_favorites.py --dry-run
+  python migrate_favorites.py
+  python migrate_favorites.py --recount-only
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import MongoClient, UpdateOne
+
+from config import settings
+from favorites import FAVORITE_COUNT_INDEX, FAVORITE_INDEXES
+
+
+def migrate_users(db, batch_size: int, dry_run: bool, keep_arrays: bool) -> dict:
+    favorites = db[settings.FAVORITES_COLLECTION]
+    stats = {"users": 0, "favorites": 0, "invalid_ids": 0, "arrays_removed": 0}
+    cursor = db.users.find({"favorites.0": {"$exists": True}}, {"favorites": 1}).batch_size(batch_size)
+    for user in cursor:
+        stats["users"] += 1
+        # There is no saved time for old favorites; array order is the order they were added
+        now = datetime.utcnow()
+        product_ids = list(dict.fromkeys(user["favorites"]))
+        ops = []
+        for position, product_id in enumerate(product_ids):
+            if not isinstance(product_id, str) or not ObjectId.is_valid(product_id):
+                stats["invalid_ids"] += 1
+                continue
+            saved_at = now - timedelta(seconds=len(product_ids) - position)
+            ops.append(UpdateOne(
+                {"user_id": user["_id"], "product_id": ObjectId(product_id)},
+                {"$setOnInsert": {"saved_at": saved_at}},
+                upsert=True,
+            ))
+        stats["favorites"] += len(ops)
+        if dry_run:
+            continue
+        if ops:
+            favorites.bulk_write(ops, ordered=False)
+        if not keep_arrays:
+            # Skipped when the old API changed the array in the meantime; the next run picks it up
+            result = db.users.update_one(
+                {"_id": user["_id"], "favorites": user["favorites"]}, {"$unset": {"favorites": ""}}
+            )
+            stats["arrays_removed"] += result.modified_count
+    return stats
+
+
+def recount(db, batch_size: int) -> dict:
+    """Set products.favorite_count from the favorites collection"""
+    products = db[settings.COLLECTION_NAME]
+    counts = db[settings.FAVORITES_COLLECTION].aggregate([
+        {"$group": {"_id": "$product_id", "count": {"$sum": 1}}},
+    ], allowDiskUse=True)
+    counted, ops = set(), []
+    for doc in counts:
+        counted.add(doc["_id"])
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"favorite_count": doc["count"]}}))
+        if len(ops) >= batch_size:
+            products.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        products.bulk_write(ops, ordered=False)
+    # Counters left on products nobody has saved any more
+    stale = [doc["_id"] for doc in products.find({"favorite_count": {"$gt": 0}}, {"_id": 1})
+             if doc["_id"] not in counted]
+    for start in range(0, len(stale), batch_size):
+        products.update_many({"_id": {"$in": stale[start:start + batch_size]}}, {"$set": {"favorite_count": 0}})
+    return {"products_counted": len(counted), "counters_reset": len(stale)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move users.favorites arrays into the favorites collection")
+    parser.add_argument("--mongo-uri", default=settings.MONGO_URI)
+    parser.add_argument("--db", default=settings.DB_NAME)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be migrated without writing")
+    parser.add_argument("--keep-arrays", action="store_true", help="Leave users.favorites in place")
+    parser.add_argument("--recount-only", action="store_true", help="Only recompute products.favorite_count")
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongo_uri)
+    try:
+        db = client[args.db]
+        started = time.perf_counter()
+        report = {}
+        if not args.dry_run:
+            for keys, options in FAVORITE_INDEXES:
+                db[settings.FAVORITES_COLLECTION].create_index(keys, **options)
+            keys, options = FAVORITE_COUNT_INDEX
+            db[settings.COLLECTION_NAME].create_index(keys, **options)
+        if not args.recount_only:
+            report["migrated"] = migrate_users(db, args.batch_size, args.dry_run, args.keep_arrays)
+        if not args.dry_run:
+            report["recount"] = recount(db, args.batch_size)
+        report["elapsed_sec"] = round(time.perf_counter() - started, 3)
+        print(json.dumps(report, indent=2))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -23,11 +23,13 @@ class Product(BaseModel):
     category: Optional[str] = None
     url: Optional[str] = None
     image_url: Optional[str] = None
+    images: Optional[Dict[str, str]] = None  # resized variants: thumb / card / detail
     source: str
     currency: str = "PKR"
     tags: List[str] = []
     scraped_at: Optional[datetime] = None
     variants: List[Dict[str, Any]] = []
+    available_sizes: List[str] = []  # normalized in-stock size codes
 
     class Config:
         populate_by_name = True
@@ -61,6 +63,7 @@ class ProductFilters(BaseModel):
     max_price: Optional[float] = None
     min_discount: Optional[int] = None
     search: Optional[str] = None
+    size: Optional[str] = None
     sort_by: Optional[str] = "discount_percent"  # discount_percent, price, -price
     limit: int = 50
     skip: int = 0
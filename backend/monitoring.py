@@ -0,0 +1,118 @@
+import threading
+from collections import Counter, deque
+from pymongo import monitoring
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks Motor/PyMongo connection pool usage for the readiness check.
+
+    Listener callbacks run on Motor's executor threads, so counters are
+    guarded by a lock. Only the most recent checkout waits are kept.
+    In-use and waiting counts are also kept per server, since maxPoolSize
+    applies to each server's pool separately.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)  # seconds spent waiting for a connection
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+        self._in_use_by = Counter()
+        self._waiting_by = Counter()
+
+    # Connection lifecycle
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._in_use_by.pop(event.address, None)
+            self._waiting_by.pop(event.address, None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    # Checkout / checkin
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+            self._waiting_by[event.address] += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+            self._waiting_by[event.address] -= 1
+            self._in_use_by[event.address] += 1
+            self.checkouts += 1
+            self._waits.append(event.duration)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+            self._waiting_by[event.address] -= 1
+            self._waits.append(event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+            self._in_use_by[event.address] -= 1
+
+    def snapshot(self) -> dict:
+        """Return current pool counters and checkout wait percentiles in milliseconds"""
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                "open_connections": self.open,
+                "in_use_connections": self.in_use,
+                "waiting_for_connection": self.waiting,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+                "pools": [
+                    {
+                        "address": ":".join(map(str, address)),
+                        "in_use_connections": self._in_use_by[address],
+                        "waiting_for_connection": self._waiting_by[address],
+                    }
+                    for address in sorted(set(self._in_use_by) | set(self._waiting_by))
+                ],
+            }
+
+        def pct(p):
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 3)
+
+        stats["checkout_wait_ms"] = {
+            "p50": pct(0.50),
+            "p95": pct(0.95),
+            "p99": pct(0.99),
+            "max": pct(1.0),
+            "samples": len(waits),
+        }
+        return stats
+
+
+# Process-wide monitor, registered on the client in connect_to_mongo()
+pool_monitor = PoolMonitor()
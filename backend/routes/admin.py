@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from typing import Optional
+from config import settings
+from database import get_database
+from metrics import InstrumentedRoute
+from slow_queries import slow_query_recorder
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"], route_class=InstrumentedRoute)
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only when X-Admin-Token matches settings.ADMIN_TOKEN"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+@router.get("/slow-queries", dependencies=[Depends(require_admin)])
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=200, description="Number of shapes to return"),
+    sort_by: str = Query("total_ms", pattern="^(total_ms|max_ms|count)$", description="Rank by total_ms, max_ms or count")
+):
+    """Top slow query shapes across all workers, with captured explain plans"""
+    db = await get_database()
+    shapes = await slow_query_recorder.top_shapes(db, limit=limit, sort_by=sort_by)
+    return {
+        "threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+        "count": len(shapes),
+        "shapes": shapes
+    }
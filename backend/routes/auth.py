@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 from datetime import datetime, timedelta
 import bcrypt
 import jwt
 import secrets
+from bson import ObjectId
 from models import (
     UserCreate, UserLogin, User, UserResponse, Token,
     ForgotPasswordRequest, ResetPasswordRequest, VerifyEmailRequest,
@@ -12,9 +13,11 @@ from models import (
 )
 from database import Database
 from config import settings
+from favorites import add_favorite as save_favorite, remove_favorite as unsave_favorite, favorite_ids, list_favorites
+from metrics import InstrumentedRoute
 from email_utils import send_email, create_verification_email, create_password_reset_email
 
-router = APIRouter(prefix="/api/auth", tags=["Authentication"])
+router = APIRouter(prefix="/api/auth", tags=["Authentication"], route_class=InstrumentedRoute)
 
 # Security
 security = HTTPBearer()
@@ -81,11 +84,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Could not validate credentials",
         )
     
-    # Convert string ID to ObjectId for MongoDB query
+    # Convert string ID to ObjectId for MongoDB query. Favorites live in their own
+    # collection; a user document not migrated yet still carries the old array
     try:
-        user = await Database.db.users.find_one({"_id": ObjectId(user_id)})
+        user = await Database.db.users.find_one({"_id": ObjectId(user_id)}, {"favorites": 0})
     except:
-        user = await Database.db.users.find_one({"_id": user_id})
+        user = await Database.db.users.find_one({"_id": user_id}, {"favorites": 0})
         
     if user is None:
         raise HTTPException(
@@ -140,8 +144,7 @@ async def register(user_data: UserCreate):
         "name": user_data.name,
         "password": hashed_password,
         "is_verified": False,
-        "created_at": datetime.now(),
-        "favorites": []
+        "created_at": datetime.now()
     }
     
     result = await Database.db.users.insert_one(user_dict)
@@ -203,7 +206,7 @@ async def login(login_data: UserLogin):
         name=user["name"],
         is_verified=user.get("is_verified", False),
         created_at=user["created_at"],
-        favorites=user.get("favorites", [])
+        favorites=await favorite_ids(Database.db, user["_id"])
     )
     
     return Token(access_token=access_token, user=user_response)
@@ -341,22 +344,27 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
         name=current_user.name,
         is_verified=current_user.is_verified,
         created_at=current_user.created_at,
-        favorites=current_user.favorites
+        favorites=await favorite_ids(Database.db, ObjectId(current_user.id))
     )
 
 
+def favorite_product_id(product_id: str):
+    """ObjectId of a product to save, or 400"""
+    if not ObjectId.is_valid(product_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid product ID format"
+        )
+    return ObjectId(product_id)
+
+
 @router.post("/favorites/add")
 async def add_favorite(
     request: FavoriteRequest,
     current_user: User = Depends(get_current_user)
 ):
     """Add product to favorites"""
-    from bson import ObjectId
-    
-    await Database.db.users.update_one(
-        {"_id": ObjectId(current_user.id)},
-        {"$addToSet": {"favorites": request.product_id}}
-    )
+    await save_favorite(Database.db, ObjectId(current_user.id), favorite_product_id(request.product_id))
     return {"message": "Added to favorites"}
 
 
@@ -366,28 +374,16 @@ async def remove_favorite(
     current_user: User = Depends(get_current_user)
 ):
     """Remove product from favorites"""
-    from bson import ObjectId
-    
-    await Database.db.users.update_one(
-        {"_id": ObjectId(current_user.id)},
-        {"$pull": {"favorites": request.product_id}}
-    )
+    await unsave_favorite(Database.db, ObjectId(current_user.id), favorite_product_id(request.product_id))
     return {"message": "Removed from favorites"}
 
 
 @router.get("/favorites")
-async def get_favorites(current_user: User = Depends(get_current_user)):
-    """Get user's favorite products"""
-    from bson import ObjectId
-    
-    # Get product IDs
-    favorite_ids = [ObjectId(fav_id) for fav_id in current_user.favorites if ObjectId.is_valid(fav_id)]
-    
-    # Fetch products
-    products = []
-    async for product in Database.db.products.find({"_id": {"$in": favorite_ids}}):
-        product["_id"] = str(product["_id"])
-        products.append(product)
-    
-    return {"favorites": products}
-
+async def get_favorites(
+    skip: int = Query(0, ge=0, description="Number of favorites to skip"),
+    limit: int = Query(settings.FAVORITES_PAGE_SIZE, ge=1, le=500, description="Favorites per page"),
+    current_user: User = Depends(get_current_user)
+):
+    """Get user's favorite products, most recently saved first"""
+    total, products = await list_favorites(Database.db, ObjectId(current_user.id), skip, limit)
+    return {"favorites": products, "total": total, "skip": skip, "limit": limit}
@@ -1,29 +1,48 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from typing import Optional, List
+from datetime import datetime
+import asyncio
+import csv
+import io
+import json
+import zlib
 from models import Product, ProductResponse
-from database import get_collection
+from coalesce import catalog_flights, query_key
+from config import settings
+from database import get_catalog_database, get_collection, get_database
+from deal_stream import deal_hub, format_event, recent_events
+from metrics import InstrumentedRoute
+from snapshot import catalog_snapshot
+from sizes import parse_sizes
+from categorize import normalize_category
 from bson import ObjectId
 import re
 
-router = APIRouter(prefix="/api/products", tags=["Products"])
+router = APIRouter(prefix="/api/products", tags=["Products"], route_class=InstrumentedRoute)
 
-@router.get("/", response_model=ProductResponse)
-async def get_products(
-    brand: Optional[str] = Query(None, description="Filter by brand name"),
-    gender: Optional[str] = Query(None, description="Filter by gender (men/women/unisex)"),
-    category: Optional[str] = Query(None, description="Filter by category"),
-    min_price: Optional[float] = Query(None, description="Minimum price"),
-    max_price: Optional[float] = Query(None, description="Maximum price"),
-    min_discount: Optional[int] = Query(None, description="Minimum discount percentage"),
-    search: Optional[str] = Query(None, description="Search in title and tags"),
-    sort_by: str = Query("discount_percent", description="Sort by: discount_percent, price, -price (descending)"),
-    limit: int = Query(50, ge=1, le=100, description="Number of results per page"),
-    skip: int = Query(0, ge=0, description="Number of results to skip")
-):
-    
-    collection = await get_collection()
-    
-    # Build query filter
+IMAGE_SIZE_PATTERN = "^(thumb|card|detail)$"
+
+
+def apply_image_size(product: dict, size: str) -> dict:
+    """Point image_url at the resized variant for this view, when the scraper stored one"""
+    images = product.get("images")
+    if images and images.get(size):
+        product["image_url"] = images[size]
+    return product
+
+
+def build_product_query(
+    brand: Optional[str] = None,
+    gender: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_discount: Optional[int] = None,
+    search: Optional[str] = None,
+    size: Optional[str] = None
+) -> dict:
+    """Build the Mongo filter shared by the listing and export endpoints"""
     query = {}
     
     if brand:
@@ -33,7 +52,7 @@ async def get_products(
         query["gender"] = gender.lower()
     
     if category:
-        query["category"] = {"$regex": category, "$options": "i"}
+        query["category"] = normalize_category(category)
     
     if min_price is not None or max_price is not None:
         query["price"] = {}
@@ -52,7 +71,17 @@ async def get_products(
             {"tags": {"$regex": search, "$options": "i"}}
         ]
     
-    # Build sort order
+    if size:
+        # In stock in any of the sizes; available_sizes is a multikey index
+        sizes = parse_sizes(size)
+        if sizes:
+            query["available_sizes"] = sizes[0] if len(sizes) == 1 else {"$in": sizes}
+    
+    return query
+
+
+def build_sort(sort_by: str):
+    """Translate the sort_by query value into a (field, direction) pair"""
     sort_field = sort_by.lstrip("-")
     sort_direction = -1 if sort_by.startswith("-") else 1
     
@@ -62,12 +91,52 @@ async def get_products(
     elif sort_field == "price" and not sort_by.startswith("-"):
         sort_direction = 1
     
-    # Get total count
-    total = await collection.count_documents(query)
+    return sort_field, sort_direction
+
+
+@router.get("/", response_model=ProductResponse)
+async def get_products(
+    brand: Optional[str] = Query(None, description="Filter by brand name"),
+    gender: Optional[str] = Query(None, description="Filter by gender (men/women/kids/unisex/other)"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    min_price: Optional[float] = Query(None, description="Minimum price"),
+    max_price: Optional[float] = Query(None, description="Maximum price"),
+    min_discount: Optional[int] = Query(None, description="Minimum discount percentage"),
+    search: Optional[str] = Query(None, description="Search in title and tags"),
+    size: Optional[str] = Query(None, description="In stock in size(s), comma-separated: S, M, XL, 32, ..."),
+    sort_by: str = Query("discount_percent", description="Sort by: discount_percent, price, -price (descending)"),
+    limit: int = Query(50, ge=1, le=100, description="Number of results per page"),
+    skip: int = Query(0, ge=0, description="Number of results to skip"),
+    image_size: str = Query("card", pattern=IMAGE_SIZE_PATTERN, description="Image variant for image_url: thumb, card or detail")
+):
     
-    # Get products
-    cursor = collection.find(query).sort(sort_field, sort_direction).skip(skip).limit(limit)
-    products = await cursor.to_list(length=limit)
+    collection = await get_collection()
+
+    query = build_product_query(brand, gender, category, min_price, max_price, min_discount, search, size)
+    sort_field, sort_direction = build_sort(sort_by)
+    
+    served = catalog_snapshot.query(
+        brand=brand, gender=gender, category=category, min_price=min_price, max_price=max_price,
+        min_discount=min_discount, search=search, size=size,
+        sort_field=sort_field, sort_direction=sort_direction, skip=skip, limit=limit
+    )
+    if served is not None:
+        total, products = served
+    else:
+        # Identical concurrent requests (a sale page opened by everyone at once) share
+        # one count and one find; each request gets its own copies of the documents
+        total = await catalog_flights.do(
+            query_key("count", query), lambda: collection.count_documents(query), op="count"
+        )
+        
+        async def fetch_page():
+            cursor = collection.find(query).sort(sort_field, sort_direction).skip(skip).limit(limit)
+            return await cursor.to_list(length=limit)
+        
+        shared = await catalog_flights.do(
+            query_key("find", query, sort_field, sort_direction, skip, limit), fetch_page, op="find"
+        )
+        products = [dict(product) for product in shared]
     
     # Convert ObjectId to string and add defaults for missing fields
     for product in products:
@@ -80,6 +149,7 @@ async def get_products(
             product["discount_percent"] = 0
         if "url" not in product or product["url"] is None:
             product["url"] = "#"
+        apply_image_size(product, image_size)
     
     return ProductResponse(
         total=total,
@@ -91,7 +161,8 @@ async def get_products(
 @router.get("/search")
 async def search_products(
     q: str = Query(..., description="Search query"),
-    limit: int = Query(20, ge=1, le=50, description="Number of results")
+    limit: int = Query(20, ge=1, le=50, description="Number of results"),
+    image_size: str = Query("thumb", pattern=IMAGE_SIZE_PATTERN, description="Image variant for image_url")
 ):
     """Search products by name, category, brand, or tags"""
     collection = await get_collection()
@@ -107,12 +178,17 @@ async def search_products(
     }
     
     # Get matching products
-    cursor = collection.find(search_query).limit(limit)
-    products = await cursor.to_list(length=limit)
+    shared = await catalog_flights.do(
+        query_key("search", search_query, limit),
+        lambda: collection.find(search_query).limit(limit).to_list(length=limit),
+        op="search",
+    )
+    products = [dict(product) for product in shared]
     
     # Convert ObjectId to string
     for product in products:
         product["_id"] = str(product["_id"])
+        apply_image_size(product, image_size)
     
     return {
         "query": q,
@@ -120,6 +196,198 @@ async def search_products(
         "products": products
     }
 
+EXPORT_FIELDS = [
+    "_id", "title", "brand", "price", "original_price", "discount_percent", "gender", "category",
+    "url", "image_url", "images", "source", "currency", "tags", "scraped_at", "variants", "available_sizes",
+    "rating", "review_count"
+]
+DEFAULT_EXPORT_FIELDS = [f for f in EXPORT_FIELDS if f != "variants"]
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _export_value(value):
+    """JSON fallback for BSON types in exported documents"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, list) and all(isinstance(v, str) for v in value):
+        return "|".join(value)
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=_export_value)
+    return _export_value(value) if isinstance(value, (ObjectId, datetime)) else value
+
+
+async def _export_chunks(cursor, fmt: str, fields: List[str], compress: bool):
+    """Encode cursor documents as NDJSON/CSV in ~64KB chunks, optionally gzip-compressed"""
+    gz = zlib.compressobj(wbits=31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(fields)
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return gz.compress(data) if gz else data
+
+    async for doc in cursor:
+        if writer:
+            writer.writerow([_csv_cell(doc.get(f)) for f in fields])
+        else:
+            buffer.write(json.dumps({f: doc[f] for f in fields if f in doc}, default=_export_value))
+            buffer.write("\n")
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            chunk = drain()
+            if chunk:
+                yield chunk
+
+    tail = drain()
+    if gz:
+        tail += gz.flush()
+    if tail:
+        yield tail
+
+
+@router.get("/export")
+async def export_products(
+    brand: Optional[str] = Query(None, description="Filter by brand name"),
+    gender: Optional[str] = Query(None, description="Filter by gender (men/women/kids/unisex/other)"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    min_price: Optional[float] = Query(None, description="Minimum price"),
+    max_price: Optional[float] = Query(None, description="Maximum price"),
+    min_discount: Optional[int] = Query(None, description="Minimum discount percentage"),
+    search: Optional[str] = Query(None, description="Search in title and tags"),
+    size: Optional[str] = Query(None, description="In stock in size(s), comma-separated"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    fields: Optional[str] = Query(None, description=f"Comma-separated fields to include: {', '.join(EXPORT_FIELDS)}"),
+    gzip: bool = Query(False, description="gzip the stream (Content-Encoding: gzip)")
+):
+    """Stream the filtered catalog as NDJSON or CSV.
+
+    Documents are read from one batched cursor in _id order, so memory use is
+    constant regardless of result size and there is no count or skip.
+    """
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in EXPORT_FIELDS]
+        if unknown or not selected:
+            raise HTTPException(status_code=400, detail=f"Unknown export fields: {', '.join(unknown) or fields}")
+    else:
+        selected = DEFAULT_EXPORT_FIELDS
+
+    collection = await get_collection()
+    query = build_product_query(brand, gender, category, min_price, max_price, min_discount, search, size)
+    projection = {f: 1 for f in selected}
+    if "_id" not in selected:
+        projection["_id"] = 0
+    cursor = collection.find(query, projection).sort("_id", 1).batch_size(settings.EXPORT_BATCH_SIZE)
+
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="products.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(_export_chunks(cursor, format, selected, gzip), media_type=media_type, headers=headers)
+
+@router.get("/top-deals")
+async def get_top_deals(
+    gender: Optional[str] = Query(None, description="men/women/kids/unisex/other (default: all)"),
+    category: Optional[str] = Query(None, description="Category (default: all)"),
+    limit: int = Query(24, ge=1, le=100, description="Number of products"),
+    image_size: str = Query("card", pattern=IMAGE_SIZE_PATTERN, description="Image variant for image_url")
+):
+    """Best-ranked deals for a gender/category, precomputed after each crawl.
+
+    Products are ordered by ``deal_score`` (discount, saving, stock, rating,
+    freshness); served from a single ``top_deals`` document.
+    """
+    db = await get_catalog_database()
+    key = f"{(gender or 'all').lower()}:{normalize_category(category) if category else 'all'}"
+    doc = await db[settings.TOP_DEALS_COLLECTION].find_one(
+        {"_id": key}, {"computed_at": 1, "products": {"$slice": limit}}
+    )
+    products = doc.get("products", []) if doc else []
+    for product in products:
+        product["_id"] = str(product["_id"])
+        apply_image_size(product, image_size)
+    return {
+        "key": key,
+        "computed_at": doc.get("computed_at") if doc else None,
+        "count": len(products),
+        "products": products
+    }
+
+@router.get("/most-saved")
+async def get_most_saved(
+    limit: int = Query(24, ge=1, le=100, description="Number of products"),
+    image_size: str = Query("card", pattern=IMAGE_SIZE_PATTERN, description="Image variant for image_url")
+):
+    """Products saved to favorites by the most users.
+
+    ``favorite_count`` is maintained as favorites are added and removed, so
+    this is a walk of a small partial index rather than an aggregation.
+    """
+    collection = await get_collection()
+    cursor = collection.find({"favorite_count": {"$gt": 0}}).sort("favorite_count", -1).limit(limit)
+    products = await cursor.to_list(length=limit)
+    for product in products:
+        product["_id"] = str(product["_id"])
+        apply_image_size(product, image_size)
+    return {
+        "count": len(products),
+        "products": products
+    }
+
+async def _deal_frames(request: Request, filters: tuple, replay: list):
+    """Yield SSE frames for one subscriber, with keepalive comments while idle"""
+    # Subscribed here rather than in the endpoint: a client that disconnects before
+    # the body starts never runs this generator, so it must not hold a queue
+    sub = deal_hub.subscribe(*filters)
+    try:
+        yield f"retry: {int(settings.DEAL_STREAM_RETRY_SECONDS * 1000)}\n\n".encode("utf-8")
+        for doc in replay:
+            if sub.matches(doc):
+                yield format_event(doc)
+        while True:
+            try:
+                yield await asyncio.wait_for(sub.queue.get(), timeout=settings.DEAL_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield b": keepalive\n\n"
+    finally:
+        deal_hub.unsubscribe(sub)
+
+
+@router.get("/stream")
+async def stream_deals(
+    request: Request,
+    brand: Optional[str] = Query(None, description="Only events for this brand"),
+    category: Optional[str] = Query(None, description="Only events for this category"),
+    gender: Optional[str] = Query(None, description="Only events for this gender (men/women/kids/unisex/other)")
+):
+    """Server-sent events for newly listed products and deeper discounts.
+
+    Each event is ``new`` or ``deeper`` with a compact product payload. A
+    reconnecting client's Last-Event-ID header replays the events it missed.
+    """
+    replay = []
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id:
+        replay = await recent_events(await get_database(), last_event_id, settings.DEAL_STREAM_REPLAY_LIMIT)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(
+        _deal_frames(request, (brand, category, gender), replay), media_type="text/event-stream", headers=headers
+    )
+
 @router.get("/{product_id}", response_model=Product)
 async def get_product_by_id(product_id: str):
     """Get a single product by ID"""
@@ -135,7 +403,7 @@ async def get_product_by_id(product_id: str):
         raise HTTPException(status_code=404, detail="Product not found")
     
     product["_id"] = str(product["_id"])
-    return Product(**product)
+    return Product(**apply_image_size(product, "detail"))
 
 @router.get("/brands/list", response_model=List[str])
 async def get_brands():
@@ -154,51 +422,19 @@ async def get_categories():
 
 @router.get("/categories/by-gender")
 async def get_categories_by_gender():
-    """Return categories grouped by normalized gender (men, women, kids, other)."""
-    collection = await get_collection()
+    """Return categories grouped by gender (men, women, kids, other).
 
-    pipeline = [
-        {"$match": {"category": {"$ne": None}}},
-        {
-            "$project": {
-                "category": 1,
-                "gender": {
-                    "$let": {
-                        "vars": {"g": {"$toLower": {"$ifNull": ["$gender", "other"]}}},
-                        "in": {
-                            "$switch": {
-                                "branches": [
-                                    {"case": {"$in": ["$$g", ["men", "male", "gents"]]}, "then": "men"},
-                                    {"case": {"$in": ["$$g", ["women", "female", "ladies", "lady", "woman", "womens"]]}, "then": "women"},
-                                    {"case": {"$in": ["$$g", [
-                                        "kids", "kid", "children", "child", "youth", "junior",
-                                        "boys", "boy", "girls", "girl"
-                                    ]]}, "then": "kids"}
-                                ],
-                                "default": "other"
-                            }
-                        }
-                    }
-                }
-            }
-        },
-        {"$group": {"_id": {"gender": "$gender", "category": "$category"}}},
-        {"$group": {"_id": "$_id.gender", "categories": {"$addToSet": "$_id.category"}}},
-    ]
-
-    docs = await collection.aggregate(pipeline).to_list(length=1000)
-
-    result = {"men": [], "women": [], "kids": [], "other": []}
-    for d in docs:
-        gender = (d.get("_id") or "other").lower()
-        cats = sorted([c for c in d.get("categories", []) if c])
-        if gender in result:
-            result[gender] = cats
-        else:
-            result["other"].extend(cats)
+    gender and category are normalized at ingest (see pk_deals.backfill for
+    older documents), so each list is a distinct scan of the (gender, category)
+    index. Unisex products are listed under other.
+    """
+    collection = await get_collection()
+    genders = ["men", "women", "kids", "unisex", "other"]
+    lists = await asyncio.gather(*(collection.distinct("category", {"gender": g}) for g in genders))
+    found = dict(zip(genders, lists))
 
-    # Ensure uniqueness and sort for 'other'
-    result["other"] = sorted(list(set(result["other"])))
+    result = {g: sorted(c for c in found[g] if c) for g in ("men", "women", "kids")}
+    result["other"] = sorted({c for g in ("unisex", "other") for c in found[g] if c})
     return result
 
 @router.get("/stats/summary")
@@ -249,7 +485,7 @@ async def get_product_by_id(product_id: str):
         if "url" not in product or product["url"] is None:
             product["url"] = "#"
         
-        return product
+        return apply_image_size(product, "detail")
         
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Product not found: {str(e)}")
@@ -0,0 +1,51 @@
+import re
+from typing import List, Optional
+
+# Mirrors scraper/pk_deals/utils/sizes.py so ?size= matches the stored available_sizes codes
+SIZE_ALIASES = {
+    "XXS": "XXS", "2XS": "XXS",
+    "XS": "XS", "X-SMALL": "XS", "EXTRA SMALL": "XS",
+    "S": "S", "SM": "S", "SMALL": "S",
+    "M": "M", "MED": "M", "MEDIUM": "M",
+    "L": "L", "LG": "L", "LARGE": "L",
+    "XL": "XL", "X-LARGE": "XL", "EXTRA LARGE": "XL",
+    "XXL": "XXL", "2XL": "XXL", "XX-LARGE": "XXL",
+    "XXXL": "3XL", "3XL": "3XL",
+    "XXXXL": "4XL", "4XL": "4XL",
+    "5XL": "5XL",
+    "FREE": "FREE", "FREE SIZE": "FREE", "FREESIZE": "FREE", "ONE SIZE": "FREE", "ONESIZE": "FREE",
+    "OS": "FREE", "STANDARD": "FREE",
+}
+
+_AGE_RANGE = re.compile(r"(\d{1,2})\s*-\s*(\d{1,2})\s*(?:Y|YR|YRS|YEAR|YEARS)")
+_AGE = re.compile(r"(\d{1,2})\s*(?:Y|YR|YRS|YEAR|YEARS)")
+_NUMERIC = re.compile(r"W?(\d{2})")
+
+
+def normalize_size(text: str) -> Optional[str]:
+    """Size code for user input like "m", "Medium", "xxl" or "32"; None if unrecognized"""
+    p = (text or "").strip().upper()
+    if p in SIZE_ALIASES:
+        return SIZE_ALIASES[p]
+    m = _AGE_RANGE.fullmatch(p)
+    if m:
+        return f"{int(m.group(1))}-{int(m.group(2))}Y"
+    m = _AGE.fullmatch(p)
+    if m:
+        return f"{int(m.group(1))}Y"
+    m = _NUMERIC.fullmatch(p)
+    if m and 22 <= int(m.group(1)) <= 50:
+        return m.group(1)
+    return None
+
+
+def parse_sizes(value: str) -> List[str]:
+    """Comma-separated ?size= value -> distinct size codes (unrecognized values are kept uppercased)"""
+    codes = []
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        code = normalize_size(part) or part.strip().upper()
+        if code not in codes:
+            codes.append(code)
+    return codes
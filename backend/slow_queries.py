@@ -0,0 +1,257 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+from datetime import datetime
+
+from bson import ObjectId
+from bson.regex import Regex
+from pymongo import UpdateOne, monitoring
+
+from config import settings
+
+logger = logging.getLogger("savekaro.slow_queries")
+
+SLOW_QUERY_COLLECTION = "slow_query_shapes"
+
+# Commands whose filter/sort we can normalize, and the ones we can re-run under explain
+RECORDED_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct"}
+LOGICAL_OPERATORS = {"$and", "$or", "$nor"}
+
+
+def _redact(value):
+    """Replace literal values with type markers, keeping field names and operators"""
+    if isinstance(value, dict):
+        return {k: _redact(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact(v) for v in value[:3]] + ([f"<+{len(value) - 3} more>"] if len(value) > 3 else [])
+    if isinstance(value, str):
+        return "<str>"
+    if isinstance(value, bool):
+        return "<bool>"
+    if isinstance(value, (int, float)):
+        return "<num>"
+    if value is None:
+        return None
+    if isinstance(value, ObjectId):
+        return "<oid>"
+    if isinstance(value, datetime):
+        return "<date>"
+    if isinstance(value, (re.Pattern, Regex)):
+        return "<regex>"
+    return f"<{type(value).__name__}>"
+
+
+def _shape(value):
+    """Normalized query shape: field names and operators only, keys sorted"""
+    if not isinstance(value, dict):
+        return 1
+    shape = {}
+    for key in sorted(value):
+        sub = value[key]
+        if key in LOGICAL_OPERATORS and isinstance(sub, list):
+            shape[key] = sorted((_shape(v) for v in sub), key=json.dumps)
+        else:
+            shape[key] = _shape(sub)
+    return shape
+
+
+def _command_parts(name: str, command: dict):
+    """Extract (collection, filter, sort) from a monitored command document"""
+    collection = command.get(name)
+    if name == "find":
+        return collection, command.get("filter") or {}, command.get("sort")
+    if name == "count":
+        return collection, command.get("query") or {}, None
+    if name == "distinct":
+        return collection, command.get("query") or {}, {"key": command.get("key")}
+    if name == "findAndModify":
+        return collection, command.get("query") or {}, command.get("sort")
+    if name in ("update", "delete"):
+        docs = command.get("updates" if name == "update" else "deletes") or [{}]
+        return collection, docs[0].get("q") or {}, None
+    if name == "aggregate":
+        match, sort = {}, None
+        for stage in command.get("pipeline") or []:
+            if "$match" in stage and not match:
+                match = stage["$match"]
+            elif "$sort" in stage and sort is None:
+                sort = stage["$sort"]
+        return collection, match, sort
+    return collection, {}, None
+
+
+def _explain_target(name: str, command: dict) -> dict:
+    """Copy of the original command without session/cluster fields, suitable for explain"""
+    return {k: v for k, v in command.items() if not k.startswith("$") and k not in ("lsid", "txnNumber", "readConcern", "writeConcern")}
+
+
+class SlowQueryRecorder(monitoring.CommandListener):
+    """Records MongoDB commands slower than SLOW_QUERY_THRESHOLD_MS.
+
+    Each slow command is logged with its normalized shape, redacted filter and
+    sort. Shapes are aggregated in memory and flushed to ``slow_query_shapes``
+    so the admin endpoint can rank them across workers. The first
+    SLOW_QUERY_EXPLAIN_SAMPLES occurrences of every shape are re-run under
+    ``explain("executionStats")`` from a background task.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._shapes = {}
+        self._explains = {}
+        self._explained = {}
+        self._loop = None
+        self._queue = None
+        self._tasks = []
+
+    # ----- command monitoring (runs on driver threads) -----
+
+    def started(self, event):
+        if event.command_name not in RECORDED_COMMANDS:
+            return
+        if event.command.get(event.command_name) == SLOW_QUERY_COLLECTION:
+            return
+        self._pending[event.request_id] = (event.database_name, event.command_name, event.command)
+
+    def succeeded(self, event):
+        pending = self._pending.pop(event.request_id, None)
+        if pending is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+            self._record(*pending, duration_ms)
+
+    def failed(self, event):
+        self._pending.pop(event.request_id, None)
+
+    def _record(self, database, name, command, duration_ms):
+        collection, query, sort = _command_parts(name, command)
+        shape = {"ns": f"{database}.{collection}", "op": name, "filter": _shape(query), "sort": sort}
+        shape_id = hashlib.sha1(json.dumps(shape, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        # Stored as JSON text: operator keys like "$regex" are not valid field names
+        redacted = json.dumps(_redact(query), default=str)
+        sort = json.dumps(sort, default=str)
+
+        logger.warning(
+            "Slow query %.1fms %s %s shape=%s filter=%s sort=%s",
+            duration_ms, name, shape["ns"], shape_id, redacted, sort
+        )
+
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._shapes.get(shape_id)
+            if entry is None:
+                entry = self._shapes[shape_id] = {
+                    "ns": shape["ns"], "op": name, "shape": json.dumps(shape["filter"], sort_keys=True),
+                    "filter": redacted, "sort": sort,
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_seen": now,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["last_seen"] = now
+
+            explained = self._explained.get(shape_id, 0)
+            want_explain = name in EXPLAINABLE_COMMANDS and explained < settings.SLOW_QUERY_EXPLAIN_SAMPLES
+            if want_explain:
+                self._explained[shape_id] = explained + 1
+
+        if want_explain and self._loop is not None:
+            job = (shape_id, database, _explain_target(name, command), duration_ms)
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+
+    # ----- background work (runs on the event loop) -----
+
+    def start(self, db):
+        """Start explain capture and periodic flushing for this worker"""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._explain_worker(db)),
+            asyncio.create_task(self._flush_worker(db)),
+        ]
+
+    async def stop(self, db):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._loop = None
+        await self.flush(db)
+
+    async def _explain_worker(self, db):
+        client = db.client
+        while True:
+            shape_id, database, command, duration_ms = await self._queue.get()
+            try:
+                plan = await client[database].command(
+                    {"explain": command, "verbosity": "executionStats"}
+                )
+            except Exception as e:
+                logger.warning("Explain failed for slow query shape %s: %s", shape_id, e)
+                continue
+            stats = plan.get("executionStats", {})
+            summary = {
+                "captured_at": datetime.utcnow(),
+                "observed_ms": round(duration_ms, 3),
+                "execution_ms": stats.get("executionTimeMillis"),
+                "docs_examined": stats.get("totalDocsExamined"),
+                "keys_examined": stats.get("totalKeysExamined"),
+                "returned": stats.get("nReturned"),
+                "winning_plan": json.dumps(plan.get("queryPlanner", {}).get("winningPlan"), default=str),
+            }
+            with self._lock:
+                self._explains.setdefault(shape_id, []).append(summary)
+
+    async def _flush_worker(self, db):
+        while True:
+            await asyncio.sleep(settings.SLOW_QUERY_FLUSH_INTERVAL)
+            try:
+                await self.flush(db)
+            except Exception as e:
+                logger.warning("Failed to flush slow query shapes: %s", e)
+
+    async def flush(self, db):
+        """Merge the in-memory shape counters into the slow_query_shapes collection"""
+        with self._lock:
+            shapes, self._shapes = self._shapes, {}
+            explains, self._explains = self._explains, {}
+        if not shapes and not explains:
+            return
+
+        ops = []
+        for shape_id, entry in shapes.items():
+            ops.append(UpdateOne(
+                {"_id": shape_id},
+                {
+                    "$inc": {"count": entry["count"], "total_ms": entry["total_ms"]},
+                    "$max": {"max_ms": entry["max_ms"], "last_seen": entry["last_seen"]},
+                    "$set": {"ns": entry["ns"], "op": entry["op"], "shape": entry["shape"],
+                             "filter": entry["filter"], "sort": entry["sort"]},
+                    "$setOnInsert": {"first_seen": entry["last_seen"], "explains": []},
+                },
+                upsert=True
+            ))
+        for shape_id, plans in explains.items():
+            # Keep only the first few plans captured for each shape
+            ops.append(UpdateOne(
+                {"_id": shape_id},
+                {"$push": {"explains": {"$each": plans, "$slice": settings.SLOW_QUERY_EXPLAIN_SAMPLES}}}
+            ))
+        await db[SLOW_QUERY_COLLECTION].bulk_write(ops, ordered=True)
+
+    async def top_shapes(self, db, limit: int = 20, sort_by: str = "total_ms"):
+        """Slow query shapes ranked by total (or max/count) time across all workers"""
+        await self.flush(db)
+        cursor = db[SLOW_QUERY_COLLECTION].find({}).sort(sort_by, -1).limit(limit)
+        docs = await cursor.to_list(length=limit)
+        for d in docs:
+            d["avg_ms"] = round(d["total_ms"] / d["count"], 3) if d.get("count") else 0
+        return docs
+
+
+slow_query_recorder = SlowQueryRecorder()
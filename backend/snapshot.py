@@ -0,0 +1,424 @@
+"""
+In-memory columnar snapshot of the catalog for serving product listings.
+
+The catalog only changes when the scraper runs, so with SNAPSHOT_ENABLED each
+worker loads the products collection into NumPy arrays at startup and again
+after crawls finish (a new ``crawl_runs`` summary or a finalized
+``crawl_refreshes`` document). A scheduler pass finishes many crawls in a
+row, so a reload waits until no crawl has finished for
+SNAPSHOT_SETTLE_SECONDS, or at most SNAPSHOT_MAX_RELOAD_DELAY_SECONDS after
+the first one. The filterable fields are columns: price and
+discount as float32, brand, category and gender as integer codes into small
+vocabularies (with the rows of each code), and in-stock sizes as bit planes.
+The listing document of every product is a zlib-compressed blob in one
+packed buffer.
+
+Listing filters, sorts and pagination then run as vectorized operations.
+Sort orders are precomputed permutations. A selective brand, category or
+gender narrows the query to that code's rows before the other filters are
+tested; otherwise one boolean mask covers the catalog and the page is read
+off the permutation in chunks until ``skip + limit`` matches are found. Only
+the documents on the page are decoded.
+
+Anything the snapshot cannot answer the way MongoDB would (text search,
+other sort fields, an invalid regex, no snapshot loaded yet) returns None
+and the route falls back to MongoDB. NumPy is optional; without it the
+engine stays off.
+"""
+import asyncio
+import logging
+import marshal
+import re
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import Binary, Decimal128, Int64, ObjectId, Regex
+from pymongo.errors import PyMongoError
+
+from config import settings
+from metrics import record_cache_lookup, snapshot_products, snapshot_queries
+from categorize import normalize_category
+from sizes import parse_sizes
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, see SNAPSHOT_ENABLED
+    np = None
+
+logger = logging.getLogger("savekaro.snapshot")
+
+# Fields of the Product response model, i.e. what a listing returns per product
+CARD_FIELDS = [
+    "_id", "title", "brand", "price", "original_price", "discount_percent", "gender", "category",
+    "url", "image_url", "images", "source", "currency", "tags", "scraped_at", "variants", "available_sizes",
+]
+LOAD_BATCH_SIZE = 5000
+SPARSE_DENSITY_DIVISOR = 50  # match sets under 1/50 of the catalog are ranked directly, not scanned for
+
+
+def _plain(value):
+    """BSON values as marshal-able Python values, the way the API serializes them.
+
+    marshal only takes exact builtin types, so BSON subclasses (Int64 variant
+    ids, Binary) become their base type.
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if isinstance(value, Int64):
+        return int(value)
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, Regex):
+        return value.pattern
+    if isinstance(value, Binary):
+        return bytes(value)
+    return value
+
+
+def _number(value) -> float:
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else float("nan")
+
+
+class _Vocabulary:
+    """Distinct string values of one field, the integer code of each row (-1 = missing)
+    and, per code, the rows that carry it"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.index = {}
+        self.codes = array("i")
+        self.by_code = self.bounds = None
+
+    def add(self, value):
+        if not isinstance(value, str):
+            self.codes.append(-1)
+            return
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def freeze(self):
+        dtype = np.int16 if len(self.values) < 2 ** 15 else np.int32
+        self.codes = np.frombuffer(self.codes, dtype=np.int32).astype(dtype)
+        self.by_code = np.argsort(self.codes, kind="stable").astype(np.int32)
+        self.bounds = np.searchsorted(self.codes[self.by_code], np.arange(-1, len(self.values) + 1))
+
+    def matching(self, pattern: str) -> Optional[List[int]]:
+        """Codes whose value matches a case-insensitive regex, like {"$regex": pattern, "$options": "i"}"""
+        try:
+            regex = re.compile(pattern, re.IGNORECASE)
+        except re.error:
+            return None
+        return [code for code, value in enumerate(self.values) if regex.search(value)]
+
+    def count(self, codes: List[int]) -> int:
+        return sum(int(self.bounds[c + 2] - self.bounds[c + 1]) for c in codes)
+
+    def rows(self, codes: List[int]):
+        return np.concatenate([self.by_code[self.bounds[c + 1]:self.bounds[c + 2]] for c in codes])
+
+    def test(self, codes: List[int], values):
+        if len(codes) <= 8:
+            mask = values == codes[0]
+            for code in codes[1:]:
+                mask |= values == code
+            return mask
+        table = np.zeros(len(self.values) + 1, dtype=bool)
+        table[codes] = True
+        return table[values]  # -1 picks the trailing False
+
+
+class CatalogSnapshot:
+    """One immutable, fully loaded snapshot of the products collection"""
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.loaded_at = datetime.utcnow()
+        self.size = 0
+        self.price = self.discount = None
+        self.brands, self.categories, self.genders = _Vocabulary(), _Vocabulary(), _Vocabulary()
+        self.size_codes = {}
+        self.size_planes = None  # bit (code % 8) of plane (code // 8) is set when the size is in stock
+        self.blob = None
+        self.offsets = None
+        self.orders = {}
+        self.ranks = {}
+        self._cards = OrderedDict()
+
+    @classmethod
+    def load(cls, collection, generation) -> "CatalogSnapshot":
+        """Build a snapshot from a (synchronous) PyMongo collection; runs in a worker thread"""
+        snap = cls(generation)
+        prices, discounts = array("f"), array("f")
+        size_rows, size_codes = array("i"), array("i")
+        blob, offsets = bytearray(), array("q", [0])
+        cursor = collection.find({}, {f: 1 for f in CARD_FIELDS}).sort("_id", 1).batch_size(LOAD_BATCH_SIZE)
+        for row, doc in enumerate(cursor):
+            prices.append(_number(doc.get("price")))
+            discounts.append(_number(doc.get("discount_percent")))
+            snap.brands.add(doc.get("brand"))
+            snap.categories.add(doc.get("category"))
+            snap.genders.add(doc.get("gender"))
+            for size in doc.get("available_sizes") or ():
+                size_rows.append(row)
+                size_codes.append(snap.size_codes.setdefault(size, len(snap.size_codes)))
+            # marshal is only an in-process format here; it decodes several times faster than JSON
+            blob += zlib.compress(marshal.dumps({k: _plain(v) for k, v in doc.items()}), 1)
+            offsets.append(len(blob))
+
+        snap.size = n = len(offsets) - 1
+        snap.price = np.frombuffer(prices, dtype=np.float32).copy()
+        snap.discount = np.frombuffer(discounts, dtype=np.float32).copy()
+        for vocabulary in (snap.brands, snap.categories, snap.genders):
+            vocabulary.freeze()
+        codes = np.frombuffer(size_codes, dtype=np.int32)
+        snap.size_planes = np.zeros(((len(snap.size_codes) + 7) // 8, n), dtype=np.uint8)
+        np.bitwise_or.at(snap.size_planes, (codes // 8, np.frombuffer(size_rows, dtype=np.int32)),
+                         (1 << (codes % 8)).astype(np.uint8))
+        snap.blob = blob  # kept as is; a bytes() copy would double the peak while loading
+        snap.offsets = np.frombuffer(offsets, dtype=np.int64).copy()
+
+        # Same placement of missing values as MongoDB: first ascending, last descending;
+        # ties keep _id order
+        for field, column in (("price", snap.price), ("discount_percent", snap.discount)):
+            missing = np.isnan(column)
+            snap.orders[(field, 1)] = np.argsort(np.where(missing, -np.inf, column), kind="stable").astype(np.int32)
+            snap.orders[(field, -1)] = np.argsort(np.where(missing, np.inf, -column), kind="stable").astype(np.int32)
+        # Position of every row in each order, to sort a small match set without walking the order
+        for key, order in snap.orders.items():
+            rank = np.empty(n, dtype=np.int32)
+            rank[order] = np.arange(n, dtype=np.int32)
+            snap.ranks[key] = rank
+        return snap
+
+    def card(self, row: int) -> dict:
+        """The listing document of a row, as a fresh dict the caller may modify"""
+        card = self._cards.get(row)
+        record_cache_lookup("snapshot_cards", card is not None)
+        if card is None:
+            start, end = self.offsets[row], self.offsets[row + 1]
+            card = marshal.loads(zlib.decompress(self.blob[start:end]))
+            self._cards[row] = card
+            if len(self._cards) > settings.SNAPSHOT_CARD_CACHE_SIZE:
+                self._cards.popitem(last=False)
+        else:
+            self._cards.move_to_end(row)
+        return dict(card)
+
+    def query(
+        self,
+        brand: Optional[str] = None,
+        gender: Optional[str] = None,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_discount: Optional[int] = None,
+        search: Optional[str] = None,
+        size: Optional[str] = None,
+        sort_field: str = "discount_percent",
+        sort_direction: int = -1,
+        skip: int = 0,
+        limit: int = 50,
+    ) -> Optional[Tuple[int, List[dict]]]:
+        """(total, page of listing documents) for the listing filters, or None to fall back to MongoDB.
+
+        Mirrors build_product_query: brand is a case-insensitive regex, gender
+        an exact lowercase match, category an exact match on its normalized
+        code, sizes any-of.
+        """
+        key = (sort_field, sort_direction)
+        if key not in self.orders or search:
+            return None
+
+        # Each condition maps a column picker (whole column, or a subset of rows) to a mask
+        conditions = []
+        postings = []  # (row count, vocabulary, codes) of the code filters
+        for vocabulary, pattern in ((self.brands, brand), (self.categories, category), (self.genders, gender)):
+            if not pattern:
+                continue
+            if vocabulary is not self.brands:
+                value = pattern.lower() if vocabulary is self.genders else normalize_category(pattern)
+                codes = [vocabulary.index[value]] if value in vocabulary.index else []
+            else:
+                codes = vocabulary.matching(pattern)
+                if codes is None:
+                    return None
+            if not codes:
+                return 0, []
+            postings.append((vocabulary.count(codes), vocabulary, codes))
+            conditions.append(lambda pick, v=vocabulary, c=codes: v.test(c, pick(v.codes)))
+        # NaN (missing or non-numeric) never satisfies a comparison, as in MongoDB
+        if min_price is not None:
+            conditions.append(lambda pick: pick(self.price) >= min_price)
+        if max_price is not None:
+            conditions.append(lambda pick: pick(self.price) <= max_price)
+        if min_discount is not None:
+            conditions.append(lambda pick: pick(self.discount) >= min_discount)
+        if size:
+            sizes = parse_sizes(size)
+            if sizes:
+                codes = [self.size_codes[s] for s in sizes if s in self.size_codes]
+                if not codes:
+                    return 0, []
+                conditions.append(lambda pick, c=codes: self._in_stock(c, pick))
+
+        if not conditions:
+            rows = self.orders[key][skip:skip + limit]
+            return self.size, [self.card(int(r)) for r in rows]
+
+        smallest = min(postings, key=lambda p: p[0]) if postings else None
+        if smallest and smallest[0] * SPARSE_DENSITY_DIVISOR <= self.size:
+            # A selective brand/category/gender: test the other conditions on its rows only
+            _, vocabulary, codes = smallest
+            rows = vocabulary.rows(codes)
+            for condition in conditions:
+                rows = rows[condition(lambda column: column[rows])]
+                if not len(rows):
+                    break
+            total = len(rows)
+            return total, [self.card(int(r)) for r in self._rank(key, rows, skip, limit)]
+
+        mask = None
+        for condition in conditions:
+            test = condition(lambda column: column)
+            mask = test if mask is None else np.logical_and(mask, test, out=mask)
+        total = int(np.count_nonzero(mask))
+        rows = self._page(key, mask, total, skip, limit)
+        return total, [self.card(int(r)) for r in rows]
+
+    def _in_stock(self, codes: List[int], pick):
+        mask = None
+        for plane in sorted({c // 8 for c in codes}):
+            bits = sum(1 << (c % 8) for c in set(codes) if c // 8 == plane)
+            test = (pick(self.size_planes[plane]) & np.uint8(bits)).view(bool)
+            mask = test if mask is None else np.logical_or(mask, test, out=mask)
+        return mask
+
+    def _rank(self, key, rows, skip, limit):
+        """Rows skip..skip+limit of a match set in sort order, via each row's rank"""
+        need = min(skip + limit, len(rows))
+        if skip >= need:
+            return []
+        rank = self.ranks[key][rows]
+        if need < len(rows):
+            top = np.argpartition(rank, need - 1)[:need]
+            rows, rank = rows[top], rank[top]
+        return rows[np.argsort(rank)][skip:need]
+
+    def _page(self, key, mask, total, skip, limit):
+        """Rows skip..skip+limit, in sort order, of the rows that pass ``mask``"""
+        if total * SPARSE_DENSITY_DIVISOR <= self.size:
+            return self._rank(key, np.flatnonzero(mask), skip, limit)
+        # Many matches: they are dense in the order, so the page is found after a short scan
+        need = min(skip + limit, total)
+        if skip >= need:
+            return []
+        order = self.orders[key]
+        density = total / self.size
+        found, count, pos, chunk = [], 0, 0, 0
+        while count < need and pos < self.size:
+            # Range filters on the sort field leave long runs without matches; grow past them
+            chunk = max(4096, int((need - count) / density * 1.25), chunk * 2)
+            rows = order[pos:pos + chunk]
+            hits = rows[mask[rows]]
+            found.append(hits)
+            count += len(hits)
+            pos += chunk
+        return np.concatenate(found)[skip:need]
+
+
+class SnapshotEngine:
+    """Keeps the current CatalogSnapshot of this worker and reloads it once crawls settle"""
+
+    def __init__(self):
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._task = None
+        self._failed_generation = None  # a generation whose documents could not be loaded
+
+    def start(self, db):
+        if not settings.SNAPSHOT_ENABLED:
+            return
+        if np is None:
+            logger.warning("SNAPSHOT_ENABLED is set but NumPy is not installed; listings are served from MongoDB")
+            return
+        self._task = asyncio.create_task(self._refresh(db))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self.snapshot = None
+
+    async def generation(self, db) -> list:
+        """Identifies the last finished crawl: newest run summary and newest finalized refresh"""
+        run = await db[settings.CRAWL_RUNS_COLLECTION].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        refresh = await db[settings.CRAWL_REFRESHES_COLLECTION].find_one(
+            {"status": "done"}, {"finished_at": 1}, sort=[("finished_at", -1)]
+        )
+        return [str(run["_id"]) if run else None, refresh.get("finished_at") if refresh else None]
+
+    async def _refresh(self, db):
+        seen, changed_at, pending_since = None, None, None
+        while True:
+            try:
+                generation = await self.generation(db)
+                now = time.monotonic()
+                if generation != seen:
+                    seen, changed_at = generation, now
+                if self.snapshot is not None and self.snapshot.generation == generation:
+                    pending_since = None
+                elif generation != self._failed_generation:
+                    if pending_since is None:
+                        pending_since = now
+                    settled = now - changed_at >= settings.SNAPSHOT_SETTLE_SECONDS
+                    overdue = now - pending_since >= settings.SNAPSHOT_MAX_RELOAD_DELAY_SECONDS
+                    if self.snapshot is None or settled or overdue:
+                        await self._load(db, generation)
+                        pending_since = None
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logger.warning("Catalog snapshot refresh failed: %s", e)
+            except Exception:
+                # Not retried until the next crawl; listings keep the previous snapshot or MongoDB
+                logger.exception("Catalog snapshot could not be built for generation %s", seen)
+                self._failed_generation = seen
+            await asyncio.sleep(settings.SNAPSHOT_POLL_SECONDS)
+
+    async def _load(self, db, generation):
+        started = time.perf_counter()
+        # The build is CPU-bound; a thread with the synchronous client keeps the loop serving
+        collection = db[settings.COLLECTION_NAME].delegate
+        snapshot = await asyncio.to_thread(CatalogSnapshot.load, collection, generation)
+        self.snapshot = snapshot
+        snapshot_products.set((), snapshot.size)
+        logger.info("Catalog snapshot loaded: %d products in %.1fs (generation %s)",
+                    snapshot.size, time.perf_counter() - started, generation)
+
+    def query(self, **filters) -> Optional[Tuple[int, List[dict]]]:
+        """Serve a listing from the snapshot; None means the caller should query MongoDB"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            if settings.SNAPSHOT_ENABLED:
+                snapshot_queries.inc(("unavailable",))
+            return None
+        result = snapshot.query(**filters)
+        snapshot_queries.inc(("served" if result is not None else "fallback",))
+        return result
+
+
+catalog_snapshot = SnapshotEngine()
@@ -0,0 +1,33 @@
+import importlib.util
+import os
+
+import categorize
+from categorize import normalize_category
+from routes.products import build_product_query
+
+SAMPLES = [
+    "Sweaters", "Kurti", "KAMEEZ", "t-shirt", "Tee", "Button Down", "Cargo Pant", "Trousers",
+    "Denim", "Track Suit", "Maxi", "3 Piece", "Hooded Top", "pants", "other", "Fragrance",
+    "  shalwar  ", "", None,
+]
+
+
+def _scraper_categorize():
+    path = os.path.join(os.path.dirname(__file__), "..", "..", "scraper", "pk_deals", "utils", "categorize.py")
+    spec = importlib.util.spec_from_file_location("scraper_categorize", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_vocabulary_mirrors_the_scraper():
+    scraper = _scraper_categorize()
+    assert categorize.TYPE_KEYWORDS == scraper.TYPE_KEYWORDS
+    assert categorize.CATEGORIES == scraper.CATEGORIES
+    assert [normalize_category(s) for s in SAMPLES] == [scraper.normalize_category(s) for s in SAMPLES]
+
+
+def test_category_filter_is_an_equality_match():
+    assert build_product_query(category="Kurti") == {"category": "kurta"}
+    assert build_product_query(category="shoes") == {"category": "other"}
+    assert build_product_query(category=".*") == {"category": "other"}
@@ -0,0 +1,104 @@
+import asyncio
+
+from fastapi import HTTPException
+
+import coalesce
+from coalesce import SingleFlight, query_key
+
+
+class _Calls:
+    def __init__(self, delay=0.05, result="page", error=None):
+        self.count = 0
+        self.cancelled = 0
+        self.delay = delay
+        self.result = result
+        self.error = error
+
+    async def __call__(self):
+        self.count += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_query_key_ignores_dict_order():
+    assert query_key("find", {"a": 1, "b": {"c": 2, "d": 3}}) == query_key("find", {"b": {"d": 3, "c": 2}, "a": 1})
+    assert query_key("find", {"a": 1}) != query_key("count", {"a": 1})
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight("test")
+    calls = _Calls()
+
+    async def run():
+        return await asyncio.gather(*(flights.do("k", calls) for _ in range(50)))
+
+    assert asyncio.run(run()) == ["page"] * 50
+    assert calls.count == 1
+    assert not flights._flights
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    flights = SingleFlight("test")
+    calls = _Calls(error=ValueError("boom"))
+
+    async def run():
+        results = await asyncio.gather(*(flights.do("k", calls) for _ in range(5)), return_exceptions=True)
+        # The next call after a failure runs again
+        calls.error = None
+        return results, await flights.do("k", calls)
+
+    results, retry = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert retry == "page"
+    assert calls.count == 2
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    flights = SingleFlight("test")
+    calls = _Calls(delay=0.1)
+
+    async def run():
+        leader = asyncio.create_task(flights.do("k", calls))
+        follower = asyncio.create_task(flights.do("k", calls))
+        await asyncio.sleep(0.01)
+        # The leader's client disconnects
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "page"
+    assert calls.count == 1
+    assert calls.cancelled == 0
+
+
+def test_timeout_is_a_504_and_an_abandoned_call_is_cancelled():
+    flights = SingleFlight("test")
+    calls = _Calls(delay=5)
+
+    async def run():
+        results = await asyncio.gather(*(flights.do("k", calls, timeout=0.05) for _ in range(3)),
+                                       return_exceptions=True)
+        await asyncio.sleep(0)
+        return results
+
+    results = asyncio.run(run())
+    assert [r.status_code for r in results if isinstance(r, HTTPException)] == [504, 504, 504]
+    assert calls.cancelled == 1
+    assert not flights._flights
+
+
+def test_disabled_runs_every_call(monkeypatch):
+    monkeypatch.setattr(coalesce.settings, "COALESCE_ENABLED", False)
+    flights = SingleFlight("test")
+    calls = _Calls()
+
+    async def run():
+        return await asyncio.gather(*(flights.do("k", calls) for _ in range(3)))
+
+    asyncio.run(run())
+    assert calls.count == 3
@@ -0,0 +1,86 @@
+import asyncio
+
+from pymongo.errors import AutoReconnect
+
+import deal_stream
+from deal_stream import DealHub
+
+
+class _Stream:
+    def __init__(self, changes, fail):
+        self.changes = list(changes)
+        self.fail = fail
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.changes:
+            return self.changes.pop(0)
+        if self.fail:
+            raise AutoReconnect("connection reset")
+        await asyncio.sleep(3600)
+
+
+class _Collection:
+    """Change stream that delivers two events, drops, then delivers the rest"""
+
+    name = "deal_events"
+
+    def __init__(self):
+        self.opened_with = []
+
+    def watch(self, pipeline, resume_after=None):
+        self.opened_with.append(resume_after)
+        if len(self.opened_with) == 1:
+            return _Stream([self._change(1), self._change(2)], fail=True)
+        return _Stream([self._change(3)], fail=False)
+
+    @staticmethod
+    def _change(n):
+        return {"_id": {"_data": f"token-{n}"}, "fullDocument": {"_id": n, "type": "new", "brand": "Outfitters"}}
+
+
+def test_change_stream_resumes_after_last_event(monkeypatch):
+    monkeypatch.setattr(deal_stream.settings, "DEAL_STREAM_RETRY_SECONDS", 0)
+    hub = DealHub()
+    collection = _Collection()
+
+    async def run():
+        sub = hub.subscribe(brand="outfitters")
+        task = asyncio.create_task(hub._follow(collection))
+        frames = [await asyncio.wait_for(sub.queue.get(), 1) for _ in range(3)]
+        task.cancel()
+        return frames
+
+    frames = asyncio.run(run())
+    assert collection.opened_with == [None, {"_data": "token-2"}]
+    assert [f.split(b"\n")[0] for f in frames] == [b"id: 1", b"id: 2", b"id: 3"]
+
+
+def test_stream_endpoint_subscribes_only_once_streaming(monkeypatch):
+    from starlette.requests import Request
+
+    from routes import products
+
+    hub = DealHub()
+    monkeypatch.setattr(products, "deal_hub", hub)
+    request = Request({"type": "http", "method": "GET", "path": "/api/products/stream", "headers": []})
+
+    async def run():
+        response = await products.stream_deals(request, brand=None, category=None, gender=None)
+        # A client that went away before the body started: the generator never runs
+        assert not hub._subscribers
+        body = response.body_iterator
+        assert (await body.__anext__()).startswith(b"retry:")
+        assert len(hub._subscribers) == 1
+        await body.aclose()
+        assert not hub._subscribers
+
+    asyncio.run(run())
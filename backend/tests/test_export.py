@@ -0,0 +1,122 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+
+import mongomock
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+from routes import products
+from routes.products import DEFAULT_EXPORT_FIELDS, build_product_query
+
+DOCS = [
+    {"_id": ObjectId(), "title": f"Polo {i}", "brand": "Outfitters" if i % 2 else "Khaadi",
+     "price": 1000.0 + i * 100, "discount_percent": 10 * (i % 5), "gender": "men" if i % 3 else "women",
+     "category": "shirt" if i % 4 else "kurta", "url": f"https://example.pk/p{i}", "tags": ["Sale", "New, In"],
+     "variants": [{"title": "M", "price": 1000.0}], "available_sizes": ["M"] if i % 2 else ["S", "L"]}
+    for i in range(40)
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    collection = AsyncMongoMockClient()["catalog"]["products"]
+
+    async def get_collection():
+        return collection
+
+    async def seed():
+        await collection.insert_many([dict(d) for d in DOCS])
+
+    monkeypatch.setattr(products, "get_collection", get_collection)
+    app = FastAPI()
+    app.include_router(products.router)
+    with TestClient(app) as client:
+        client.portal.call(seed)
+        yield client
+
+
+def _mongo_ids(**filters):
+    collection = mongomock.MongoClient().db.products
+    collection.insert_many([dict(d) for d in DOCS])
+    return [str(d["_id"]) for d in collection.find(build_product_query(**filters)).sort("_id", 1)]
+
+
+def test_ndjson_export_defaults(client):
+    response = client.get("/api/products/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="products.ndjson"'
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["_id"] for r in rows] == sorted(str(d["_id"]) for d in DOCS)
+    assert set(rows[0]) == {f for f in DEFAULT_EXPORT_FIELDS if f in DOCS[0]}
+    assert "variants" not in rows[0]
+
+
+def test_csv_export_with_selected_fields(client):
+    response = client.get("/api/products/export", params={"format": "csv", "fields": "title, price,tags,variants"})
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["title", "price", "tags", "variants"]
+    assert rows[1] == ["Polo 0", "1000.0", "Sale|New, In", '[{"title": "M", "price": 1000.0}]']
+    assert len(rows) == len(DOCS) + 1
+
+
+def test_gzip_stream_is_one_valid_gzip_member(client):
+    with client.stream("GET", "/api/products/export", params={"gzip": True, "fields": "_id"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        raw = b"".join(response.iter_raw())
+    lines = gzip.decompress(raw).decode().splitlines()
+    assert [json.loads(line)["_id"] for line in lines] == sorted(str(d["_id"]) for d in DOCS)
+
+
+async def _cursor(docs):
+    for doc in docs:
+        yield doc
+
+
+def _chunks(fmt, fields, compress):
+    async def collect():
+        return [c async for c in products._export_chunks(_cursor(DOCS * 20), fmt, fields, compress)]
+    return asyncio.run(collect())
+
+
+def test_large_export_is_streamed_in_chunks(monkeypatch):
+    monkeypatch.setattr(products, "EXPORT_CHUNK_BYTES", 1024)
+    plain = _chunks("ndjson", DEFAULT_EXPORT_FIELDS, False)
+    assert len(plain) > 1
+    assert len(b"".join(plain).decode().splitlines()) == len(DOCS) * 20
+
+    compressed = _chunks("csv", ["title", "price"], True)
+    assert len(compressed) > 1
+    assert gzip.decompress(b"".join(compressed)).decode().count("\r\n") == len(DOCS) * 20 + 1
+
+
+@pytest.mark.parametrize("fields", ["title,password", " , "])
+def test_unknown_fields_are_rejected(client, fields):
+    response = client.get("/api/products/export", params={"fields": fields})
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Unknown export fields")
+
+
+def test_invalid_format_is_rejected(client):
+    assert client.get("/api/products/export", params={"format": "xml"}).status_code == 422
+
+
+@pytest.mark.parametrize("filters", [
+    {"brand": "outfitters"},
+    {"gender": "Women", "category": "Kurti"},
+    {"min_price": 2000, "max_price": 3000, "min_discount": 20},
+    {"size": "s,l"},
+    {"search": "polo 1"},
+])
+def test_export_filters_match_the_listing_query(client, filters):
+    response = client.get("/api/products/export", params={**filters, "fields": "_id"})
+    ids = [json.loads(line)["_id"] for line in response.text.splitlines()]
+    assert ids == _mongo_ids(**filters)
+    assert ids  # every case selects something
@@ -0,0 +1,191 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import DuplicateKeyError
+
+import favorites
+from config import settings
+from database import Database
+from favorites import add_favorite, ensure_favorite_indexes, favorite_ids, list_favorites, remove_favorite
+from migrate_favorites import migrate_users, recount
+from models import User
+from routes import auth
+
+USER = ObjectId()
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def db():
+    db = AsyncMongoMockClient()["savekaro"]
+
+    async def setup():
+        await ensure_favorite_indexes(db)
+        await db[settings.COLLECTION_NAME].insert_many([{"_id": ObjectId(), "title": f"p{i}"} for i in range(5)])
+        return [p["_id"] async for p in db[settings.COLLECTION_NAME].find().sort("_id", 1)]
+
+    db.product_ids = _run(setup())
+    return db
+
+
+async def _count(db, product_id):
+    return (await db[settings.COLLECTION_NAME].find_one({"_id": product_id})).get("favorite_count", 0)
+
+
+def test_counter_moves_only_on_a_real_change(db):
+    product = db.product_ids[0]
+
+    async def scenario():
+        assert await add_favorite(db, USER, product) is True
+        assert await add_favorite(db, USER, product) is False
+        assert await _count(db, product) == 1
+        assert await add_favorite(db, ObjectId(), product) is True
+        assert await _count(db, product) == 2
+        assert await remove_favorite(db, USER, product) is True
+        assert await remove_favorite(db, USER, product) is False
+        assert await _count(db, product) == 1
+
+    _run(scenario())
+
+
+def test_counter_never_goes_below_zero(db):
+    product = db.product_ids[0]
+
+    async def scenario():
+        await add_favorite(db, USER, product)
+        # A counter already repaired to 0 (or never migrated) stays at 0
+        await db[settings.COLLECTION_NAME].update_one({"_id": product}, {"$set": {"favorite_count": 0}})
+        assert await remove_favorite(db, USER, product) is True
+        assert await _count(db, product) == 0
+
+    _run(scenario())
+
+
+def test_concurrent_duplicate_add_does_not_count_twice(db, monkeypatch):
+    product = db.product_ids[0]
+    _run(add_favorite(db, USER, product))
+
+    class _LostUpsert:
+        """The favorites collection as seen by an add that raced another add of the same pair"""
+
+        def __init__(self, collection):
+            self.collection = collection
+
+        async def update_one(self, *args, **kwargs):
+            raise DuplicateKeyError("E11000 duplicate key error")
+
+    class _Db:
+        def __getitem__(self, name):
+            return _LostUpsert(db[name]) if name == settings.FAVORITES_COLLECTION else db[name]
+
+    assert _run(add_favorite(_Db(), USER, product)) is False
+    assert _run(_count(db, product)) == 1
+
+
+def test_list_favorites_pages_newest_first(db):
+    async def scenario():
+        for product in db.product_ids:
+            await add_favorite(db, USER, product)
+            await asyncio.sleep(0.002)
+        # Archived since it was saved: still counted, left out of the page
+        await db[settings.COLLECTION_NAME].delete_one({"_id": db.product_ids[3]})
+        first = await list_favorites(db, USER, 0, 2)
+        second = await list_favorites(db, USER, 2, 2)
+        ids = await favorite_ids(db, USER)
+        return first, second, ids
+
+    first, second, ids = _run(scenario())
+    newest = [str(p) for p in reversed(db.product_ids)]
+    assert first == (5, [{"_id": newest[0], "title": "p4", "favorite_count": 1}])
+    assert second[0] == 5 and [p["_id"] for p in second[1]] == newest[2:4]
+    assert sorted(ids) == sorted(str(p) for p in db.product_ids)
+
+
+def test_favorites_routes(db, monkeypatch):
+    monkeypatch.setattr(Database, "db", db)
+    app = FastAPI()
+    app.include_router(auth.router)
+    app.dependency_overrides[auth.get_current_user] = lambda: User(_id=str(USER), email="a@example.pk", name="A")
+    product = str(db.product_ids[1])
+    with TestClient(app) as client:
+        assert client.post("/api/auth/favorites/add", json={"product_id": product}).status_code == 200
+        assert client.post("/api/auth/favorites/add", json={"product_id": "nope"}).status_code == 400
+        body = client.get("/api/auth/favorites", params={"limit": 10}).json()
+        assert (body["total"], [p["_id"] for p in body["favorites"]], body["limit"]) == (1, [product], 10)
+        assert client.get("/api/auth/me").json()["favorites"] == [product]
+        assert client.post("/api/auth/favorites/remove", json={"product_id": product}).status_code == 200
+        assert client.get("/api/auth/favorites").json()["total"] == 0
+
+
+def _sync_db():
+    db = mongomock.MongoClient().savekaro
+    for keys, options in favorites.FAVORITE_INDEXES:
+        db[settings.FAVORITES_COLLECTION].create_index(keys, **options)
+    return db
+
+
+def test_migration_moves_arrays_and_keeps_their_order():
+    db = _sync_db()
+    a, b = ObjectId(), ObjectId()
+    db.users.insert_many([
+        {"_id": USER, "favorites": [str(a), "not-an-id", str(b), str(a)]},
+        {"_id": ObjectId(), "favorites": []},
+    ])
+    stats = migrate_users(db, 100, dry_run=False, keep_arrays=False)
+    assert stats == {"users": 1, "favorites": 2, "invalid_ids": 1, "arrays_removed": 1}
+    saved = list(db[settings.FAVORITES_COLLECTION].find({"user_id": USER}).sort("saved_at", -1))
+    assert [f["product_id"] for f in saved] == [b, a]
+    assert "favorites" not in db.users.find_one({"_id": USER})
+    # Re-running finds nothing left to move
+    assert migrate_users(db, 100, dry_run=False, keep_arrays=False)["users"] == 0
+
+
+def test_migration_keeps_an_array_changed_since_it_was_read(monkeypatch):
+    db = _sync_db()
+    a, b = ObjectId(), ObjectId()
+    db.users.insert_one({"_id": USER, "favorites": [str(a)]})
+    collection = db[settings.FAVORITES_COLLECTION]
+    bulk_write = collection.bulk_write
+
+    def bulk_write_then_old_api_adds(ops, **kwargs):
+        result = bulk_write(ops, **kwargs)
+        db.users.update_one({"_id": USER}, {"$push": {"favorites": str(b)}})
+        return result
+
+    monkeypatch.setattr(collection, "bulk_write", bulk_write_then_old_api_adds)
+    assert migrate_users(db, 100, dry_run=False, keep_arrays=False)["arrays_removed"] == 0
+    assert db.users.find_one({"_id": USER})["favorites"] == [str(a), str(b)]
+
+
+def test_dry_run_writes_nothing():
+    db = _sync_db()
+    db.users.insert_one({"_id": USER, "favorites": [str(ObjectId())]})
+    assert migrate_users(db, 100, dry_run=True, keep_arrays=False)["favorites"] == 1
+    assert db[settings.FAVORITES_COLLECTION].count_documents({}) == 0
+    assert "favorites" in db.users.find_one({"_id": USER})
+
+
+def test_recount_sets_counts_and_resets_stale_counters():
+    db = _sync_db()
+    products = db[settings.COLLECTION_NAME]
+    saved, drifted, stale = ObjectId(), ObjectId(), ObjectId()
+    products.insert_many([
+        {"_id": saved}, {"_id": drifted, "favorite_count": 7}, {"_id": stale, "favorite_count": 3},
+    ])
+    now = datetime.utcnow()
+    db[settings.FAVORITES_COLLECTION].insert_many([
+        {"user_id": ObjectId(), "product_id": saved, "saved_at": now},
+        {"user_id": ObjectId(), "product_id": saved, "saved_at": now - timedelta(days=1)},
+        {"user_id": ObjectId(), "product_id": drifted, "saved_at": now},
+    ])
+    assert recount(db, batch_size=1) == {"products_counted": 2, "counters_reset": 1}
+    assert {p["_id"]: p.get("favorite_count") for p in products.find()} == {saved: 2, drifted: 1, stale: 0}
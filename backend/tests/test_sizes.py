@@ -0,0 +1,27 @@
+import importlib.util
+import os
+
+import sizes
+from sizes import normalize_size, parse_sizes
+
+
+def test_normalize_size_matches_stored_codes():
+    assert normalize_size(" m ") == "M"
+    assert normalize_size("xxl") == "XXL"
+    assert normalize_size("Free Size") == "FREE"
+    assert normalize_size("w32") == "32"
+    assert normalize_size("3-4 yrs") == "3-4Y"
+    assert normalize_size("60") is None
+    assert normalize_size("") is None
+
+
+def test_parse_sizes_dedupes_and_keeps_unknown_values():
+    assert parse_sizes("m, Medium,32,,xl,petite") == ["M", "32", "XL", "PETITE"]
+
+
+def test_alias_table_mirrors_the_scraper():
+    path = os.path.join(os.path.dirname(__file__), "..", "..", "scraper", "pk_deals", "utils", "sizes.py")
+    spec = importlib.util.spec_from_file_location("scraper_sizes", path)
+    scraper_sizes = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(scraper_sizes)
+    assert sizes.SIZE_ALIASES == scraper_sizes.SIZE_ALIASES
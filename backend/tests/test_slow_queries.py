@@ -0,0 +1,62 @@
+import re
+from datetime import datetime
+
+from bson import ObjectId
+from bson.regex import Regex
+
+from slow_queries import _command_parts, _redact, _shape
+
+
+def test_shape_ignores_values_and_key_order():
+    a = _shape({"price": {"$gte": 100, "$lte": 500}, "brand": "Outfitters"})
+    b = _shape({"brand": "Limelight", "price": {"$lte": 9, "$gte": 1}})
+    assert a == b == {"brand": 1, "price": {"$gte": 1, "$lte": 1}}
+
+
+def test_shape_sorts_logical_branches():
+    a = _shape({"$or": [{"title": "x"}, {"brand": "y"}]})
+    b = _shape({"$or": [{"brand": "z"}, {"title": "w"}]})
+    assert a == b == {"$or": [{"brand": 1}, {"title": 1}]}
+
+
+def test_shape_keeps_operators_apart():
+    assert _shape({"price": {"$gte": 1}}) != _shape({"price": {"$lt": 1}})
+    assert _shape({"category": {"$in": ["a", "b"]}}) == {"category": {"$in": 1}}
+
+
+def test_redact_replaces_literals_with_type_markers():
+    redacted = _redact({
+        "_id": ObjectId(),
+        "title": "Lawn kurta",
+        "price": {"$gte": 1500.0},
+        "in_stock": True,
+        "scraped_at": {"$gt": datetime(2024, 1, 1)},
+        "brand": re.compile("^out", re.I),
+        "sku": Regex("^ab"),
+        "category": None,
+    })
+    assert redacted == {
+        "_id": "<oid>",
+        "title": "<str>",
+        "price": {"$gte": "<num>"},
+        "in_stock": "<bool>",
+        "scraped_at": {"$gt": "<date>"},
+        "brand": "<regex>",
+        "sku": "<regex>",
+        "category": None,
+    }
+
+
+def test_redact_truncates_long_lists():
+    assert _redact({"brand": {"$in": ["a", "b", "c", "d", "e"]}}) == {
+        "brand": {"$in": ["<str>", "<str>", "<str>", "<+2 more>"]}
+    }
+
+
+def test_command_parts_reads_first_match_and_sort_of_a_pipeline():
+    command = {
+        "aggregate": "products",
+        "pipeline": [{"$match": {"gender": "men"}}, {"$sort": {"price": 1}}, {"$match": {"brand": "x"}}],
+    }
+    assert _command_parts("aggregate", command) == ("products", {"gender": "men"}, {"price": 1})
+    assert _command_parts("count", {"count": "products", "query": {"brand": "x"}}) == ("products", {"brand": "x"}, None)
@@ -0,0 +1,155 @@
+import asyncio
+import random
+
+import mongomock
+import pytest
+from bson import Decimal128, Int64, ObjectId
+
+np = pytest.importorskip("numpy")
+
+import snapshot
+from config import settings
+from routes.products import build_product_query
+from snapshot import CatalogSnapshot, SnapshotEngine
+
+BRANDS = ["Outfitters", "Khaadi", "Breakout", "Rare Label"]
+CATEGORIES = ["kurta", "jeans", "shirt", "other"]
+GENDERS = ["men", "women", "kids", "unisex"]
+SIZES = ["XS", "S", "M", "L", "XL", "32", "34"]
+
+
+@pytest.fixture
+def products():
+    rng = random.Random(7)
+    collection = mongomock.MongoClient().db.products
+    docs = []
+    for i in range(400):
+        doc = {
+            "_id": ObjectId(),
+            "title": f"Product {i}",
+            # "Rare Label" is under 1/50 of the catalog, so it takes the sparse path
+            "brand": "Rare Label" if i % 60 == 0 else rng.choice(BRANDS[:3]),
+            "category": rng.choice(CATEGORIES),
+            "gender": rng.choice(GENDERS),
+            "discount_percent": rng.choice([0, 10, 20, 30, 50]),
+            "available_sizes": rng.sample(SIZES, rng.randint(0, 3)),
+        }
+        if i % 17:  # a few products without a price sort like MongoDB puts missing values
+            doc["price"] = float(rng.randrange(500, 10000, 250))
+        docs.append(doc)
+    collection.insert_many(docs)
+    return collection
+
+
+def _mongo_page(collection, filters, sort_field, sort_direction, skip, limit):
+    query = build_product_query(**filters)
+    cursor = collection.find(query).sort([(sort_field, sort_direction), ("_id", 1)]).skip(skip).limit(limit)
+    return collection.count_documents(query), [str(d["_id"]) for d in cursor]
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"brand": "khaadi"},
+    {"brand": "Rare Label"},
+    {"brand": "Rare Label", "size": "M"},
+    {"gender": "Women", "category": "Kurti"},
+    {"category": "shoes"},
+    {"min_price": 2000, "max_price": 6000},
+    {"min_discount": 30, "size": "S,32"},
+    {"category": "jeans", "gender": "kids", "min_discount": 10},
+])
+@pytest.mark.parametrize("sort", [("discount_percent", -1), ("price", 1), ("price", -1)])
+@pytest.mark.parametrize("skip", [0, 40])
+def test_query_matches_mongo(products, filters, sort, skip):
+    snap = CatalogSnapshot.load(products, ["run", None])
+    total, page = snap.query(**filters, sort_field=sort[0], sort_direction=sort[1], skip=skip, limit=25)
+    assert (total, [d["_id"] for d in page]) == _mongo_page(products, filters, *sort, skip, 25)
+
+
+def test_load_converts_bson_scalars():
+    collection = mongomock.MongoClient().db.products
+    collection.insert_one({
+        "title": "Lawn Suit",
+        "price": Decimal128("4999.50"),
+        "variants": [{"variant_id": Int64(40123456789012), "title": "M"}],
+    })
+    snap = CatalogSnapshot.load(collection, ["run", None])
+    card = snap.card(0)
+    assert card["variants"][0]["variant_id"] == 40123456789012
+    assert type(card["variants"][0]["variant_id"]) is int
+    assert card["price"] == 4999.5
+    assert snap.query(min_price=4999)[0] == 1
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _run_refresh(monkeypatch, engine, generations, load, step=60):
+    """Drive SnapshotEngine._refresh over one poll per entry of ``generations``"""
+    clock = _Clock()
+    monkeypatch.setattr(snapshot.time, "monotonic", clock)
+    monkeypatch.setattr(settings, "SNAPSHOT_POLL_SECONDS", 0)
+    monkeypatch.setattr(settings, "SNAPSHOT_SETTLE_SECONDS", 300)
+    monkeypatch.setattr(settings, "SNAPSHOT_MAX_RELOAD_DELAY_SECONDS", 1800)
+    polls = iter(generations)
+
+    async def generation(db):
+        clock.now += step
+        try:
+            return next(polls)
+        except StopIteration:
+            raise asyncio.CancelledError
+
+    engine.generation = generation
+    engine._load = load
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(engine._refresh(None))
+
+
+def test_refresh_waits_for_crawls_to_settle(monkeypatch):
+    engine = SnapshotEngine()
+    loads = []
+
+    async def load(db, generation):
+        loads.append(generation)
+        engine.snapshot = CatalogSnapshot(generation)
+
+    # Loaded at once on startup, then a crawl finishing every poll for 10 polls,
+    # then quiet: reloaded once, 300s after the last one
+    generations = ["g0"] + [f"g{i}" for i in range(1, 11)] + ["g10"] * 6
+    _run_refresh(monkeypatch, engine, generations, load)
+    assert loads == ["g0", "g10"]
+
+
+def test_refresh_reloads_when_crawls_never_settle(monkeypatch):
+    engine = SnapshotEngine()
+    loads = []
+
+    async def load(db, generation):
+        loads.append(generation)
+        engine.snapshot = CatalogSnapshot(generation)
+
+    # g1 is seen at 120s; a crawl finishing every poll is loaded 1800s later
+    _run_refresh(monkeypatch, engine, [f"g{i}" for i in range(40)], load)
+    assert loads == ["g0", "g31"]
+
+
+def test_refresh_survives_a_bad_document(monkeypatch):
+    engine = SnapshotEngine()
+    loads = []
+
+    async def load(db, generation):
+        loads.append(generation)
+        if generation == "bad":
+            raise ValueError("unmarshallable object")
+        engine.snapshot = CatalogSnapshot(generation)
+
+    # The failing generation is not retried every poll; the next crawl is loaded
+    _run_refresh(monkeypatch, engine, ["bad"] * 5 + ["good"] * 6, load)
+    assert loads == ["bad", "good"]
+    assert engine.snapshot.generation == "good"
@@ -0,0 +1,95 @@
+"""
+Backfill the normalized gender and category onto stored products.
+
+CleanAndComputePipeline now stores ``gender`` as one of men, women, kids,
+unisex or other and ``category`` from a fixed vocabulary (see
+pk_deals.utils.categorize). This job walks an existing collection in _id
+order, in batches, and rewrites the documents whose values differ. Each
+update is conditional on the old values, so a crawl writing the same
+product concurrently wins. Afterwards the top-deals lists, which are keyed
+by gender and category, are rebuilt.
+
+Usage (from scraper/):
+  python -m pk_deals.backfill --dry-run
+  python -m pk_deals.backfill
+  python -m pk_deals.backfill --collection products_archive --no-rank
+"""
+import argparse
+import json
+import logging
+import time
+from collections import Counter
+
+from pymongo import MongoClient, UpdateOne
+
+from pk_deals.ranking import materialize_top_deals
+from pk_deals.utils.categorize import normalize_labels
+from pk_deals.utils.mongo import get_mongo_uri, get_mongo_db, get_mongo_collection
+
+logger = logging.getLogger(__name__)
+
+PROJECTION = {"gender": 1, "category": 1, "title": 1, "tags": 1}
+
+
+def backfill_labels(col, batch_size=1000, dry_run=False):
+    """Normalize gender/category across ``col``; returns a summary dict"""
+    summary = {"scanned": 0, "updated": 0, "changes": Counter()}
+    last_id = None
+    started = time.perf_counter()
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(col.find(query, PROJECTION).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        ops = []
+        for doc in batch:
+            old = (doc.get("gender"), doc.get("category"))
+            new = normalize_labels(old[0], old[1], doc.get("title"), doc.get("tags"))
+            if new == old:
+                continue
+            summary["changes"][f"{old[0]} -> {new[0]}"] += old[0] != new[0]
+            summary["changes"][f"{old[1]} -> {new[1]}"] += old[1] != new[1]
+            ops.append(UpdateOne(
+                {"_id": doc["_id"], "gender": old[0], "category": old[1]},
+                {"$set": {"gender": new[0], "category": new[1]}},
+            ))
+        summary["scanned"] += len(batch)
+        if ops and not dry_run:
+            summary["updated"] += col.bulk_write(ops, ordered=False).modified_count
+        elif ops:
+            summary["updated"] += len(ops)
+        logger.info("Backfill: %d scanned, %d updated", summary["scanned"], summary["updated"])
+
+    summary["changes"] = {k: v for k, v in summary["changes"].most_common() if v}
+    summary["elapsed_sec"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pk_deals.backfill",
+                                     description="Normalize gender and category on stored products")
+    parser.add_argument("--mongo-uri", default=None, help="Defaults to MONGO_URI")
+    parser.add_argument("--db", default=None, help="Defaults to DB_NAME")
+    parser.add_argument("--collection", default=None, help="Defaults to MONGO_COLLECTION")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Count the changes without writing")
+    parser.add_argument("--no-rank", action="store_true", help="Skip rebuilding the top-deals lists")
+    parser.add_argument("--top-collection", default="top_deals")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    client = MongoClient(args.mongo_uri or get_mongo_uri())
+    try:
+        db = client[args.db or get_mongo_db()]
+        col = db[args.collection or get_mongo_collection()]
+        summary = backfill_labels(col, args.batch_size, args.dry_run)
+        if summary["updated"] and not args.dry_run and not args.no_rank:
+            summary["top_deals_lists"] = materialize_top_deals(col, db[args.top_collection])
+        print(json.dumps(summary, indent=2))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
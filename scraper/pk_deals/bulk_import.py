@@ -0,0 +1,277 @@
+"""
+Streaming bulk import of scraped product feeds into MongoDB.
+
+Feeds may be a JSON array (like scraper/bonanza.json) or JSON Lines; both are
+parsed incrementally. Every record goes through CleanAndComputePipeline and
+is upserted by url with parallel bulk_write batches. Progress is checkpointed
+so an interrupted import resumes where it stopped.
+
+Usage (from scraper/):
+  python -m pk_deals.bulk_import bonanza.json outfitters.json limelight.json
+  python -m pk_deals.bulk_import big-feed.jsonl --batch-size 2000 --workers 8
+  python -m pk_deals.bulk_import bonanza.json --dry-run --jsonl-out bonanza.jsonl
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from pymongo import MongoClient, UpdateOne
+from scrapy.exceptions import DropItem
+
+from pk_deals.items import ProductItem
+from pk_deals.pipelines import CleanAndComputePipeline, ensure_indexes
+from pk_deals.utils.mongo import get_mongo_uri, get_mongo_db, get_mongo_collection
+
+READ_CHUNK = 1 << 16
+
+
+def iter_json_array(f):
+    """Yield the elements of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    # Skip to the opening bracket
+    while True:
+        if pos >= len(buf):
+            if eof:
+                return
+            fill()
+            continue
+        ch = buf[pos]
+        pos += 1
+        if ch == "[":
+            break
+        if not ch.isspace():
+            raise ValueError("Feed is not a JSON array")
+
+    while True:
+        # Skip separators between elements
+        while pos < len(buf) and (buf[pos].isspace() or buf[pos] == ","):
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                raise ValueError("Unexpected end of feed: missing ']'")
+            fill()
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        pos = end
+        yield obj
+
+
+def iter_json_lines(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(path):
+    """Yield records from a JSON array or JSON Lines feed, detected from the first character"""
+    with open(path, "r", encoding="utf-8") as f:
+        first = ""
+        while True:
+            ch = f.read(1)
+            if not ch or not ch.isspace():
+                first = ch
+                break
+        f.seek(0)
+        if first == "[":
+            yield from iter_json_array(f)
+        else:
+            yield from iter_json_lines(f)
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class Checkpoint:
+    """Tracks how many leading records of a feed are safely written.
+
+    Batches may finish out of order; only the contiguous prefix of finished
+    batches advances the saved position.
+    """
+
+    def __init__(self, path, feed):
+        self.path = path
+        self.feed = os.path.abspath(feed)
+        self.done = 0
+        self._finished = {}  # batch start -> batch end
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get("feed") == self.feed:
+                self.done = saved.get("records_done", 0)
+
+    def finished(self, start, end):
+        self._finished[start] = end
+        while self.done in self._finished:
+            self.done = self._finished.pop(self.done)
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"feed": self.feed, "records_done": self.done}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def write_batch(col, docs):
+    ops = [UpdateOne({"url": d["url"]}, {"$set": d}, upsert=True) for d in docs]
+    result = col.bulk_write(ops, ordered=False)
+    return result.upserted_count, result.modified_count
+
+
+def import_feed(path, col, args):
+    """Import one feed; returns a stats dict"""
+    pipeline = CleanAndComputePipeline()
+    fields = set(ProductItem.fields)
+    checkpoint = Checkpoint(None if args.no_checkpoint else path + ".checkpoint", path)
+    resume_from = checkpoint.done
+    jsonl_out = open(args.jsonl_out, "a" if resume_from else "w", encoding="utf-8") if args.jsonl_out else None
+
+    stats = Counter()
+    drops = Counter()
+    started = time.monotonic()
+    last_progress = 0.0
+    pending = {}  # future -> (start, end)
+    batch, batch_start = [], resume_from
+
+    def report(final=False):
+        elapsed = time.monotonic() - started
+        rate = stats["read"] / elapsed if elapsed else 0
+        sys.stderr.write(
+            f"\r{os.path.basename(path)}: read {stats['read']:,} | written {stats['written']:,} "
+            f"(new {stats['inserted']:,}, changed {stats['modified']:,}) | dropped {stats['dropped']:,} "
+            f"| {rate:,.0f} rec/s" + ("\n" if final else "")
+        )
+        sys.stderr.flush()
+
+    def collect(done_futures):
+        for fut in done_futures:
+            start, end = pending.pop(fut)
+            inserted, modified = fut.result()
+            stats["inserted"] += inserted
+            stats["modified"] += modified
+            checkpoint.finished(start, end)
+        checkpoint.save()
+
+    def submit(docs, start, end):
+        if col is None:
+            checkpoint.finished(start, end)
+            return
+        # Bound in-flight batches so memory stays flat on huge feeds
+        while len(pending) >= args.workers * 2:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+        pending[executor.submit(write_batch, col, docs)] = (start, end)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for index, record in enumerate(iter_records(path)):
+            if index < resume_from:
+                continue
+            stats["read"] += 1
+            try:
+                item = pipeline.process_item(ProductItem({k: v for k, v in record.items() if k in fields}), None)
+            except DropItem as e:
+                stats["dropped"] += 1
+                drops[str(e)] += 1
+                item = None
+
+            if item is not None:
+                doc = dict(item)
+                batch.append(doc)
+                stats["written"] += 1
+                if jsonl_out:
+                    jsonl_out.write(json.dumps(doc, default=_json_default) + "\n")
+
+            if len(batch) >= args.batch_size:
+                submit(batch, batch_start, index + 1)
+                batch, batch_start = [], index + 1
+
+            if time.monotonic() - last_progress > 1:
+                last_progress = time.monotonic()
+                report()
+
+        total = resume_from + stats["read"]
+        if batch:
+            submit(batch, batch_start, total)
+        elif total > batch_start:
+            # Trailing records were all dropped
+            checkpoint.finished(batch_start, total)
+        if pending:
+            collect(wait(pending).done)
+
+    if jsonl_out:
+        jsonl_out.close()
+    report(final=True)
+    checkpoint.clear()
+    stats["resumed_from"] = resume_from
+    stats["elapsed_sec"] = round(time.monotonic() - started, 2)
+    return dict(stats), dict(drops)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pk_deals.bulk_import", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("feeds", nargs="+", help="JSON array or JSON Lines feed files")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Records per bulk_write")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel bulk_write batches")
+    parser.add_argument("--mongo-uri", default=None, help="Defaults to MONGO_URI")
+    parser.add_argument("--db", default=None, help="Defaults to DB_NAME")
+    parser.add_argument("--collection", default=None, help="Defaults to MONGO_COLLECTION")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and normalize only, no writes")
+    parser.add_argument("--no-checkpoint", action="store_true", help="Do not save or resume from a checkpoint")
+    parser.add_argument("--jsonl-out", help="Also write normalized records to this JSON Lines file")
+    args = parser.parse_args(argv)
+    if args.jsonl_out and len(args.feeds) > 1:
+        parser.error("--jsonl-out takes a single feed")
+
+    client = None
+    col = None
+    if not args.dry_run:
+        client = MongoClient(args.mongo_uri or get_mongo_uri())
+        col = client[args.db or get_mongo_db()][args.collection or get_mongo_collection()]
+        ensure_indexes(col)
+
+    try:
+        for path in args.feeds:
+            stats, drops = import_feed(path, col, args)
+            print(json.dumps({"feed": path, **stats, "drop_reasons": drops}))
+    finally:
+        if client:
+            client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""
+Crawl coordinator: a Mongo-backed queue of crawl units shared by workers on any node.
+
+A refresh is one crawl generation split into units, one per brand or, with
+``--per-collection``, one per brand collection. Workers claim units with a
+lease, keep the lease alive with heartbeats while a ``scrapy crawl brand``
+subprocess runs the unit, and record its crawl report on the unit. Units whose
+worker died are reclaimed once the lease expires, up to CRAWL_JOB_MAX_ATTEMPTS.
+When the last unit of a refresh settles, the worker that settled it sweeps
+stale products of every fully crawled brand and rebuilds the top-deals lists
+once for the whole refresh.
+
+Run from scraper/:
+  python -m pk_deals.coordinator enqueue                  # every brand, one unit each
+  python -m pk_deals.coordinator enqueue --per-collection --brand outfitters
+  python -m pk_deals.coordinator work                     # on each node; Ctrl-C requeues the unit
+  python -m pk_deals.coordinator status
+  python -m pk_deals.coordinator finalize <generation>    # re-run a finalize that crashed
+"""
+import argparse
+import datetime
+import glob
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from pymongo import ASCENDING, MongoClient, ReturnDocument
+from scrapy.utils.project import get_project_settings
+
+from pk_deals.ranking import materialize_top_deals
+from pk_deals.spiders.brand_loader import load_brand_configs
+from pk_deals.sweep import ensure_archive_indexes, new_generation, sweep_stale
+from pk_deals.utils.mongo import get_mongo_uri, get_mongo_db, get_mongo_collection
+
+logger = logging.getLogger(__name__)
+
+SCRAPER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SUPPORTED_PLATFORMS = ("shopify",)
+# Report fields copied onto the unit; per-collection detail stays in the report file
+RESULT_FIELDS = ("finish_reason", "elapsed_sec", "items", "changed", "dropped")
+
+
+def utcnow():
+    return datetime.datetime.utcnow()
+
+
+def ensure_queue_indexes(jobs):
+    jobs.create_index([("status", ASCENDING), ("enqueued_at", ASCENDING)])
+    jobs.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
+    jobs.create_index([("generation", ASCENDING), ("status", ASCENDING)])
+
+
+def plan_units(brands, per_collection=False, only=None):
+    """(key, brand name, collection indexes or None) for each unit of a refresh.
+
+    ``only`` maps brand keys to the collection indexes to crawl (one unit
+    each); brands missing from it are crawled whole.
+    """
+    units = []
+    for cfg in brands:
+        if cfg.get("platform") not in SUPPORTED_PLATFORMS:
+            logger.warning("Skipping %s: unsupported platform %s", cfg.get("key"), cfg.get("platform"))
+            continue
+        indexes = range(len(cfg.get("collections") or []))
+        if only and cfg["key"] in only:
+            units.extend((cfg["key"], cfg["brand"], [i]) for i in only[cfg["key"]] if i in indexes)
+        elif per_collection:
+            units.extend((cfg["key"], cfg["brand"], [i]) for i in indexes)
+        else:
+            units.append((cfg["key"], cfg["brand"], None))
+    return units
+
+
+def enqueue_refresh(jobs, refreshes, brands, per_collection=False, generation=None, only=None):
+    """Queue one unit per brand (or brand collection) under a new generation; returns the generation.
+
+    A refresh that leaves out some of a brand's collections (see ``only``) is
+    partial: its finalize ranks but does not sweep, since products of the
+    skipped collections were not re-stamped.
+    """
+    generation = generation or new_generation()
+    units = plan_units(brands, per_collection, only)
+    if not units:
+        raise ValueError("No crawlable brands to enqueue")
+    partial = any(
+        set(range(len(cfg.get("collections") or []))) - set(only[cfg["key"]])
+        for cfg in brands if only and cfg.get("key") in only
+    )
+    now = utcnow()
+    refreshes.insert_one({
+        "_id": generation,
+        "status": "running",
+        "per_collection": per_collection or bool(only),
+        "partial": partial,
+        "brands": sorted({brand for _, brand, _ in units}),
+        "units": len(units),
+        "created_at": now,
+    })
+    jobs.insert_many([
+        {
+            "_id": f"{generation}:{key}" + (f":{','.join(map(str, idx))}" if idx is not None else ""),
+            "generation": generation,
+            "key": key,
+            "brand": brand,
+            "collections": idx,
+            "status": "queued",
+            "attempts": 0,
+            "enqueued_at": now,
+        }
+        for key, brand, idx in units
+    ])
+    logger.info("Enqueued %d units for generation %s", len(units), generation)
+    return generation
+
+
+def reap_expired(jobs, max_attempts):
+    """Fail units whose lease expired after their last allowed attempt; returns their generations"""
+    query = {"status": "running", "lease_expires_at": {"$lt": utcnow()}, "attempts": {"$gte": max_attempts}}
+    generations = jobs.distinct("generation", query)
+    if generations:
+        jobs.update_many(query, {"$set": {"status": "failed", "error": "lease expired", "finished_at": utcnow()}})
+    return generations
+
+
+def claim_unit(jobs, worker_id, lease_seconds, max_attempts):
+    """Atomically take the oldest queued unit, or one whose worker stopped heartbeating"""
+    now = utcnow()
+    return jobs.find_one_and_update(
+        {
+            "$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_expires_at": {"$lt": now}},
+            ],
+            "attempts": {"$lt": max_attempts},
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker": worker_id,
+                "started_at": now,
+                "heartbeat_at": now,
+                "lease_expires_at": now + datetime.timedelta(seconds=lease_seconds),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("enqueued_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def renew_lease(jobs, unit_id, worker_id, lease_seconds):
+    """Extend the lease; False once another worker has reclaimed the unit"""
+    now = utcnow()
+    result = jobs.update_one(
+        {"_id": unit_id, "worker": worker_id, "status": "running"},
+        {"$set": {"heartbeat_at": now, "lease_expires_at": now + datetime.timedelta(seconds=lease_seconds)}},
+    )
+    return result.matched_count == 1
+
+
+def settle_unit(jobs, unit, worker_id, ok, result, error, max_attempts):
+    """Record the outcome; failed units go back to the queue until attempts run out"""
+    if ok:
+        status = "done"
+    elif unit["attempts"] < max_attempts:
+        status = "queued"
+    else:
+        status = "failed"
+    update = {"status": status, "result": result, "error": error, "finished_at": utcnow()}
+    res = jobs.update_one({"_id": unit["_id"], "worker": worker_id, "status": "running"}, {"$set": update})
+    return status if res.matched_count else None
+
+
+def release_unit(jobs, unit, worker_id):
+    """Hand a unit back without counting the attempt (worker shutting down)"""
+    jobs.update_one(
+        {"_id": unit["_id"], "worker": worker_id, "status": "running"},
+        {"$set": {"status": "queued"}, "$unset": {"worker": "", "lease_expires_at": ""}, "$inc": {"attempts": -1}},
+    )
+
+
+def finalize_refresh(db, generation, settings, force=False):
+    """Sweep brands whose units all finished and rebuild the top-deals lists, once per refresh.
+
+    Returns the refresh summary, or None while units are still pending or when
+    another worker already took the finalize.
+    """
+    jobs = db[settings.get("CRAWL_JOBS_COLLECTION")]
+    refreshes = db[settings.get("CRAWL_REFRESHES_COLLECTION")]
+    if jobs.count_documents({"generation": generation, "status": {"$in": ["queued", "running"]}}):
+        return None
+    claim = {"_id": generation} if force else {"_id": generation, "status": "running"}
+    refresh = refreshes.find_one_and_update(claim, {"$set": {"status": "finalizing", "finalizing_at": utcnow()}})
+    if refresh is None:
+        return None
+
+    col = db[get_mongo_collection()]
+    failed_brands = set(jobs.distinct("brand", {"generation": generation, "status": "failed"}))
+    summary = {"sweeps": [], "unswept": sorted(failed_brands)}
+
+    if refresh.get("partial"):
+        summary["unswept"] = refresh["brands"]
+    elif settings.getbool("STALE_SWEEP_ENABLED"):
+        archive = db[settings.get("ARCHIVE_COLLECTION")]
+        ensure_archive_indexes(archive, settings.getfloat("ARCHIVE_RETENTION_DAYS"))
+        for brand in refresh["brands"]:
+            # A brand with a failed unit was only partly crawled; sweeping it would archive live products
+            if brand in failed_brands:
+                logger.warning("Not sweeping %s: a unit of generation %s failed", brand, generation)
+                continue
+            summary["sweeps"].append(
+                sweep_stale(col, archive, brand, generation, settings.getfloat("STALE_SWEEP_MAX_FRACTION"))
+            )
+    if settings.get("TOP_DEALS_COLLECTION"):
+        summary["top_deals_lists"] = materialize_top_deals(
+            col, db[settings.get("TOP_DEALS_COLLECTION")], settings.getint("TOP_DEALS_SIZE")
+        )
+
+    refreshes.update_one({"_id": generation}, {"$set": {"status": "done", "finished_at": utcnow(), **summary}})
+    logger.info("Finalized generation %s: %s", generation, summary)
+    return summary
+
+
+def crawl_command(unit, report_dir):
+    cmd = [
+        sys.executable, "-m", "scrapy", "crawl", "brand",
+        "-a", f"key={unit['key']}",
+        "-a", f"generation={unit['generation']}",
+        # The coordinator sweeps and ranks once per refresh instead of after every unit
+        "-a", "sweep=0",
+        "-s", "TOP_DEALS_COLLECTION=",
+        "-s", f"CRAWL_REPORT_DIR={report_dir}",
+    ]
+    if unit.get("collections") is not None:
+        cmd += ["-a", "collections=" + ",".join(map(str, unit["collections"]))]
+    return cmd
+
+
+def read_report(report_dir):
+    paths = sorted(glob.glob(os.path.join(report_dir, "*.json")))
+    if not paths:
+        return None
+    with open(paths[-1]) as f:
+        return json.load(f)
+
+
+class Worker:
+    """Claims units and runs each as a ``scrapy crawl brand`` subprocess, heartbeating its lease"""
+
+    def __init__(self, db, settings, worker_id=None, poll_seconds=10.0):
+        self.db = db
+        self.settings = settings
+        self.jobs = db[settings.get("CRAWL_JOBS_COLLECTION")]
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = settings.getint("CRAWL_JOB_LEASE_SECONDS")
+        self.max_attempts = settings.getint("CRAWL_JOB_MAX_ATTEMPTS")
+        self.poll_seconds = poll_seconds
+
+    def run(self, once=False):
+        ensure_queue_indexes(self.jobs)
+        logger.info("Worker %s waiting for crawl units", self.worker_id)
+        while True:
+            for generation in reap_expired(self.jobs, self.max_attempts):
+                finalize_refresh(self.db, generation, self.settings)
+            unit = claim_unit(self.jobs, self.worker_id, self.lease_seconds, self.max_attempts)
+            if unit is None:
+                if once:
+                    return
+                time.sleep(self.poll_seconds)
+                continue
+            status = self.run_unit(unit)
+            if status in ("done", "failed"):
+                finalize_refresh(self.db, unit["generation"], self.settings)
+
+    def run_unit(self, unit):
+        logger.info("Running %s (attempt %d)", unit["_id"], unit["attempts"])
+        with tempfile.TemporaryDirectory(prefix="crawl-unit-") as report_dir:
+            proc = subprocess.Popen(crawl_command(unit, report_dir), cwd=SCRAPER_DIR)
+            lost = threading.Event()
+            stop = threading.Event()
+            beat = threading.Thread(target=self._heartbeat, args=(unit, proc, stop, lost), daemon=True)
+            beat.start()
+            try:
+                returncode = proc.wait()
+            except KeyboardInterrupt:
+                proc.terminate()
+                proc.wait()
+                stop.set()
+                release_unit(self.jobs, unit, self.worker_id)
+                raise
+            finally:
+                stop.set()
+                beat.join()
+
+            if lost.is_set():
+                logger.warning("Lost the lease on %s; another worker reclaimed it", unit["_id"])
+                return None
+            report = read_report(report_dir)
+
+        result = {"returncode": returncode}
+        if report:
+            result.update({k: report.get(k) for k in RESULT_FIELDS})
+            result["brands"] = {
+                name: {k: v for k, v in data.items() if k != "collections"}
+                for name, data in (report.get("brands") or {}).items()
+            }
+        ok = returncode == 0 and bool(report) and report.get("finish_reason") == "finished"
+        error = None if ok else f"exit code {returncode}, finish reason {report and report.get('finish_reason')}"
+        status = settle_unit(self.jobs, unit, self.worker_id, ok, result, error, self.max_attempts)
+        logger.info("Unit %s %s: %s", unit["_id"], status, result)
+        return status
+
+    def _heartbeat(self, unit, proc, stop, lost):
+        interval = max(self.lease_seconds / 3, 1)
+        while not stop.wait(interval):
+            try:
+                renewed = renew_lease(self.jobs, unit["_id"], self.worker_id, self.lease_seconds)
+            except Exception as e:
+                # A short Mongo outage should not kill the crawl; the lease has slack for two misses
+                logger.warning("Heartbeat for %s failed: %s", unit["_id"], e)
+                continue
+            if not renewed:
+                lost.set()
+                proc.terminate()
+                return
+
+
+def status_summary(jobs, refreshes, generation=None):
+    if generation is None:
+        latest = refreshes.find_one(sort=[("created_at", -1)])
+        if latest is None:
+            return {}
+        generation = latest["_id"]
+    refresh = refreshes.find_one({"_id": generation}) or {}
+    counts = {row["_id"]: row["n"] for row in jobs.aggregate([
+        {"$match": {"generation": generation}},
+        {"$group": {"_id": "$status", "n": {"$sum": 1}}},
+    ])}
+    units = list(jobs.find({"generation": generation}, {"key": 1, "collections": 1, "status": 1, "attempts": 1,
+                                                        "worker": 1, "result.items": 1, "error": 1}))
+    return {"generation": generation, "refresh": refresh.get("status"), "counts": counts, "units": units}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pk_deals.coordinator", description="Distributed crawl queue")
+    parser.add_argument("--mongo-uri", default=None, help="Defaults to MONGO_URI (also passed to crawl subprocesses)")
+    parser.add_argument("--db", default=None, help="Defaults to DB_NAME")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("enqueue", help="Queue a refresh of every (or selected) brand")
+    p.add_argument("--brand", action="append", help="brands.yml key; repeatable (default: all brands)")
+    p.add_argument("--per-collection", action="store_true", help="One unit per brand collection")
+
+    p = sub.add_parser("work", help="Claim and run units until interrupted")
+    p.add_argument("--worker-id", default=None)
+    p.add_argument("--poll", type=float, default=10.0, help="Seconds between polls of an empty queue")
+    p.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+
+    p = sub.add_parser("status", help="Unit counts for a refresh (default: the latest)")
+    p.add_argument("--generation", default=None)
+
+    p = sub.add_parser("finalize", help="Sweep and rank a refresh whose finalize did not complete")
+    p.add_argument("generation")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    # Crawl subprocesses read the same environment
+    if args.mongo_uri:
+        os.environ["MONGO_URI"] = args.mongo_uri
+    if args.db:
+        os.environ["DB_NAME"] = args.db
+    settings = get_project_settings()
+    client = MongoClient(get_mongo_uri())
+    try:
+        db = client[get_mongo_db()]
+        jobs = db[settings.get("CRAWL_JOBS_COLLECTION")]
+        refreshes = db[settings.get("CRAWL_REFRESHES_COLLECTION")]
+        if args.command == "enqueue":
+            brands = load_brand_configs()
+            if args.brand:
+                unknown = set(args.brand) - {b.get("key") for b in brands}
+                if unknown:
+                    parser.error(f"unknown brand keys: {', '.join(sorted(unknown))}")
+                brands = [b for b in brands if b.get("key") in args.brand]
+            ensure_queue_indexes(jobs)
+            generation = enqueue_refresh(jobs, refreshes, brands, args.per_collection)
+            print(json.dumps({"generation": generation, "units": jobs.count_documents({"generation": generation})}))
+        elif args.command == "work":
+            try:
+                Worker(db, settings, args.worker_id, args.poll).run(once=args.once)
+            except KeyboardInterrupt:
+                logger.info("Worker stopped")
+        elif args.command == "status":
+            print(json.dumps(status_summary(jobs, refreshes, args.generation), indent=2, default=str))
+        elif args.command == "finalize":
+            summary = finalize_refresh(db, args.generation, settings, force=True)
+            print(json.dumps(summary, indent=2, default=str))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
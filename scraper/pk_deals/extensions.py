@@ -0,0 +1,205 @@
+import datetime
+import json
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+
+from pymongo import MongoClient
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from pk_deals.signals import mongo_write
+from pk_deals.utils.mongo import get_mongo_uri, get_mongo_db
+
+logger = logging.getLogger(__name__)
+
+
+def percentiles(samples):
+    """p50/p90/p95/p99/max of a list of seconds, reported in milliseconds"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    n = len(ordered)
+
+    def at(p):
+        return round(ordered[min(n - 1, int(p * n))] * 1000, 2)
+
+    return {"count": n, "p50": at(0.50), "p90": at(0.90), "p95": at(0.95), "p99": at(0.99), "max": at(1.0)}
+
+
+class _Bucket:
+    """Counters for one brand or one (brand, collection) pair"""
+
+    def __init__(self):
+        self.items = 0
+        self.changed = 0              # items that were new or changed price/discount/sizes
+        self.drops = Counter()
+        self.pages = Counter()        # responses by kind: json / html
+        self.latency = defaultdict(list)  # download latency samples by kind
+        self.errors = Counter()       # non-200 responses by status
+        self.mongo_writes = []
+
+    def to_dict(self, elapsed):
+        return {
+            "items": self.items,
+            "items_per_sec": round(self.items / elapsed, 3) if elapsed else None,
+            "changed": self.changed,
+            "change_ratio": round(self.changed / self.items, 4) if self.items else None,
+            "dropped": sum(self.drops.values()),
+            "drop_reasons": dict(self.drops),
+            "products_json_pages": self.pages["json"],
+            "review_pages": self.pages["html"],
+            "http_errors": {str(k): v for k, v in self.errors.items()},
+            "json_fetch_ms": percentiles(self.latency["json"]),
+            "html_fetch_ms": percentiles(self.latency["html"]),
+            "mongo_write_ms": percentiles(self.mongo_writes),
+        }
+
+
+class CrawlReport:
+    """Per-brand and per-collection crawl instrumentation.
+
+    Requests carry ``brand``, ``collection`` and ``kind`` (json/html) in their
+    meta, so responses, scraped items and DropItem reasons can be attributed
+    to the collection they came from. At spider close a JSON report is written
+    to CRAWL_REPORT_DIR and a summary document is stored in the
+    CRAWL_RUNS_COLLECTION Mongo collection of the database MongoPipeline
+    writes to.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.report_dir = crawler.settings.get("CRAWL_REPORT_DIR")
+        self.runs_collection = crawler.settings.get("CRAWL_RUNS_COLLECTION")
+        # Same database as MongoPipeline: MONGO_URI / MONGO_DATABASE settings override the environment
+        self.mongo_uri = crawler.settings.get("MONGO_URI") or get_mongo_uri()
+        self.mongo_db = crawler.settings.get("MONGO_DATABASE") or get_mongo_db()
+        self.brands = defaultdict(_Bucket)
+        self.collections = defaultdict(_Bucket)
+        self.started_at = None
+        self.started = None
+        self.last_report = None
+        self.pending_changes = {}  # url -> changed, from mongo_write until item_scraped
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CRAWL_REPORT_ENABLED"):
+            raise NotConfigured
+        ext = cls(crawler)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(ext.item_dropped, signal=signals.item_dropped)
+        crawler.signals.connect(ext.mongo_write, signal=mongo_write)
+        return ext
+
+    @staticmethod
+    def _meta(response):
+        # Items yielded from an errback come with the twisted Failure instead of
+        # a response; the failed request is attached to it
+        meta = getattr(response, "meta", None)
+        if meta is None:
+            meta = getattr(getattr(response, "request", None), "meta", None)
+        return meta or {}
+
+    def _buckets(self, meta):
+        brand = meta.get("brand")
+        if brand is None:
+            return ()
+        return self.brands[brand], self.collections[(brand, meta.get("collection"))]
+
+    def spider_opened(self, spider):
+        self.started_at = datetime.datetime.utcnow()
+        self.started = time.monotonic()
+
+    def response_received(self, response, request, spider):
+        kind = request.meta.get("kind")
+        for bucket in self._buckets(request.meta):
+            bucket.pages[kind] += 1
+            latency = request.meta.get("download_latency")
+            if latency is not None:
+                bucket.latency[kind].append(latency)
+            if response.status != 200:
+                bucket.errors[response.status] += 1
+
+    def item_scraped(self, item, response, spider):
+        changed = self.pending_changes.pop(item.get("url"), False)
+        for bucket in self._buckets(self._meta(response)):
+            bucket.items += 1
+            bucket.changed += changed
+
+    def item_dropped(self, item, response, exception, spider):
+        reason = str(exception) or type(exception).__name__
+        for bucket in self._buckets(self._meta(response)):
+            bucket.drops[reason] += 1
+
+    def mongo_write(self, item, spider, duration, changed=False):
+        # Pipelines do not see the response, so writes are tracked per brand only;
+        # the change flag waits for item_scraped, which knows the collection
+        self.brands[item.get("brand")].mongo_writes.append(duration)
+        if changed:
+            self.pending_changes[item.get("url")] = True
+
+    def build_report(self, spider, reason):
+        finished_at = datetime.datetime.utcnow()
+        elapsed = time.monotonic() - self.started if self.started else 0
+
+        brands = {}
+        for brand, bucket in self.brands.items():
+            entry = bucket.to_dict(elapsed)
+            entry["collections"] = {
+                str(handle): c.to_dict(elapsed)
+                for (b, handle), c in self.collections.items() if b == brand
+            }
+            brands[str(brand)] = entry
+
+        return {
+            "spider": spider.name,
+            "key": getattr(spider, "key", None),
+            "started_at": self.started_at,
+            "finished_at": finished_at,
+            "elapsed_sec": round(elapsed, 3),
+            "finish_reason": reason,
+            "items": sum(b.items for b in self.brands.values()),
+            "changed": sum(b.changed for b in self.brands.values()),
+            "dropped": sum(sum(b.drops.values()) for b in self.brands.values()),
+            # products listed by several collections, built and written once
+            "duplicates_skipped": self.crawler.stats.get_value("dedup/duplicate_products", 0),
+            "brands": brands,
+            "scrapy_stats": {
+                k: v for k, v in self.crawler.stats.get_stats().items()
+                if isinstance(v, (int, float)) and not isinstance(v, bool)
+            },
+        }
+
+    def spider_closed(self, spider, reason):
+        report = self.build_report(spider, reason)
+        self.last_report = report
+
+        if self.report_dir:
+            os.makedirs(self.report_dir, exist_ok=True)
+            stamp = report["finished_at"].strftime("%Y%m%dT%H%M%S")
+            path = os.path.join(self.report_dir, f"{report['key'] or spider.name}-{stamp}.json")
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2, default=str)
+            spider.logger.info("Crawl report written to %s", path)
+
+        if self.runs_collection:
+            try:
+                client = MongoClient(self.mongo_uri, serverSelectionTimeoutMS=5000)
+                try:
+                    summary = dict(report)
+                    summary.pop("scrapy_stats")
+                    # Lists rather than dicts keyed by brand/handle keep the summaries queryable
+                    summary["brands"] = [
+                        {"brand": name, **{k: v for k, v in data.items() if k != "collections"},
+                         "collections": [{"handle": h, **c} for h, c in data["collections"].items()]}
+                        for name, data in report["brands"].items()
+                    ]
+                    client[self.mongo_db][self.runs_collection].insert_one(summary)
+                finally:
+                    client.close()
+            except Exception as e:
+                logger.warning("Could not store crawl summary in Mongo: %s", e)
@@ -10,11 +10,13 @@ class ProductItem(scrapy.Item):
     category = scrapy.Field()         # e.g. "sweater", "kurta"
     url = scrapy.Field()
     image_url = scrapy.Field()
+    images = scrapy.Field()           # {"thumb": url, "card": url, "detail": url} resized CDN variants
     source = scrapy.Field()           # domain
     currency = scrapy.Field()
     tags = scrapy.Field()
     scraped_at = scrapy.Field()
     variants = scrapy.Field()         # list of dicts: [{"size": "M", "in_stock": True, "price": 2000, "sku": "ABC123"}, ...]
+    available_sizes = scrapy.Field()  # normalized in-stock size codes, e.g. ["S", "M", "XL"]
     # Review/Rating fields
     rating = scrapy.Field()           # float: average rating (e.g., 4.5)
     review_count = scrapy.Field()     # int: total number of reviews
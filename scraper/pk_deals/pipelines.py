@@ -1,12 +1,71 @@
-import os
 import datetime
+import time
 from urllib.parse import urlparse
 
-from pymongo import MongoClient, ASCENDING
-from dotenv import load_dotenv
+from bson import ObjectId
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import CollectionInvalid
+from scrapy import signals
 from scrapy.exceptions import DropItem
 
-load_dotenv()
+from pk_deals.ranking import materialize_top_deals
+from pk_deals.signals import mongo_write
+from pk_deals.sweep import ensure_archive_indexes, new_generation, sweep_stale
+from pk_deals.utils.categorize import normalize_labels
+from pk_deals.utils.images import image_variants
+from pk_deals.utils.sizes import available_sizes, slim_variants
+from pk_deals.utils.mongo import get_mongo_uri, get_mongo_db, get_mongo_collection
+
+# A re-crawled product counts as changed when one of these differs (drives the crawl scheduler)
+CHANGE_FIELDS = ("price", "discount_percent", "available_sizes")
+
+def ensure_indexes(col):
+    """Create the product indexes used by the API filters and the url upsert key"""
+    # indexes for filtering
+    col.create_index([("brand", ASCENDING)])
+    col.create_index([("discount_percent", ASCENDING)])
+    col.create_index([("gender", ASCENDING), ("category", ASCENDING)])
+    col.create_index([("source", ASCENDING)])
+    # multikey: "in stock in size M", sorted by discount
+    col.create_index([("available_sizes", ASCENDING), ("discount_percent", ASCENDING)])
+    # stale-product sweep after each crawl
+    col.create_index([("brand", ASCENDING), ("crawl_generation", ASCENDING)])
+    # "most saved" ranking; the API maintains favorite_count as favorites change
+    col.create_index([("favorite_count", DESCENDING)], name="favorite_count",
+                     partialFilterExpression={"favorite_count": {"$gt": 0}})
+    # make unique only when url is a string (ignores missing/null)
+    col.create_index(
+        [("url", ASCENDING)],
+        name="url_unique_string_only",
+        unique=True,
+        partialFilterExpression={"url": {"$type": "string"}}
+    )
+
+def ensure_events_collection(db, name, max_bytes):
+    """Create the capped deal events collection the API streams from"""
+    try:
+        db.create_collection(name, capped=True, size=max_bytes)
+    except CollectionInvalid:
+        pass  # already exists
+    return db[name]
+
+def deal_event(kind, doc, product_id, previous_discount=None):
+    """Compact event for a newly listed product or a deeper discount"""
+    return {
+        "type": kind,
+        "product_id": product_id,
+        "title": doc.get("title"),
+        "brand": doc.get("brand"),
+        "category": doc.get("category"),
+        "gender": doc.get("gender"),
+        "price": doc.get("price"),
+        "original_price": doc.get("original_price"),
+        "discount_percent": doc.get("discount_percent"),
+        "previous_discount": previous_discount,
+        "image_url": (doc.get("images") or {}).get("card") or doc.get("image_url"),
+        "url": doc.get("url"),
+        "at": datetime.datetime.utcnow(),
+    }
 
 class CleanAndComputePipeline:
     def process_item(self, item, spider):
@@ -48,38 +107,140 @@ class CleanAndComputePipeline:
         if not item.get("url"):
             raise DropItem("Missing url")
 
+        # fixed gender enum and category vocabulary, so the API filters and groups
+        # with plain equality on the (gender, category) index
+        item["gender"], item["category"] = normalize_labels(
+            item.get("gender"), item.get("category"), item.get("title"), item.get("tags")
+        )
+
+        # resized image URLs so grids don't download originals
+        item["images"] = image_variants(item.get("image_url"))
+
+        # indexed size filter; variants keep only what the site reads
+        if item.get("variants") is not None:
+            item["available_sizes"] = available_sizes(item["variants"])
+            item["variants"] = slim_variants(item["variants"], price)
+
         item["scraped_at"] = datetime.datetime.utcnow()
         return item
 
 class MongoPipeline:
-    def __init__(self, mongo_uri=None, mongo_db=None, mongo_collection=None):
-        self.mongo_uri = mongo_uri or os.getenv("MONGO_URI", "mongodb://127.0.0.1:27017")
-        # Prefer DB_NAME, fallback to MONGO_DB for backward compatibility
-        self.mongo_db = mongo_db or os.getenv("DB_NAME") or os.getenv("MONGO_DB") or "fwd_project"
-        self.mongo_collection = mongo_collection or os.getenv("MONGO_COLLECTION", "products")
+    def __init__(self, mongo_uri=None, mongo_db=None, mongo_collection=None, crawler=None):
+        self.mongo_uri = mongo_uri or get_mongo_uri()
+        self.mongo_db = mongo_db or get_mongo_db()
+        self.mongo_collection = mongo_collection or get_mongo_collection()
+        self.crawler = crawler
+        self.generation = None
+        self.brands_seen = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        # MONGO_URI / MONGO_DATABASE / MONGO_COLLECTION settings override the environment
+        pipeline = cls(
+            mongo_uri=crawler.settings.get("MONGO_URI"),
+            mongo_db=crawler.settings.get("MONGO_DATABASE"),
+            mongo_collection=crawler.settings.get("MONGO_COLLECTION"),
+            crawler=crawler,
+        )
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
 
     def open_spider(self, spider):
         self.client = MongoClient(self.mongo_uri)
         self.db = self.client[self.mongo_db]
         self.col = self.db[self.mongo_collection]
-        # indexes for filtering
-        self.col.create_index([("brand", ASCENDING)])
-        self.col.create_index([("discount_percent", ASCENDING)])
-        self.col.create_index([("gender", ASCENDING), ("category", ASCENDING)])
-        self.col.create_index([("source", ASCENDING)])
-        # make unique only when url is a string (ignores missing/null)
-        self.col.create_index(
-            [("url", ASCENDING)],
-            name="url_unique_string_only",
-            unique=True,
-            partialFilterExpression={"url": {"$type": "string"}}
-        )
+        ensure_indexes(self.col)
+        self.events = None
+        self.archive = None
+        if self.crawler is not None and self.crawler.settings.get("ARCHIVE_COLLECTION"):
+            self.archive = self.db[self.crawler.settings.get("ARCHIVE_COLLECTION")]
+        if self.crawler is not None and self.crawler.settings.get("DEAL_EVENTS_COLLECTION"):
+            self.events = ensure_events_collection(
+                self.db,
+                self.crawler.settings.get("DEAL_EVENTS_COLLECTION"),
+                self.crawler.settings.getint("DEAL_EVENTS_MAX_BYTES"),
+            )
+        # -a generation=<id> lets a coordinator share one generation across several crawls
+        self.generation = getattr(spider, "generation", None) or new_generation()
+        spider.generation = self.generation
 
     def close_spider(self, spider):
         self.client.close()
 
     def process_item(self, item, spider):
         data = dict(item)
+        data["crawl_generation"] = self.generation
+        data["last_seen_at"] = data.get("scraped_at") or datetime.datetime.utcnow()
+        self.brands_seen.add(data.get("brand"))
         # upsert by product URL to avoid duplicates
-        self.col.update_one({"url": data["url"]}, {"$set": data}, upsert=True)
-        return item
\ No newline at end of file
+        started = time.perf_counter()
+        # The pre-image tells inserts and discount changes apart for the deal event feed
+        projection = {f: 1 for f in CHANGE_FIELDS}
+        before = self.col.find_one_and_update(
+            {"url": data["url"]}, {"$set": data}, projection=projection, return_document=ReturnDocument.BEFORE,
+        )
+        new_id = None
+        if before is None:
+            # New, or back after a sweep archived it: keep the _id that favorites,
+            # top-deals entries and product links refer to
+            archived = self.archive.find_one({"url": data["url"]}, {"_id": 1}) if self.archive is not None else None
+            new_id = archived["_id"] if archived else ObjectId()
+            before = self.col.find_one_and_update(
+                {"url": data["url"]},
+                {"$set": data, "$setOnInsert": {"_id": new_id}},
+                projection=projection,
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+            )
+        if self.events is not None:
+            if before is None:
+                self.events.insert_one(deal_event("new", data, new_id))
+            elif (data.get("discount_percent") or 0) > (before.get("discount_percent") or 0):
+                self.events.insert_one(deal_event("deeper", data, before["_id"], before.get("discount_percent")))
+        if self.crawler is not None:
+            changed = before is None or any(before.get(f) != data.get(f) for f in CHANGE_FIELDS)
+            self.crawler.signals.send_catch_log(
+                signal=mongo_write, item=item, spider=spider, duration=time.perf_counter() - started,
+                changed=changed,
+            )
+        return item
+
+    def spider_closed(self, spider, reason):
+        """After a clean finish: archive stale products, then rebuild the top-deals lists.
+
+        Skipped for a subset crawl (-a collections=...): products of the
+        collections it did not crawl keep an older generation and would be
+        archived as stale.
+        """
+        settings = self.crawler.settings
+        brands = sorted(b for b in self.brands_seen if b)
+        if reason != "finished" or not brands:
+            return
+        if getattr(spider, "collection_indexes", None) is not None:
+            spider.logger.info("Subset crawl of %s: skipping the stale sweep and top-deals rebuild", ", ".join(brands))
+            return
+        # -a sweep=0 leaves sweeping to whoever runs the remaining crawls of the generation
+        sweep = settings.getbool("STALE_SWEEP_ENABLED") \
+            and str(getattr(spider, "sweep", "1")).lower() not in ("0", "false", "no")
+        client = MongoClient(self.mongo_uri)
+        try:
+            db = client[self.mongo_db]
+            if sweep:
+                self.sweep_brands(db, brands)
+            if settings.get("TOP_DEALS_COLLECTION"):
+                materialize_top_deals(db[self.mongo_collection], db[settings.get("TOP_DEALS_COLLECTION")],
+                                      settings.getint("TOP_DEALS_SIZE"))
+        except Exception as e:
+            spider.logger.warning("Post-crawl maintenance failed: %s", e)
+        finally:
+            client.close()
+
+    def sweep_brands(self, db, brands):
+        settings = self.crawler.settings
+        archive = db[settings.get("ARCHIVE_COLLECTION")]
+        ensure_archive_indexes(archive, settings.getfloat("ARCHIVE_RETENTION_DAYS"))
+        for brand in brands:
+            summary = sweep_stale(db[self.mongo_collection], archive, brand, self.generation,
+                                  settings.getfloat("STALE_SWEEP_MAX_FRACTION"))
+            self.crawler.stats.set_value(f"sweep/{brand}/archived", summary["archived"])
+            self.crawler.stats.set_value(f"sweep/{brand}/stale", summary["stale"])
@@ -0,0 +1,201 @@
+"""
+Per-brand politeness with separate lanes for products.json and product HTML.
+
+Every request is routed to a download slot named ``<host>:<kind>`` (``kind``
+is the ``json``/``html`` meta the spider already sets), so the cheap listing
+API and the heavy review pages get their own concurrency and delay. Starting
+values come from the brand's ``politeness`` block in brands.yml:
+
+  politeness:
+    concurrency: 8        # products.json lane
+    delay: 0.25
+    html_concurrency: 2   # product page lane
+    html_delay: 1.5
+    budget: 3000          # requests per crawl; review pages are skipped once spent
+
+Each lane then adapts on its own (AIMD): a 429, a 5xx or a network error
+halves its concurrency and doubles its delay (at least Retry-After), and a
+run of responses faster than POLITENESS_TARGET_LATENCY adds one concurrent
+request back and shrinks the delay, never beyond the configured values.
+"""
+import logging
+import time
+
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+
+logger = logging.getLogger(__name__)
+
+LANES = ("json", "html")
+BACKOFF_STATUSES = {429, 500, 502, 503, 504, 520, 522, 524}
+
+
+class _Lane:
+    """Configured ceiling and adaptive state of one download slot"""
+
+    def __init__(self, key, concurrency, delay):
+        self.key = key
+        self.max_concurrency = max(int(concurrency), 1)
+        self.min_delay = max(float(delay), 0.0)
+        self.healthy = 0
+        self.last_backoff = 0.0
+
+
+class AdaptivePolitenessMiddleware:
+    """Downloader middleware that assigns lanes, enforces the request budget and adapts slots.
+
+    Settings:
+      POLITENESS_ENABLED           turn the middleware off (the replay bench does)
+      POLITENESS_DEFAULTS          lane values for brands without a politeness block
+      POLITENESS_TARGET_LATENCY    seconds; faster responses count as healthy
+      POLITENESS_RAMP_AFTER        healthy responses in a row before ramping up
+      POLITENESS_MAX_DELAY         ceiling for backed-off delays, in seconds
+    """
+
+    def __init__(self, crawler, defaults, target_latency, ramp_after, max_delay):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.defaults = defaults
+        self.target_latency = target_latency
+        self.ramp_after = ramp_after
+        self.max_delay = max_delay
+        self.lanes = {}
+        self.config = None
+        self.budget = None
+        self.spent = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("POLITENESS_ENABLED", True):
+            raise NotConfigured
+        return cls(
+            crawler,
+            settings.getdict("POLITENESS_DEFAULTS"),
+            settings.getfloat("POLITENESS_TARGET_LATENCY", 2.0),
+            settings.getint("POLITENESS_RAMP_AFTER", 20),
+            settings.getfloat("POLITENESS_MAX_DELAY", 30.0),
+        )
+
+    def _brand_config(self, spider):
+        # BrandSpider sets ``politeness`` from brands.yml before its first request
+        if self.config is None:
+            self.config = {**self.defaults, **(getattr(spider, "politeness", None) or {})}
+            budget = self.config.get("budget")
+            self.budget = int(budget) if budget else None
+        return self.config
+
+    def _lane(self, request, spider):
+        kind = request.meta.get("kind")
+        kind = kind if kind in LANES else "json"
+        key = f"{urlparse_cached(request).hostname}:{kind}"
+        lane = self.lanes.get(key)
+        if lane is None:
+            cfg = self._brand_config(spider)
+            prefix = "" if kind == "json" else "html_"
+            lane = _Lane(key, cfg.get(f"{prefix}concurrency", 4), cfg.get(f"{prefix}delay", 0.5))
+            self.lanes[key] = lane
+            # Read by the downloader when it creates (or re-creates after idling) the slot
+            self._downloader().per_slot_settings[key] = {
+                "concurrency": lane.max_concurrency,
+                "delay": lane.min_delay,
+            }
+            logger.info("Politeness lane %s: concurrency=%d delay=%.2fs", key, lane.max_concurrency, lane.min_delay)
+        return kind, lane
+
+    def _downloader(self):
+        return self.crawler.engine.downloader
+
+    def _slot(self, lane):
+        return self._downloader().slots.get(lane.key)
+
+    def _apply(self, lane, concurrency, delay):
+        slot = self._slot(lane)
+        if slot is not None:
+            slot.concurrency = concurrency
+            slot.delay = delay
+        self._downloader().per_slot_settings[lane.key] = {"concurrency": concurrency, "delay": delay}
+
+    def _current(self, lane):
+        slot = self._slot(lane)
+        if slot is not None:
+            return slot.concurrency, slot.delay
+        saved = self._downloader().per_slot_settings.get(lane.key, {})
+        return saved.get("concurrency", lane.max_concurrency), saved.get("delay", lane.min_delay)
+
+    def _backoff(self, lane, reason, retry_after=None):
+        now = time.monotonic()
+        concurrency, delay = self._current(lane)
+        # Responses already in flight report the same overload; react once per delay window
+        if now - lane.last_backoff < max(delay, 1.0):
+            return
+        lane.last_backoff = now
+        lane.healthy = 0
+        concurrency = max(concurrency // 2, 1)
+        delay = min(max(delay * 2, lane.min_delay, 0.5), self.max_delay)
+        if retry_after:
+            delay = min(max(delay, retry_after), self.max_delay)
+        self._apply(lane, concurrency, delay)
+        self.stats.inc_value("politeness/backoff")
+        self.stats.inc_value(f"politeness/backoff/{reason}")
+        logger.info("Backing off %s after %s: concurrency=%d delay=%.2fs", lane.key, reason, concurrency, delay)
+
+    def _ramp_up(self, lane):
+        lane.healthy = 0
+        concurrency, delay = self._current(lane)
+        new_concurrency = min(concurrency + 1, lane.max_concurrency)
+        new_delay = max(delay * 0.75, lane.min_delay)
+        if new_delay - lane.min_delay < 0.05:
+            new_delay = lane.min_delay
+        if (new_concurrency, new_delay) == (concurrency, delay):
+            return
+        self._apply(lane, new_concurrency, new_delay)
+        self.stats.inc_value("politeness/ramp_up")
+        logger.debug("Ramping up %s: concurrency=%d delay=%.2fs", lane.key, new_concurrency, new_delay)
+
+    def process_request(self, request, spider):
+        kind, lane = self._lane(request, spider)
+        request.meta["download_slot"] = lane.key
+
+        # HTML review pages are optional; products.json is what the catalog is built from
+        if self.budget is not None and self.spent >= self.budget and kind == "html":
+            self.stats.inc_value("politeness/budget_skipped")
+            raise IgnoreRequest(f"Request budget of {self.budget} spent")
+        self.spent += 1
+        self.stats.inc_value(f"politeness/{kind}/requests")
+        return None
+
+    def process_response(self, request, response, spider):
+        lane = self.lanes.get(request.meta.get("download_slot"))
+        if lane is None:
+            return response
+        if response.status in BACKOFF_STATUSES:
+            self._backoff(lane, str(response.status), _retry_after(response))
+        else:
+            latency = request.meta.get("download_latency")
+            if latency is not None and latency <= self.target_latency:
+                lane.healthy += 1
+                if lane.healthy >= self.ramp_after:
+                    self._ramp_up(lane)
+            else:
+                lane.healthy = 0
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if isinstance(exception, IgnoreRequest):
+            return None
+        lane = self.lanes.get(request.meta.get("download_slot"))
+        if lane is not None:
+            self._backoff(lane, type(exception).__name__)
+        return None
+
+
+def _retry_after(response):
+    """Seconds from a numeric Retry-After header, or None (HTTP dates are ignored)"""
+    value = response.headers.get(b"Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value.decode("latin-1").strip()), 0.0)
+    except ValueError:
+        return None
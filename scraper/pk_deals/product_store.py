@@ -0,0 +1,142 @@
+import json
+import os
+import sqlite3
+
+STORE_FILENAME = "products.sqlite"
+
+
+class MemoryProductStore:
+    """Per-crawl product state and pending items, held in dicts (crawls without JOBDIR).
+
+    For every product URL the spider has built this crawl it keeps a small
+    state dict (collection hints, resolved gender/category, whether it was
+    discounted) used to skip and merge repeats, plus the built item until its
+    review page has been handled.
+    """
+
+    def __init__(self):
+        self.states = {}
+        self.items = {}
+        self.meta = {}
+
+    def seen(self, url):
+        return self.states.get(url)
+
+    def add(self, url, state, item=None):
+        self.states[url] = state
+        if item is not None:
+            self.items[url] = item
+
+    def update_state(self, url, state):
+        self.states[url] = state
+
+    def has_item(self, url):
+        return url in self.items
+
+    def update_item(self, url, fields):
+        self.items[url].update(fields)
+
+    def take_item(self, url):
+        """The pending item for ``url`` (removed from the store), or None"""
+        return self.items.pop(url, None)
+
+    def mark_fetching(self, url):
+        pass
+
+    def pending_fetches(self, all_pending=False):
+        """(url, state, brand) of pending items whose review request was taken off the queue
+        but never finished, or of every pending item; only meaningful after a resume"""
+        return []
+
+    def get_meta(self, key):
+        return self.meta.get(key)
+
+    def set_meta(self, key, value):
+        self.meta[key] = value
+
+    def close(self):
+        pass
+
+
+class SQLiteProductStore(MemoryProductStore):
+    """The same store kept in a SQLite file inside JOBDIR.
+
+    Pending items are compact JSON rows instead of objects referenced from
+    queued requests, so memory stays flat however many review pages are
+    waiting, and a resumed crawl finds the items of the requests Scrapy
+    restores from its disk queue.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Autocommit: a row must be durable before its request reaches the disk queue
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS products ("
+            " url TEXT PRIMARY KEY, state TEXT NOT NULL, item TEXT, fetching INTEGER NOT NULL DEFAULT 0)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def seen(self, url):
+        row = self.conn.execute("SELECT state FROM products WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add(self, url, state, item=None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO products (url, state, item) VALUES (?, ?, ?)",
+            (url, json.dumps(state), json.dumps(item, separators=(",", ":")) if item is not None else None),
+        )
+
+    def update_state(self, url, state):
+        self.conn.execute("UPDATE products SET state = ? WHERE url = ?", (json.dumps(state), url))
+
+    def has_item(self, url):
+        row = self.conn.execute("SELECT item IS NOT NULL FROM products WHERE url = ?", (url,)).fetchone()
+        return bool(row and row[0])
+
+    def update_item(self, url, fields):
+        item = self._item(url)
+        if item is not None:
+            item.update(fields)
+            self.conn.execute("UPDATE products SET item = ? WHERE url = ?", (json.dumps(item, separators=(",", ":")), url))
+
+    def take_item(self, url):
+        item = self._item(url)
+        if item is not None:
+            self.conn.execute("UPDATE products SET item = NULL, fetching = 0 WHERE url = ?", (url,))
+        return item
+
+    def mark_fetching(self, url):
+        self.conn.execute("UPDATE products SET fetching = 1 WHERE url = ?", (url,))
+
+    def pending_fetches(self, all_pending=False):
+        # Items stay in SQLite; only what the rebuilt request needs is loaded
+        query = "SELECT url, state, json_extract(item, '$.brand') FROM products WHERE item IS NOT NULL"
+        if not all_pending:
+            query += " AND fetching = 1"
+        rows = self.conn.execute(query).fetchall()
+        return [(url, json.loads(state), brand) for url, state, brand in rows]
+
+    def _item(self, url):
+        row = self.conn.execute("SELECT item FROM products WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def close(self):
+        self.conn.close()
+
+
+def open_product_store(jobdir=None):
+    """SQLite store in JOBDIR for persistent crawls, in-memory store otherwise"""
+    if not jobdir:
+        return MemoryProductStore()
+    os.makedirs(jobdir, exist_ok=True)
+    return SQLiteProductStore(os.path.join(jobdir, STORE_FILENAME))
@@ -0,0 +1,146 @@
+"""
+Precomputed top-deals lists.
+
+Scores every live product from its discount, absolute saving, variant stock,
+rating and freshness, and writes ranked top-N lists to the ``top_deals``
+collection, one document per ``<gender>:<category>`` key (``all`` stands in
+for either side), so the API serves a carousel with a single _id lookup.
+
+Runs after each finished crawl (see MongoPipeline) or by hand:
+  python -m pk_deals.ranking
+  python -m pk_deals.ranking --size 200
+"""
+import argparse
+import datetime
+import heapq
+import itertools
+import json
+import logging
+import math
+
+from pymongo import MongoClient, ReplaceOne
+
+from pk_deals.utils.mongo import get_mongo_uri, get_mongo_db, get_mongo_collection
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of each signal; every signal is scaled to 0..1
+WEIGHTS = {
+    "discount": 0.40,
+    "saving": 0.20,
+    "stock": 0.15,
+    "rating": 0.15,
+    "freshness": 0.10,
+}
+SAVING_CAP = 20000        # PKR saving that earns the full saving signal
+FRESHNESS_HALF_LIFE_H = 72
+RATING_PRIOR_REVIEWS = 5  # reviews needed before a rating counts for half its weight
+
+PROJECTION = {
+    "title": 1, "brand": 1, "price": 1, "original_price": 1, "discount_percent": 1,
+    "gender": 1, "category": 1, "url": 1, "image_url": 1, "images": 1, "rating": 1, "review_count": 1,
+    "variants.in_stock": 1, "scraped_at": 1, "last_seen_at": 1,
+}
+LIST_FIELDS = (
+    "title", "brand", "price", "original_price", "discount_percent", "gender", "category",
+    "url", "image_url", "images", "rating", "review_count",
+)
+
+
+def deal_score(doc, now):
+    """Weighted 0..100 score of how good a deal a product is"""
+    discount = min(max(doc.get("discount_percent") or 0, 0), 100) / 100
+
+    saving = max((doc.get("original_price") or 0) - (doc.get("price") or 0), 0)
+    saving = min(math.log1p(saving) / math.log1p(SAVING_CAP), 1.0)
+
+    variants = doc.get("variants") or []
+    stock = sum(1 for v in variants if v.get("in_stock")) / len(variants) if variants else 0.5
+
+    # Shrink ratings with few reviews toward neutral
+    rating = doc.get("rating")
+    count = doc.get("review_count") or 0
+    if rating:
+        confidence = count / (count + RATING_PRIOR_REVIEWS)
+        rating = 0.5 + (min(rating, 5) / 5 - 0.5) * confidence
+    else:
+        rating = 0.5
+
+    seen = doc.get("last_seen_at") or doc.get("scraped_at")
+    if isinstance(seen, datetime.datetime):
+        age_h = max((now - seen).total_seconds() / 3600, 0)
+        freshness = 0.5 ** (age_h / FRESHNESS_HALF_LIFE_H)
+    else:
+        freshness = 0.0
+
+    signals = {"discount": discount, "saving": saving, "stock": stock, "rating": rating, "freshness": freshness}
+    return round(sum(WEIGHTS[k] * v for k, v in signals.items()) * 100, 3)
+
+
+def list_keys(doc):
+    gender = (doc.get("gender") or "other").lower()
+    category = (doc.get("category") or "other").lower()
+    return (f"{gender}:{category}", f"{gender}:all", f"all:{category}", "all:all")
+
+
+def materialize_top_deals(col, top_col, size=100):
+    """Rebuild every top-deals list from ``col`` in one pass; returns the number of lists"""
+    now = datetime.datetime.utcnow()
+    heaps = {}
+    tiebreak = itertools.count()
+    scanned = 0
+
+    for doc in col.find({}, PROJECTION).batch_size(2000):
+        scanned += 1
+        score = deal_score(doc, now)
+        entry = (score, next(tiebreak), doc)
+        for key in list_keys(doc):
+            heap = heaps.setdefault(key, [])
+            if len(heap) < size:
+                heapq.heappush(heap, entry)
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+
+    ops = []
+    for key, heap in heaps.items():
+        gender, category = key.split(":", 1)
+        ranked = sorted(heap, key=lambda e: (-e[0], e[1]))
+        products = []
+        for score, _, doc in ranked:
+            item = {"_id": doc["_id"], "deal_score": score}
+            item.update({f: doc.get(f) for f in LIST_FIELDS})
+            products.append(item)
+        ops.append(ReplaceOne(
+            {"_id": key},
+            {"_id": key, "gender": gender, "category": category, "computed_at": now, "products": products},
+            upsert=True,
+        ))
+    if ops:
+        top_col.bulk_write(ops, ordered=False)
+    # Lists for segments that no longer have products
+    top_col.delete_many({"computed_at": {"$lt": now}})
+
+    logger.info("Ranked %d products into %d top-deals lists", scanned, len(ops))
+    return len(ops)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pk_deals.ranking", description="Rebuild the top-deals lists")
+    parser.add_argument("--mongo-uri", default=None, help="Defaults to MONGO_URI")
+    parser.add_argument("--db", default=None, help="Defaults to DB_NAME")
+    parser.add_argument("--collection", default=None, help="Defaults to MONGO_COLLECTION")
+    parser.add_argument("--top-collection", default="top_deals")
+    parser.add_argument("--size", type=int, default=100, help="Products kept per list")
+    args = parser.parse_args(argv)
+
+    client = MongoClient(args.mongo_uri or get_mongo_uri())
+    try:
+        db = client[args.db or get_mongo_db()]
+        lists = materialize_top_deals(db[args.collection or get_mongo_collection()], db[args.top_collection], args.size)
+        print(json.dumps({"lists": lists}))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
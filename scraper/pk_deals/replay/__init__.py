@@ -0,0 +1,4 @@
+from pk_deals.replay.store import ReplayStore
+from pk_deals.replay.middleware import ReplayMiddleware
+
+__all__ = ["ReplayStore", "ReplayMiddleware"]
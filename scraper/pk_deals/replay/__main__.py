@@ -0,0 +1,143 @@
+"""
+Offline replay of brand crawls and throughput benchmark.
+
+  # Synthesize a store from the bundled scraper/*.json feeds (x20 copies)
+  python -m pk_deals.replay build --store replay.sqlite --copies 20
+
+  # Or capture a live crawl into a store
+  scrapy crawl brand -a key=outfitters -s REPLAY_MODE=record -s REPLAY_STORE=replay.sqlite
+
+  # Run spider + pipelines end to end against the store and report throughput
+  python -m pk_deals.replay bench --store replay.sqlite --key outfitters --mongo-db pk_deals_replay
+  python -m pk_deals.replay bench --store replay.sqlite --key bonanza --no-mongo --output bench.json
+
+  # Compare the review extractor with the previous selector chain on the stored product pages
+  python -m pk_deals.replay reviews --store replay.sqlite
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+
+from pk_deals.replay import bench, reviews_bench
+from pk_deals.replay.store import ReplayStore
+from pk_deals.replay.synthesize import build_store
+
+
+def cmd_build(args):
+    if os.path.exists(args.store) and args.fresh:
+        os.remove(args.store)
+    store = ReplayStore(args.store)
+    summary = build_store(store, copies=args.copies, seed=args.seed, keys=args.key or None)
+    print(f"{args.store}: {store.count()} responses")
+    for key, products in summary.items():
+        print(f"  {key}: {products} products")
+    store.close()
+
+
+def cmd_bench(args):
+    settings = get_project_settings()
+    settings.set("REPLAY_MODE", "replay")
+    settings.set("REPLAY_STORE", os.path.abspath(args.store))
+    settings.set("SPIDER_MIDDLEWARES", {"pk_deals.replay.bench.StageTimingSpiderMiddleware": 1000})
+    pipelines = {"pk_deals.replay.bench.TimedCleanAndComputePipeline": 200}
+    if not args.no_mongo:
+        pipelines["pk_deals.replay.bench.TimedMongoPipeline"] = 500
+        settings.set("MONGO_DATABASE", args.mongo_db)
+        if args.mongo_uri:
+            settings.set("MONGO_URI", args.mongo_uri)
+    settings.set("ITEM_PIPELINES", pipelines)
+    # No politeness when nothing goes over the network
+    settings.set("DOWNLOAD_DELAY", 0)
+    settings.set("AUTOTHROTTLE_ENABLED", False)
+    settings.set("POLITENESS_ENABLED", False)
+    settings.set("CONCURRENT_REQUESTS", args.concurrency)
+    settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", args.concurrency)
+    settings.set("CRAWL_REPORT_ENABLED", False)
+    settings.set("LOG_LEVEL", args.log_level)
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler("brand")
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    process.crawl(crawler, key=args.key)
+    process.start()
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+
+    stats = crawler.stats.get_stats()
+    items = stats.get("item_scraped_count", 0)
+    result = {
+        "key": args.key,
+        "store": args.store,
+        "mongo": not args.no_mongo,
+        "items": items,
+        "dropped": stats.get("item_dropped_count", 0),
+        "responses": stats.get("response_received_count", 0),
+        "replay_missing": stats.get("replay/missing", 0),
+        "wall_sec": round(wall, 3),
+        "items_per_sec": round(items / wall, 2) if wall else None,
+        "cpu_sec": round(cpu, 3),
+        "cpu_us_per_item": round(cpu / items * 1e6, 1) if items else None,
+        "stages": bench.stage_report(cpu),
+        "peak_rss_mb": bench.peak_rss_mb(),
+    }
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+def cmd_reviews(args):
+    store = ReplayStore(args.store)
+    pages = reviews_bench.load_pages(store, args.limit)
+    store.close()
+    result = reviews_bench.compare(pages, repeat=args.repeat)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pk_deals.replay", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="Synthesize a replay store from the bundled feeds")
+    p.add_argument("--store", required=True)
+    p.add_argument("--copies", type=int, default=1, help="Copies of each bundled record")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--key", action="append", help="Only these brand keys (repeatable)")
+    p.add_argument("--fresh", action="store_true", help="Delete an existing store first")
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser("bench", help="Crawl one brand from the store and report throughput")
+    p.add_argument("--store", required=True)
+    p.add_argument("--key", required=True, help="Brand key from brands.yml")
+    p.add_argument("--concurrency", type=int, default=32)
+    p.add_argument("--no-mongo", action="store_true", help="Skip MongoPipeline")
+    p.add_argument("--mongo-uri", help="Defaults to MONGO_URI from the environment")
+    p.add_argument("--mongo-db", default="pk_deals_replay", help="Database for replayed writes")
+    p.add_argument("--log-level", default="WARNING")
+    p.add_argument("--output", help="Also write the JSON result here")
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser("reviews", help="Benchmark review extraction over the stored product pages")
+    p.add_argument("--store", required=True)
+    p.add_argument("--limit", type=int, help="At most this many pages")
+    p.add_argument("--repeat", type=int, default=3, help="Passes per extractor; the fastest counts")
+    p.add_argument("--output", help="Also write the JSON result here")
+    p.set_defaults(func=cmd_reviews)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import resource
+import time
+from collections import defaultdict
+
+from pk_deals.pipelines import CleanAndComputePipeline, MongoPipeline
+
+# Accumulated per-stage timings for the current process: stage -> [cpu seconds, wall seconds, calls]
+STAGES = defaultdict(lambda: [0.0, 0.0, 0])
+
+
+def _account(stage, cpu_started, wall_started):
+    entry = STAGES[stage]
+    entry[0] += time.process_time() - cpu_started
+    entry[1] += time.perf_counter() - wall_started
+    entry[2] += 1
+
+
+class StageTimingSpiderMiddleware:
+    """Times spider callbacks by wrapping the iteration of their output.
+
+    Installed closest to the spider, so only the callback's own work is
+    measured, not the other spider middlewares.
+    """
+
+    def process_spider_output(self, response, result, spider):
+        it = iter(result)
+        while True:
+            cpu, wall = time.process_time(), time.perf_counter()
+            try:
+                out = next(it)
+            except StopIteration:
+                _account("spider", cpu, wall)
+                return
+            _account("spider", cpu, wall)
+            yield out
+
+
+class _TimedStage:
+    stage = ""
+
+    def process_item(self, item, spider):
+        cpu, wall = time.process_time(), time.perf_counter()
+        try:
+            return super().process_item(item, spider)
+        finally:
+            _account(self.stage, cpu, wall)
+
+
+class TimedCleanAndComputePipeline(_TimedStage, CleanAndComputePipeline):
+    stage = "clean"
+
+
+class TimedMongoPipeline(_TimedStage, MongoPipeline):
+    stage = "mongo"
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def stage_report(total_cpu):
+    stages = {
+        name: {"cpu_sec": round(cpu, 4), "wall_sec": round(wall, 4), "calls": calls}
+        for name, (cpu, wall, calls) in STAGES.items()
+    }
+    accounted = sum(cpu for cpu, _, _ in STAGES.values())
+    stages["framework"] = {"cpu_sec": round(max(total_cpu - accounted, 0.0), 4)}
+    return stages
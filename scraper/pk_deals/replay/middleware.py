@@ -0,0 +1,63 @@
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+
+from pk_deals.replay.store import ReplayStore
+
+
+class ReplayMiddleware:
+    """Downloader middleware that records responses to, or serves them from, a ReplayStore.
+
+    Settings:
+      REPLAY_MODE            "record" (download and store) or "replay" (serve from store, no network)
+      REPLAY_STORE           path of the SQLite store
+      REPLAY_MISSING_STATUS  status returned in replay mode for URLs not in the store (default 404)
+    """
+
+    def __init__(self, mode, store, missing_status, stats):
+        self.mode = mode
+        self.store = store
+        self.missing_status = missing_status
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mode = crawler.settings.get("REPLAY_MODE")
+        if not mode:
+            raise NotConfigured
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unsupported REPLAY_MODE: {mode}")
+        path = crawler.settings.get("REPLAY_STORE")
+        if not path:
+            raise ValueError("REPLAY_STORE must be set when REPLAY_MODE is enabled")
+        mw = cls(mode, ReplayStore(path), crawler.settings.getint("REPLAY_MISSING_STATUS", 404), crawler.stats)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def process_request(self, request, spider):
+        if self.mode != "replay":
+            return None
+        recorded = self.store.get(request.url)
+        if recorded is None:
+            self.stats.inc_value("replay/missing")
+            status, headers, body = self.missing_status, {}, b""
+        else:
+            self.stats.inc_value("replay/hit")
+            status, headers, body = recorded
+        headers = Headers(headers)
+        respcls = responsetypes.from_args(headers=headers, url=request.url, body=body)
+        return respcls(url=request.url, status=status, headers=headers, body=body, request=request)
+
+    def process_response(self, request, response, spider):
+        if self.mode == "record":
+            headers = {
+                k.decode("latin-1"): [v.decode("latin-1") for v in vs]
+                for k, vs in response.headers.items()
+            }
+            self.store.put(request.url, response.status, headers, response.body)
+            self.stats.inc_value("replay/recorded")
+        return response
+
+    def spider_closed(self, spider):
+        self.store.close()
@@ -0,0 +1,61 @@
+import json
+import sqlite3
+
+from w3lib.url import canonicalize_url
+
+
+class ReplayStore:
+    """Recorded HTTP responses keyed by canonical URL, kept in one SQLite file.
+
+    Bodies are stored exactly as received (still compressed when the server
+    sent Content-Encoding), so replayed responses go through the same
+    downloader middlewares as live ones.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY, status INTEGER NOT NULL, headers TEXT NOT NULL, body BLOB NOT NULL)"
+        )
+
+    @staticmethod
+    def key(url: str) -> str:
+        return canonicalize_url(url)
+
+    def get(self, url: str):
+        """Return (status, headers, body) for a URL, or None when it was never recorded"""
+        row = self.conn.execute(
+            "SELECT status, headers, body FROM responses WHERE url = ?", (self.key(url),)
+        ).fetchone()
+        if row is None:
+            return None
+        status, headers, body = row
+        return status, json.loads(headers), bytes(body)
+
+    def put(self, url: str, status: int, headers: dict, body: bytes):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (url, status, headers, body) VALUES (?, ?, ?, ?)",
+            (self.key(url), status, json.dumps(headers), sqlite3.Binary(body)),
+        )
+
+    def iter_responses(self, content_type=None):
+        """Yield (url, status, headers, body) for every stored response, optionally by Content-Type prefix"""
+        for url, status, headers, body in self.conn.execute("SELECT url, status, headers, body FROM responses"):
+            headers = json.loads(headers)
+            if content_type:
+                value = (headers.get("Content-Type") or [""])[0]
+                if not value.startswith(content_type):
+                    continue
+            yield url, status, headers, bytes(body)
+
+    def commit(self):
+        self.conn.commit()
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,189 @@
+import json
+import os
+import random
+from urllib.parse import urlparse
+
+import yaml
+
+from pk_deals.spiders.base_shopify import ShopifyCollectionSpider
+
+SCRAPER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+BRANDS_YML = os.path.join(SCRAPER_DIR, "pk_deals", "configs", "brands.yml")
+FEEDS = ["outfitters.json", "bonanza.json", "limelight.json"]
+SIZES = ["XS", "S", "M", "L", "XL"]
+PAGE_SIZE = 250
+
+JSON_HEADERS = {"Content-Type": ["application/json; charset=utf-8"]}
+HTML_HEADERS = {"Content-Type": ["text/html; charset=utf-8"]}
+
+
+def load_feed_records():
+    """Bundled scraped records grouped by brand name"""
+    by_brand = {}
+    for name in FEEDS:
+        with open(os.path.join(SCRAPER_DIR, name), "r", encoding="utf-8") as f:
+            for rec in json.load(f):
+                by_brand.setdefault(rec["brand"], []).append(rec)
+    return by_brand
+
+
+def shopify_product(rec, copy, rng, product_id):
+    """Shape a bundled record like an entry of Shopify's products.json"""
+    handle = urlparse(rec["url"]).path.rstrip("/").split("/")[-1]
+    if copy:
+        handle = f"{handle}-r{copy}"
+    sizes = rng.sample(SIZES, rng.randint(1, len(SIZES)))
+    variants = []
+    for i, size in enumerate(sizes):
+        variants.append({
+            "id": product_id * 100 + i,
+            "title": size,
+            "option1": size,
+            "sku": f"{handle.upper()}-{size}",
+            "available": rng.random() > 0.25,
+            "price": f"{rec['price']:.2f}",
+            "compare_at_price": f"{rec['original_price']:.2f}",
+            "inventory_quantity": rng.randint(0, 15),
+        })
+    return {
+        "id": product_id,
+        "title": rec["title"] if not copy else f"{rec['title']} #{copy}",
+        "handle": handle,
+        "tags": rec.get("tags") or [],
+        "images": [{"src": rec["image_url"]}] if rec.get("image_url") else [],
+        "variants": variants,
+    }
+
+
+# Review apps seen on the brands' storefronts, with rough shares
+REVIEW_WIDGETS = [
+    ("judgeme", 40), ("judgeme+jsonld", 15), ("jsonld", 10), ("yotpo", 10),
+    ("stamped", 8), ("loox", 7), ("spr", 5), (None, 5),
+]
+
+
+def review_widget(kind, product, rating, count, reviews):
+    """HTML for one review app's badge and, for Judge.me, its review list"""
+    if kind is None:
+        return ""
+    if kind == "jsonld":
+        return ""
+    if kind.startswith("judgeme"):
+        items = "".join(
+            f'<div class="jdgm-rev"><span class="jdgm-rev__author">{r["author"]}</span>'
+            f'<span class="jdgm-rev__rating" data-score="{r["rating"]}"></span>'
+            f'<span class="jdgm-rev__timestamp" data-content="{r["date"]}"></span>'
+            f'<div class="jdgm-rev__body">{r["text"]}</div></div>'
+            for r in reviews
+        )
+        return (
+            f'<div class="jdgm-prev-badge"><span class="jdgm-prev-badge__stars" data-score="{rating}"></span>'
+            f'<span class="jdgm-prev-badge__text">{count} reviews</span></div>'
+            f'<div class="jdgm-rev-widg">{items}</div>'
+        )
+    if kind == "yotpo":
+        return f'<div class="yotpo-bottomline"><span class="text-m">{rating}</span><span class="text-m">{count} Reviews</span></div>'
+    if kind == "stamped":
+        return f'<span class="stamped-product-reviews-badge" data-rating="{rating}" data-count="{count}"></span>'
+    if kind == "loox":
+        return f'<div class="loox-rating" data-rating="{rating}" data-count="{count}"></div>'
+    return (
+        f'<span class="spr-badge"><span class="spr-badge-starrating" aria-label="{rating} of 5 stars"></span>'
+        f'<span class="spr-badge-caption">{count} reviews</span></span>'
+    )
+
+
+def product_json_ld(product, rating, count):
+    return (
+        '<script type="application/ld+json">'
+        + json.dumps({
+            "@context": "https://schema.org", "@type": "Product", "name": product["title"],
+            "aggregateRating": {"@type": "AggregateRating", "ratingValue": rating, "reviewCount": count},
+        })
+        + "</script>"
+    )
+
+
+def product_page(product, rng):
+    """Shopify-like product page: theme navigation, description and a review app widget"""
+    kinds, weights = zip(*REVIEW_WIDGETS)
+    kind = rng.choices(kinds, weights)[0]
+    rating = round(rng.uniform(3.5, 5.0), 1)
+    count = rng.randint(1, 40)
+    reviews = [
+        {"author": f"Customer {i}", "rating": rng.randint(3, 5), "date": f"2025-10-0{i + 1}",
+         "text": f"Great fabric and fit, review {i}."}
+        for i in range(min(count, 5))
+    ]
+
+    nav = "<nav>" + "".join(f'<a class="menu-item" href="/collections/c{i}">Collection {i}</a>' for i in range(120)) + "</nav>"
+    padding = "<div class='product-info'>" + "<p>Details about the fabric and care.</p>" * 40 + "</div>"
+    footer = "<footer>" + "".join(f'<a href="/pages/p{i}">Page {i}</a>' for i in range(60)) + "</footer>"
+    head = f"<title>{product['title']}</title>"
+    if "jsonld" in kind if kind else False:
+        head += product_json_ld(product, rating, count)
+    return (
+        f"<html><head>{head}</head><body>{nav}"
+        f"<h1>{product['title']}</h1>{padding}"
+        f"{review_widget(kind, product, rating, count, reviews)}{footer}</body></html>"
+    ).encode("utf-8")
+
+
+def collection_records(records, cfg):
+    """Bundled records that plausibly belong to a brands.yml collection entry"""
+    gender, ctype = cfg.get("gender"), cfg.get("type")
+    return [
+        r for r in records
+        if (not gender or r.get("gender") == gender) and (not ctype or r.get("category") == ctype)
+    ]
+
+
+def build_store(store, copies=1, seed=42, keys=None):
+    """Synthesize products.json pages and product pages for the Shopify brands in brands.yml.
+
+    Each bundled record is repeated ``copies`` times with distinct handles.
+    Returns a {brand key: product count} summary.
+    """
+    rng = random.Random(seed)
+    with open(BRANDS_YML, "r") as f:
+        brands = yaml.safe_load(f).get("brands", [])
+    by_brand = load_feed_records()
+    handle_of = ShopifyCollectionSpider().handle_from_collection_url
+
+    summary = {}
+    product_id = 1
+    for cfg in brands:
+        if cfg.get("platform") != "shopify" or (keys and cfg["key"] not in keys):
+            continue
+        records = by_brand.get(cfg["brand"], [])
+        domain = cfg["domain"].rstrip("/")
+        store.put(f"{domain}/robots.txt", 200, {"Content-Type": ["text/plain"]}, b"User-agent: *\nAllow: /\n")
+
+        seen_handles = set()
+        total = 0
+        for coll in cfg.get("collections", []):
+            handle = coll.get("handle") or handle_of(coll.get("url", ""))
+            if not handle or handle in seen_handles:
+                continue
+            seen_handles.add(handle)
+
+            products = []
+            for copy in range(copies):
+                for rec in collection_records(records, coll):
+                    products.append(shopify_product(rec, copy, rng, product_id))
+                    product_id += 1
+
+            # Shopify returns pages of PAGE_SIZE; a full last page is followed by an empty one
+            pages = [products[i:i + PAGE_SIZE] for i in range(0, len(products), PAGE_SIZE)] or [[]]
+            if len(pages[-1]) == PAGE_SIZE:
+                pages.append([])
+            for page_no, page in enumerate(pages, start=1):
+                url = f"{domain}/collections/{handle}/products.json?limit={PAGE_SIZE}&page={page_no}"
+                store.put(url, 200, JSON_HEADERS, json.dumps({"products": page}).encode("utf-8"))
+            for product in products:
+                store.put(f"{domain}/products/{product['handle']}", 200, HTML_HEADERS, product_page(product, rng))
+            total += len(products)
+
+        store.commit()
+        summary[cfg["key"]] = total
+    return summary
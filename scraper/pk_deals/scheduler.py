@@ -0,0 +1,246 @@
+"""
+Long-running crawl scheduler with per-collection intervals learned from change rates.
+
+Every brands.yml collection has its own refresh interval, kept in the
+``crawl_schedule`` collection (one document per brand). When collections fall
+due the scheduler enqueues them as units on the coordinator queue
+(pk_deals.coordinator), never keeping more than SCHEDULER_MAX_CONCURRENT_UNITS
+units queued or running at once; ``coordinator work`` processes do the
+crawling. Once a brand's refresh settles, each collection's share of new or
+changed products (price, discount or in-stock sizes, see MongoPipeline) is
+folded into a moving average:
+
+  interval *= clamp(SCHEDULER_TARGET_CHANGE_RATIO / change_ratio, 0.5, 2)
+
+so volatile sale collections are crawled more often and stable ones less,
+within the min/max interval. A brand is crawled whole at least every
+SCHEDULER_FULL_REFRESH_HOURS so its stale products get swept, and is paused
+for SCHEDULER_PAUSE_HOURS after SCHEDULER_PAUSE_AFTER_FAILURES refreshes in a
+row with a failed unit.
+
+Run one instance from scraper/:
+  python -m pk_deals.scheduler
+  python -m pk_deals.scheduler --once     # a single pass, e.g. from cron
+  python -m pk_deals.scheduler --show     # current intervals and state
+"""
+import argparse
+import datetime
+import json
+import logging
+import time
+
+from pymongo import MongoClient
+from scrapy.utils.project import get_project_settings
+
+from pk_deals.coordinator import SUPPORTED_PLATFORMS, enqueue_refresh, ensure_queue_indexes
+from pk_deals.spiders.brand_loader import load_brand_configs
+from pk_deals.utils.mongo import get_mongo_uri, get_mongo_db
+
+logger = logging.getLogger(__name__)
+
+CHANGE_EWMA_ALPHA = 0.5  # weight of the latest run in the change-ratio average
+MAX_STEP = 2.0           # interval grows or shrinks by at most this factor per run
+
+
+def utcnow():
+    return datetime.datetime.utcnow()
+
+
+def next_interval(interval, change_ratio, target, min_interval, max_interval):
+    """Seconds until the next crawl of a collection whose recent runs changed ``change_ratio`` of products"""
+    factor = target / max(change_ratio, 1e-6)
+    factor = min(max(factor, 1 / MAX_STEP), MAX_STEP)
+    return min(max(interval * factor, min_interval), max_interval)
+
+
+class Scheduler:
+    def __init__(self, db, settings):
+        self.db = db
+        self.settings = settings
+        self.schedule = db[settings.get("SCHEDULE_COLLECTION")]
+        self.jobs = db[settings.get("CRAWL_JOBS_COLLECTION")]
+        self.refreshes = db[settings.get("CRAWL_REFRESHES_COLLECTION")]
+        self.max_units = settings.getint("SCHEDULER_MAX_CONCURRENT_UNITS")
+        self.min_interval = settings.getfloat("SCHEDULER_MIN_INTERVAL_MINUTES") * 60
+        self.max_interval = settings.getfloat("SCHEDULER_MAX_INTERVAL_MINUTES") * 60
+        self.default_interval = settings.getfloat("SCHEDULER_DEFAULT_INTERVAL_MINUTES") * 60
+        self.target = settings.getfloat("SCHEDULER_TARGET_CHANGE_RATIO")
+        self.full_refresh = datetime.timedelta(hours=settings.getfloat("SCHEDULER_FULL_REFRESH_HOURS"))
+        self.pause_after = settings.getint("SCHEDULER_PAUSE_AFTER_FAILURES")
+        self.pause = datetime.timedelta(hours=settings.getfloat("SCHEDULER_PAUSE_HOURS"))
+
+    def _collection_state(self, cfg_collection, now):
+        return {
+            "url": cfg_collection.get("url") or cfg_collection.get("handle"),
+            "interval_seconds": self.default_interval,
+            "change_ratio": None,
+            "next_run_at": now,
+            "last_run_at": None,
+        }
+
+    def sync(self, cfg, now):
+        """Schedule document for a brands.yml entry, created or reconciled with its collections"""
+        state = self.schedule.find_one({"_id": cfg["key"]}) or {
+            "_id": cfg["key"],
+            "brand": cfg["brand"],
+            "consecutive_failures": 0,
+            "paused_until": None,
+            "last_full_at": None,
+            "inflight": None,
+            "collections": [],
+        }
+        collections = []
+        for i, c in enumerate(cfg.get("collections") or []):
+            entry = state["collections"][i] if i < len(state["collections"]) else None
+            # A collection edited or moved in brands.yml starts over with the default interval
+            if entry is None or entry.get("url") != (c.get("url") or c.get("handle")):
+                entry = self._collection_state(c, now)
+            collections.append(entry)
+        state["collections"] = collections
+        state["brand"] = cfg["brand"]
+        self.schedule.replace_one({"_id": cfg["key"]}, state, upsert=True)
+        return state
+
+    def collect(self, state, now):
+        """Fold a settled refresh into the brand's intervals; False while its units are still pending"""
+        inflight = state["inflight"]
+        units = list(self.jobs.find({"generation": inflight["generation"]}))
+        if any(u["status"] in ("queued", "running") for u in units):
+            return False
+
+        failed = False
+        for unit in units:
+            result = unit.get("result") or {}
+            if unit["status"] != "done":
+                failed = True
+            # A whole-brand unit only reports the brand's ratio, so intervals are left as they are
+            learn = unit["status"] == "done" and result.get("items") and unit.get("collections") is not None
+            indexes = unit.get("collections")
+            if indexes is None:
+                indexes = range(len(state["collections"]))
+            for index in indexes:
+                if index >= len(state["collections"]):
+                    continue
+                entry = state["collections"][index]
+                entry["last_run_at"] = unit.get("finished_at") or now
+                if learn:
+                    ratio = (result.get("changed") or 0) / result["items"]
+                    previous = entry.get("change_ratio")
+                    entry["change_ratio"] = ratio if previous is None else \
+                        CHANGE_EWMA_ALPHA * ratio + (1 - CHANGE_EWMA_ALPHA) * previous
+                    entry["interval_seconds"] = next_interval(
+                        entry["interval_seconds"], entry["change_ratio"],
+                        self.target, self.min_interval, self.max_interval,
+                    )
+                entry["next_run_at"] = now + datetime.timedelta(seconds=entry["interval_seconds"])
+
+        if failed:
+            state["consecutive_failures"] += 1
+            if state["consecutive_failures"] >= self.pause_after:
+                state["paused_until"] = now + self.pause
+                logger.warning("Pausing %s until %s after %d failed refreshes",
+                               state["_id"], state["paused_until"], state["consecutive_failures"])
+        else:
+            state["consecutive_failures"] = 0
+            if not inflight.get("partial"):
+                state["last_full_at"] = now
+        state["inflight"] = None
+        return True
+
+    def due_collections(self, state, now):
+        """(collection indexes due now, whether a full refresh is due)"""
+        if state["inflight"] or (state["paused_until"] and state["paused_until"] > now):
+            return [], False
+        if state["last_full_at"] is None or now - state["last_full_at"] >= self.full_refresh:
+            return list(range(len(state["collections"]))), True
+        return [i for i, c in enumerate(state["collections"]) if c["next_run_at"] <= now], False
+
+    def tick(self):
+        """One scheduling pass; returns the generations enqueued"""
+        now = utcnow()
+        brands = [b for b in load_brand_configs() if b.get("platform") in SUPPORTED_PLATFORMS]
+        states = []
+        for cfg in brands:
+            state = self.sync(cfg, now)
+            if state["paused_until"] and state["paused_until"] <= now:
+                logger.info("Resuming %s", state["_id"])
+                state["paused_until"] = None
+                state["consecutive_failures"] = 0
+            if state["inflight"] and self.collect(state, now):
+                logger.info("Refresh of %s settled; next runs %s", state["_id"],
+                            [c["next_run_at"].isoformat(timespec="seconds") for c in state["collections"]])
+            states.append((cfg, state))
+
+        capacity = self.max_units - self.jobs.count_documents({"status": {"$in": ["queued", "running"]}})
+        due = [(cfg, state, *self.due_collections(state, now)) for cfg, state in states]
+        due = [d for d in due if d[2]]
+        # Most overdue collection first
+        due.sort(key=lambda d: min(d[1]["collections"][i]["next_run_at"] for i in d[2]))
+
+        enqueued = []
+        for cfg, state, indexes, full in due:
+            if capacity <= 0:
+                break
+            if full and capacity < len(indexes):
+                # Not enough room for one unit per collection; crawl the brand as a single unit
+                generation = enqueue_refresh(self.jobs, self.refreshes, [cfg])
+                capacity -= 1
+                partial = False
+            else:
+                indexes = indexes[:capacity]
+                generation = enqueue_refresh(self.jobs, self.refreshes, [cfg], only={cfg["key"]: indexes})
+                capacity -= len(indexes)
+                partial = len(indexes) < len(state["collections"])
+            state["inflight"] = {"generation": generation, "collections": indexes, "partial": partial, "at": now}
+            enqueued.append(generation)
+            logger.info("Enqueued %s (%s, generation %s)", state["_id"],
+                        f"collections {indexes}" if partial else "full refresh", generation)
+
+        for _, state in states:
+            self.schedule.replace_one({"_id": state["_id"]}, state)
+        return enqueued
+
+    def run(self, tick_seconds):
+        ensure_queue_indexes(self.jobs)
+        logger.info("Scheduler started: up to %d concurrent units", self.max_units)
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                # A Mongo hiccup or a bad brands.yml edit should not stop the daemon
+                logger.exception("Scheduling pass failed")
+            time.sleep(tick_seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pk_deals.scheduler", description="Adaptive crawl scheduler")
+    parser.add_argument("--once", action="store_true", help="Run a single scheduling pass and exit")
+    parser.add_argument("--show", action="store_true", help="Print the schedule and exit")
+    parser.add_argument("--max-concurrent", type=int, default=None,
+                        help="Defaults to SCHEDULER_MAX_CONCURRENT_UNITS")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    settings = get_project_settings()
+    if args.max_concurrent:
+        settings.set("SCHEDULER_MAX_CONCURRENT_UNITS", args.max_concurrent)
+    client = MongoClient(get_mongo_uri())
+    try:
+        db = client[get_mongo_db()]
+        scheduler = Scheduler(db, settings)
+        if args.show:
+            for state in scheduler.schedule.find().sort("_id"):
+                print(json.dumps(state, default=str))
+        elif args.once:
+            print(json.dumps({"enqueued": scheduler.tick()}))
+        else:
+            try:
+                scheduler.run(settings.getfloat("SCHEDULER_TICK_SECONDS"))
+            except KeyboardInterrupt:
+                logger.info("Scheduler stopped")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
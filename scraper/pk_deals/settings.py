@@ -6,14 +6,76 @@ NEWSPIDER_MODULE = "pk_deals.spiders"
 ROBOTSTXT_OBEY = True
 USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
 
+# Global ceiling; per-lane concurrency and delay come from pk_deals.politeness
+CONCURRENT_REQUESTS = 16
 DOWNLOAD_DELAY = 0.5
-CONCURRENT_REQUESTS = 8
-AUTOTHROTTLE_ENABLED = True
+AUTOTHROTTLE_ENABLED = False  # would fight the adaptive politeness controller over slot delays
 
 ITEM_PIPELINES = {
     "pk_deals.pipelines.CleanAndComputePipeline": 200,
     "pk_deals.pipelines.MongoPipeline": 500,
 }
 
+DOWNLOADER_MIDDLEWARES = {
+    "pk_deals.politeness.AdaptivePolitenessMiddleware": 600,
+    "pk_deals.replay.middleware.ReplayMiddleware": 950,
+}
+
+# Per-brand lanes for products.json and product HTML (override in brands.yml under politeness:)
+POLITENESS_ENABLED = True
+POLITENESS_DEFAULTS = {"concurrency": 4, "delay": 0.5, "html_concurrency": 4, "html_delay": 0.5}
+POLITENESS_TARGET_LATENCY = 2.0  # seconds; faster responses count as healthy
+POLITENESS_RAMP_AFTER = 20       # healthy responses in a row before a lane speeds back up
+POLITENESS_MAX_DELAY = 30.0
+
+# Resumable, bounded-memory crawls: -s JOBDIR=crawls/<key>-<run> keeps the request queue on disk and
+# pending items in JOBDIR/products.sqlite (review requests carry only the product URL); re-run to resume
+SCHEDULER_DISK_QUEUE = "scrapy.squeues.PickleLifoDiskQueue"
+
+# Offline record/replay of responses (see python -m pk_deals.replay)
+REPLAY_MODE = None  # "record" or "replay"
+REPLAY_STORE = None  # path of the SQLite response store
+
+EXTENSIONS = {
+    "pk_deals.extensions.CrawlReport": 500,
+}
+
+# Per-brand crawl report (JSON file + summary document in Mongo)
+CRAWL_REPORT_ENABLED = True
+CRAWL_REPORT_DIR = "reports"
+CRAWL_RUNS_COLLECTION = "crawl_runs"
+
+# Mongo-backed queue of crawl units shared by workers (python -m pk_deals.coordinator)
+CRAWL_JOBS_COLLECTION = "crawl_jobs"
+CRAWL_REFRESHES_COLLECTION = "crawl_refreshes"
+CRAWL_JOB_LEASE_SECONDS = 300  # heartbeats renew it every third of this
+CRAWL_JOB_MAX_ATTEMPTS = 3
+
+# Adaptive crawl scheduler (python -m pk_deals.scheduler) feeding the queue above
+SCHEDULE_COLLECTION = "crawl_schedule"
+SCHEDULER_TICK_SECONDS = 30
+SCHEDULER_MAX_CONCURRENT_UNITS = 4
+SCHEDULER_DEFAULT_INTERVAL_MINUTES = 180
+SCHEDULER_MIN_INTERVAL_MINUTES = 30
+SCHEDULER_MAX_INTERVAL_MINUTES = 24 * 60
+SCHEDULER_TARGET_CHANGE_RATIO = 0.05  # crawl about when 5% of a collection's products would have changed
+SCHEDULER_FULL_REFRESH_HOURS = 24     # whole-brand crawl (and stale sweep) at least this often
+SCHEDULER_PAUSE_AFTER_FAILURES = 3
+SCHEDULER_PAUSE_HOURS = 6
+
+# Products not seen by a finished crawl are moved to ARCHIVE_COLLECTION
+STALE_SWEEP_ENABLED = True
+STALE_SWEEP_MAX_FRACTION = 0.5  # skip the sweep if more of a brand would be archived
+ARCHIVE_COLLECTION = "products_archive"
+ARCHIVE_RETENTION_DAYS = 30
+
+# Capped collection of new/deeper deal events streamed by the API (/api/products/stream)
+DEAL_EVENTS_COLLECTION = "deal_events"
+DEAL_EVENTS_MAX_BYTES = 16 * 1024 * 1024
+
+# Ranked top-N deal lists per gender/category, rebuilt after each finished crawl
+TOP_DEALS_COLLECTION = "top_deals"
+TOP_DEALS_SIZE = 100
+
 LOG_LEVEL = "INFO"
 FEED_EXPORT_ENCODING = "utf-8"
\ No newline at end of file
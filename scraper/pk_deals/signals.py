@@ -0,0 +1,6 @@
+# Custom signals sent by pk_deals components
+
+# Sent by MongoPipeline after each product write.
+# Args: item, spider, duration (seconds), changed (new product, or price,
+# discount or in-stock sizes differ from the stored document)
+mongo_write = object()
@@ -1,7 +1,11 @@
 from urllib.parse import urljoin, urlparse
 import scrapy
+from scrapy import signals
 from pk_deals.items import ProductItem
+from pk_deals.product_store import open_product_store
+from pk_deals.sweep import new_generation
 from pk_deals.utils.categorize import detect_gender, detect_type
+from pk_deals.utils.reviews import extract_reviews
 
 class ShopifyCollectionSpider(scrapy.Spider):
     name = "shopify_brand"
@@ -9,6 +13,24 @@ class ShopifyCollectionSpider(scrapy.Spider):
         "ROBOTSTXT_OBEY": True,
     }
 
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        """
+        Open the per-crawl product store: SQLite inside JOBDIR, so a killed crawl
+        resumes with its pending items and its generation
+        (scrapy crawl brand -a key=... -s JOBDIR=crawls/<key>-<date>), or memory.
+        """
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        spider.products = open_product_store(crawler.settings.get("JOBDIR"))
+        stored = spider.products.get_meta("generation")
+        spider.resumed = stored is not None
+        # -a generation=<id> still wins; otherwise a resumed crawl keeps the generation it started with
+        spider.generation = getattr(spider, "generation", None) or stored or new_generation()
+        spider.products.set_meta("generation", spider.generation)
+        crawler.signals.connect(spider.review_page_started, signal=signals.request_reached_downloader)
+        crawler.signals.connect(spider.close_product_store, signal=signals.spider_closed)
+        return spider
+
     def handle_from_collection_url(self, url: str):
         """
         Extract Shopify collection handle from a full URL:
@@ -22,7 +44,13 @@ class ShopifyCollectionSpider(scrapy.Spider):
                 return parts[i + 1]
         return None
 
-    def add_collection_requests(self, domain, collections, brand):
+    def add_collection_requests(self, domain, collections, brand, rebuild=False):
+        """
+        First products.json page of each collection. With ``rebuild`` (a JOBDIR
+        crawl resumed after a hard kill, whose request queue was lost) each
+        collection continues after its last parsed page instead.
+        """
+        rebuilt = set()
         for c in collections:
             handle = c.get("handle")
             url = c.get("url")
@@ -35,11 +63,21 @@ class ShopifyCollectionSpider(scrapy.Spider):
 
             if handle:
                 page = 1
+                if rebuild:
+                    progress = self.products.get_meta(f"listing:{handle}")
+                    if handle in rebuilt or (progress and progress["done"]):
+                        continue
+                    rebuilt.add(handle)
+                    page = progress["page"] + 1 if progress else 1
                 api = f"{domain}/collections/{handle}/products.json?limit=250&page={page}"
                 yield scrapy.Request(
                     api,
                     callback=self.parse_collection_json,
                     cb_kwargs=dict(domain=domain, handle=handle, page=page, brand=brand, gender=gender, ctype=ctype),
+                    meta=dict(brand=brand, collection=handle, kind="json"),
+                    priority=10,  # listing pages ahead of queued review pages
+                    # The persisted dupefilter has already seen pages that were queued but never fetched
+                    dont_filter=rebuild,
                 )
             else:
                 self.logger.warning("Skipping collection without resolvable handle: %s", c)
@@ -48,7 +86,9 @@ class ShopifyCollectionSpider(scrapy.Spider):
         data = response.json()
         products = data.get("products", [])
         for prod in products:
-            yield from self.product_items_from_shopify(prod, domain, brand, gender, ctype)
+            yield from self.product_items_from_shopify(prod, domain, brand, gender, ctype, collection=handle)
+        # Listing progress, for rebuilding a resumed crawl whose queue was lost
+        self.products.set_meta(f"listing:{handle}", {"page": page, "done": len(products) < 250})
 
         # pagination if needed
         if len(products) == 250:
@@ -58,12 +98,31 @@ class ShopifyCollectionSpider(scrapy.Spider):
                 api,
                 callback=self.parse_collection_json,
                 cb_kwargs=dict(domain=domain, handle=handle, page=next_page, brand=brand, gender=gender, ctype=ctype),
+                meta=dict(brand=brand, collection=handle, kind="json"),
+                priority=10,  # listing pages ahead of queued review pages
             )
 
-    def product_items_from_shopify(self, prod, domain, brand, gender_hint, type_hint):
+    def product_items_from_shopify(self, prod, domain, brand, gender_hint, type_hint, collection=None):
         title = prod.get("title")
         handle = prod.get("handle")
         product_url = urljoin(domain + "/", f"products/{handle}")
+
+        # Products shared by overlapping collections are built, fetched and written once per crawl
+        seen = self.products.seen(product_url)
+        late_merge = False
+        if seen is not None:
+            self.crawler.stats.inc_value("dedup/duplicate_products")
+            if not seen["discounted"] or not self.merge_hints(seen, gender_hint, type_hint):
+                return
+            self.products.update_state(product_url, seen)
+            if self.products.has_item(product_url):
+                # Review page still pending: the single write will carry the merged hints
+                self.products.update_item(product_url, {"gender": seen["gender"], "category": seen["category"]})
+                return
+            # Already written; write once more so the merged hints stick
+            self.crawler.stats.inc_value("dedup/late_merges")
+            late_merge = True
+
         images = prod.get("images") or []
         image_src = images[0]["src"] if images and isinstance(images[0], dict) else (images[0] if images else None)
 
@@ -132,8 +191,22 @@ class ShopifyCollectionSpider(scrapy.Spider):
                     best_price = price_f
                     best_original_price = compare_f
         
+        if late_merge:
+            gender, ctype = seen["gender"], seen["category"]
+        else:
+            seen = {
+                "gender_hints": [gender_hint] if gender_hint else [],
+                "type_hint": type_hint,
+                "gender": gender,
+                "category": ctype,
+                "discounted": bool(best_price and best_original_price),
+                "collection": collection,
+            }
+
         # Only yield product if it has a discount
-        if best_price and best_original_price:
+        if not (best_price and best_original_price):
+            self.products.add(product_url, seen)
+        else:
             item = ProductItem(
                 title=title,
                 brand=brand,
@@ -149,107 +222,81 @@ class ShopifyCollectionSpider(scrapy.Spider):
                 tags=tags,
                 variants=variants_list,
             )
-            
-            # Request the product page to try to extract reviews
-            yield scrapy.Request(
-                product_url,
-                callback=self.parse_product_reviews,
-                cb_kwargs=dict(item=item),
-                dont_filter=True,
-                priority=0  # Lower priority than collection requests
-            )
+            if late_merge:
+                yield item
+                return
+
+            # The item waits in the product store; only its URL travels with the request
+            self.products.add(product_url, seen, dict(item))
+            yield self.review_request(product_url, brand, collection)
+
+    def review_request(self, product_url, brand, collection):
+        return scrapy.Request(
+            product_url,
+            callback=self.parse_product_reviews,
+            errback=self.product_page_failed,
+            cb_kwargs=dict(key=product_url),
+            meta=dict(brand=brand, collection=collection, kind="html"),
+            dont_filter=True,
+            priority=0  # Lower priority than collection requests
+        )
 
-    def parse_product_reviews(self, response, item):
+    def resume_review_requests(self, rebuild=False):
         """
-        Parse product page to extract review data.
-        Supports multiple review platforms commonly used on Shopify:
-        - Judge.me
-        - Yotpo
-        - Product Reviews (Shopify's built-in)
-        - Loox
-        - Stamped.io
+        Review requests for items a killed crawl left pending: those already
+        taken off the disk queue, or every pending item when the queue itself
+        was lost (``rebuild``).
         """
-        rating = None
-        review_count = 0
-        reviews_list = []
-        
-        # Try Judge.me reviews (most common)
-        judgeme_rating = response.css('.jdgm-prev-badge__stars::attr(data-score)').get()
-        judgeme_count = response.css('.jdgm-prev-badge__text::text').re_first(r'(\d+)')
-        
-        if judgeme_rating:
-            rating = float(judgeme_rating)
-            review_count = int(judgeme_count) if judgeme_count else 0
-        
-        # Try Yotpo reviews
-        if not rating:
-            yotpo_rating = response.css('.yotpo-bottomline .text-m::text').get()
-            yotpo_count = response.css('.yotpo-bottomline .text-m::text').re_first(r'(\d+)')
-            if yotpo_rating:
-                try:
-                    rating = float(yotpo_rating)
-                    review_count = int(yotpo_count) if yotpo_count else 0
-                except (ValueError, TypeError):
-                    pass
-        
-        # Try Stamped.io reviews
-        if not rating:
-            stamped_rating = response.css('.stamped-product-reviews-badge::attr(data-rating)').get()
-            stamped_count = response.css('.stamped-product-reviews-badge::attr(data-count)').get()
-            if stamped_rating:
-                try:
-                    rating = float(stamped_rating)
-                    review_count = int(stamped_count) if stamped_count else 0
-                except (ValueError, TypeError):
-                    pass
-        
-        # Try Loox reviews
-        if not rating:
-            loox_rating = response.css('.loox-rating::attr(data-rating)').get()
-            loox_count = response.css('.loox-rating::attr(data-count)').get()
-            if loox_rating:
-                try:
-                    rating = float(loox_rating)
-                    review_count = int(loox_count) if loox_count else 0
-                except (ValueError, TypeError):
-                    pass
-        
-        # Try Shopify Product Reviews (basic)
-        if not rating:
-            spr_rating = response.css('.spr-badge-starrating::attr(aria-label)').re_first(r'([\d.]+)')
-            spr_count = response.css('.spr-badge-caption::text').re_first(r'(\d+)')
-            if spr_rating:
-                try:
-                    rating = float(spr_rating)
-                    review_count = int(spr_count) if spr_count else 0
-                except (ValueError, TypeError):
-                    pass
-        
-        # Try to extract individual reviews (if visible on page - Judge.me example)
-        for review_elem in response.css('.jdgm-rev'):
-            try:
-                author = review_elem.css('.jdgm-rev__author::text').get()
-                review_rating = review_elem.css('.jdgm-rev__rating::attr(data-score)').get()
-                review_text = review_elem.css('.jdgm-rev__body::text').get()
-                review_date = review_elem.css('.jdgm-rev__timestamp::attr(data-content)').get()
-                
-                if author and review_rating:
-                    reviews_list.append({
-                        "author": author.strip(),
-                        "rating": float(review_rating),
-                        "text": review_text.strip() if review_text else "",
-                        "date": review_date
-                    })
-            except (ValueError, TypeError, AttributeError):
-                continue
-        
-        # Limit to top 10 reviews to avoid excessive data
-        if len(reviews_list) > 10:
-            reviews_list = reviews_list[:10]
-        
-        # Add review data to item
-        item['rating'] = rating
-        item['review_count'] = review_count
-        item['reviews'] = reviews_list if reviews_list else None
-        
-        yield item
\ No newline at end of file
+        for url, state, brand in self.products.pending_fetches(all_pending=rebuild):
+            self.crawler.stats.inc_value("products/resumed_review_requests")
+            yield self.review_request(url, brand, state.get("collection"))
+
+    def review_page_started(self, request, spider):
+        if request.meta.get("kind") == "html" and "key" in request.cb_kwargs:
+            self.products.mark_fetching(request.cb_kwargs["key"])
+
+    def take_item(self, key):
+        stored = self.products.take_item(key)
+        if stored is None:
+            # Already written before a resume re-issued its request
+            self.crawler.stats.inc_value("products/missing_pending_item")
+            return None
+        return ProductItem(**stored)
+
+    def parse_product_reviews(self, response, key):
+        """
+        Add rating, review count and up to 10 reviews from the product page.
+        See pk_deals.utils.reviews for the JSON-LD fast path and vendor detection
+        (Judge.me, Yotpo, Stamped.io, Loox, Shopify Product Reviews).
+        """
+        item = self.take_item(key)
+        if item is not None:
+            item.update(extract_reviews(response))
+            yield item
+
+    def product_page_failed(self, failure):
+        """Keep the product when its page errors or is skipped by the request budget; reviews stay empty"""
+        item = self.take_item(failure.request.cb_kwargs["key"])
+        if item is not None:
+            yield item
+
+    def merge_hints(self, seen, gender_hint, type_hint):
+        """
+        Fold another collection's gender/type hints into the state of a product
+        built earlier in the crawl. A product listed under collections of
+        different genders becomes unisex; the first type hint wins over
+        detected types. Hints are compared casefolded and keep the first
+        spelling seen. Returns True if the gender or category changed.
+        """
+        before = (seen["gender"], seen["category"])
+        if gender_hint:
+            if gender_hint.casefold() not in {h.casefold() for h in seen["gender_hints"]}:
+                seen["gender_hints"].append(gender_hint)
+            seen["gender"] = "unisex" if len(seen["gender_hints"]) > 1 else seen["gender_hints"][0]
+        if type_hint and not seen["type_hint"]:
+            seen["type_hint"] = type_hint
+            seen["category"] = type_hint
+        return (seen["gender"], seen["category"]) != before
+
+    def close_product_store(self, spider):
+        self.products.close()
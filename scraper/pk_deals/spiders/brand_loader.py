@@ -3,25 +3,38 @@ import yaml
 import scrapy
 from pk_deals.spiders.base_shopify import ShopifyCollectionSpider
 
-class BrandSpider(scrapy.Spider):
+BRANDS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "configs", "brands.yml"))
+
+
+def load_brand_configs(path=BRANDS_PATH):
+    with open(path, "r") as f:
+        data = yaml.safe_load(f)
+    return data.get("brands", [])
+
+
+class BrandSpider(ShopifyCollectionSpider):
     name = "brand"
     """
     Usage:
       scrapy crawl brand -a key=limelight
+      scrapy crawl brand -a key=outfitters -a collections=0,2   # subset, by position in brands.yml
+      scrapy crawl brand -a key=sapphire -s JOBDIR=crawls/sapphire-1   # resumable; re-run the same command after a kill
+
+    A subset crawl updates the products it sees but neither sweeps the brand's
+    stale products nor rebuilds the top-deals lists, since everything in the
+    collections left out would look stale. Run the whole brand (or the
+    coordinator, which finalizes once per refresh) to archive sold-out products.
     """
 
-    def __init__(self, key=None, *args, **kwargs):
+    def __init__(self, key=None, collections=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if not key:
             raise ValueError("Provide -a key=<brand key from brands.yml>")
         self.key = key
+        self.collection_indexes = [int(i) for i in str(collections).split(",") if i.strip()] if collections else None
 
     def start_requests(self):
-        cfg_path = os.path.join(os.path.dirname(__file__), "..", "configs", "brands.yml")
-        cfg_path = os.path.abspath(cfg_path)
-        with open(cfg_path, "r") as f:
-            data = yaml.safe_load(f)
-        brand_cfg = next((b for b in data.get("brands", []) if b.get("key") == self.key), None)
+        brand_cfg = next((b for b in load_brand_configs() if b.get("key") == self.key), None)
         if not brand_cfg:
             raise ValueError(f"Brand '{self.key}' not found in brands.yml")
 
@@ -29,11 +42,20 @@ class BrandSpider(scrapy.Spider):
         domain = brand_cfg.get("domain").rstrip("/")
         brand = brand_cfg.get("brand")
         collections = brand_cfg.get("collections", [])
+        if self.collection_indexes is not None:
+            collections = [collections[i] for i in self.collection_indexes]
+        # Read by pk_deals.politeness.AdaptivePolitenessMiddleware
+        self.politeness = brand_cfg.get("politeness") or {}
 
         if platform == "shopify":
-            sp = ShopifyCollectionSpider()
-            sp._set_crawler(self.crawler)
-            for req in sp.add_collection_requests(domain, collections, brand):
-                yield req
+            # Scrapy writes its JOBDIR queue only on a clean shutdown; after a hard
+            # kill the product store rebuilds the listing and review requests
+            rebuild = self.resumed and not len(self.crawler.engine.slot.scheduler)
+            if self.resumed:
+                self.logger.info("Resuming generation %s (%s)", self.generation,
+                                 "rebuilding requests from the product store" if rebuild else "queue restored")
+            yield from self.add_collection_requests(domain, collections, brand, rebuild=rebuild)
+            if self.resumed:
+                yield from self.resume_review_requests(rebuild=rebuild)
         else:
-            raise ValueError(f"Unsupported platform: {platform}")
\ No newline at end of file
+            raise ValueError(f"Unsupported platform: {platform}")
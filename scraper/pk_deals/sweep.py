@@ -0,0 +1,79 @@
+"""
+Retire products that a finished crawl did not see.
+
+MongoPipeline stamps every upserted product with the crawl's
+``crawl_generation`` and ``last_seen_at``. Once a brand's crawl finishes,
+its documents still carrying an older generation are off sale, sold out or
+delisted; they are moved to the archive collection (expired by a TTL index)
+so the live collection and its indexes only hold current deals. Archived
+products keep their ``_id``, and MongoPipeline restores it when a product
+comes back, so favorites, top-deals entries and product links stay valid.
+"""
+import datetime
+import logging
+
+from pymongo import ASCENDING, DeleteMany, ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def new_generation():
+    """Generation id for a crawl, sortable by start time"""
+    return datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+
+
+def ensure_archive_indexes(archive, retention_days):
+    archive.create_index([("archived_at", ASCENDING)], name="archived_at_ttl",
+                         expireAfterSeconds=int(retention_days * 86400))
+    archive.create_index([("url", ASCENDING)], name="url_unique", unique=True)
+    archive.create_index([("brand", ASCENDING)])
+
+
+def sweep_stale(col, archive, brand, generation, max_fraction=0.5):
+    """Move ``brand`` products not stamped with ``generation`` from ``col`` to ``archive``.
+
+    Refuses to sweep when more than ``max_fraction`` of the brand's products
+    would go, which usually means the crawl was partial rather than that the
+    brand delisted most of its catalog. Returns a summary dict.
+    """
+    stale_query = {"brand": brand, "crawl_generation": {"$ne": generation}}
+    total = col.count_documents({"brand": brand})
+    stale = col.count_documents(stale_query)
+    summary = {"brand": brand, "generation": generation, "total": total, "stale": stale, "archived": 0}
+
+    if not stale:
+        return summary
+    if stale > total * max_fraction:
+        summary["skipped"] = f"{stale}/{total} stale exceeds max fraction {max_fraction}"
+        logger.warning("Not sweeping %s: %s", brand, summary["skipped"])
+        return summary
+
+    archived_at = datetime.datetime.utcnow()
+
+    def flush(docs):
+        ops = []
+        for doc in docs:
+            doc = dict(doc, archived_at=archived_at, archived_generation=generation)
+            # An older archive entry of the url may carry another _id; the unique url index allows one
+            ops.append(DeleteMany({"url": doc["url"], "_id": {"$ne": doc["_id"]}}))
+            ops.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+        archive.bulk_write(ops, ordered=True)
+        # Re-check the generation so a product re-seen meanwhile stays live
+        result = col.delete_many({"_id": {"$in": [d["_id"] for d in docs]}, "crawl_generation": {"$ne": generation}})
+        summary["archived"] += result.deleted_count
+
+    batch = []
+    for doc in col.find(stale_query).batch_size(BATCH_SIZE):
+        if not isinstance(doc.get("url"), str):
+            continue
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    logger.info("Archived %d stale %s products (generation %s)", summary["archived"], brand, generation)
+    return summary
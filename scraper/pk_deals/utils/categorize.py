@@ -1,9 +1,18 @@
 import re
 
+# Every product is stored with one of these genders (see normalize_gender)
+GENDERS = ("men", "women", "kids", "unisex", "other")
+
+# Words that mark a gender in titles, tags, collection hints and stored values.
+# detect_gender prefers kids, so "boys kurta" is not filed under men.
 GENDER_MAP = {
-    "men": ["men", "male", "gents", "boys"],
-    "women": ["women", "female", "ladies", "girls", "woman", "lady"],
+    "kids": ["kids", "kid", "children", "child", "youth", "junior", "juniors", "boys", "boy",
+             "girls", "girl", "baby", "babies", "infant", "toddler"],
+    "women": ["women", "womens", "woman", "female", "ladies", "lady"],
+    "men": ["men", "mens", "man", "male", "gents", "gent"],
+    "unisex": ["unisex"],
 }
+_GENDER_WORDS = {word: gender for gender, words in GENDER_MAP.items() for word in words}
 
 TYPE_KEYWORDS = {
     "sweater": ["sweater", "sweat", "cardigan", "pullover"],
@@ -23,12 +32,25 @@ TYPE_KEYWORDS = {
 def normalize(s: str) -> str:
     return re.sub(r"\s+", " ", s or "").strip().lower()
 
+def _words(text):
+    # "men's" -> "men", "t-shirt" -> "t", "shirt"
+    return re.findall(r"[a-z]+", normalize(text).replace("'s", ""))
+
 def detect_gender(*texts):
-    blob = normalize(" ".join(t for t in texts if t))
-    for gender, keys in GENDER_MAP.items():
-        if any(k in blob for k in keys):
+    """Gender named by whole words in the texts; men and women both named means unisex"""
+    found = {_GENDER_WORDS[w] for w in _words(" ".join(t for t in texts if t)) if w in _GENDER_WORDS}
+    for gender in ("kids", "unisex"):
+        if gender in found:
             return gender
-    return None
+    if found == {"men", "women"}:
+        return "unisex"
+    return found.pop() if found else None
+
+def normalize_gender(value):
+    """One of GENDERS for a stored gender or collection hint ("Men", "Ladies", "boys", None, ...)"""
+    if isinstance(value, str) and value.strip().lower() in GENDERS:
+        return value.strip().lower()
+    return detect_gender(value if isinstance(value, str) else "") or "other"
 
 def detect_type(*texts):
     blob = normalize(" ".join(t for t in texts if t))
@@ -50,4 +72,23 @@ def detect_type(*texts):
         return "dress"
     if "frock" in blob:
         return "dress"
-    return None
\ No newline at end of file
+    return None
+
+# Canonical category vocabulary: the detect_type types, "pants" from its fallback, and "other"
+CATEGORIES = tuple(TYPE_KEYWORDS) + ("pants", "other")
+
+def normalize_category(value):
+    """One of CATEGORIES for a stored category or type hint ("Sweaters", "Kurti", None, ...)"""
+    if not isinstance(value, str):
+        return "other"
+    text = normalize(value)
+    if text in CATEGORIES:
+        return text
+    return detect_type(text) or "other"
+
+def normalize_labels(gender, category, title=None, tags=None):
+    """(gender, category) as stored: a missing gender is detected from the title and tags first"""
+    if not gender:
+        words = [title] + [t for t in tags or [] if isinstance(t, str)]
+        gender = detect_gender(*[w for w in words if isinstance(w, str)])
+    return normalize_gender(gender), normalize_category(category)
@@ -0,0 +1,38 @@
+import re
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+# Rendered widths (px) for each view; the API picks one per endpoint
+IMAGE_WIDTHS = {
+    "thumb": 160,   # search suggestions, favorites strip
+    "card": 480,    # listing grid and carousels (2x of a ~240px card)
+    "detail": 1080, # product page
+}
+
+# Legacy Shopify size suffixes: name_600x.jpg, name_600x800.jpg, name_x800@2x.jpg
+_SIZE_SUFFIX = re.compile(r"_(\d+x\d*|x\d+)(@\dx)?(?=\.[A-Za-z0-9]+$)")
+
+
+def is_shopify_image(url):
+    p = urlparse(url)
+    # cdn.shopify.com, or a storefront's own domain proxy at /cdn/shop/...
+    return p.netloc == "cdn.shopify.com" or p.path.startswith("/cdn/shop/")
+
+
+def shopify_image_url(url, width):
+    """Shopify CDN URL resized to ``width`` with the ``width=`` query parameter"""
+    if url.startswith("//"):
+        url = "https:" + url
+    p = urlparse(url)
+    path = _SIZE_SUFFIX.sub("", p.path)
+    query = [(k, v) for k, v in parse_qsl(p.query, keep_blank_values=True) if k not in ("width", "height", "crop")]
+    query.append(("width", str(width)))
+    return urlunparse(p._replace(path=path, query=urlencode(query)))
+
+
+def image_variants(url):
+    """{thumb, card, detail} URLs for a product image; non-Shopify URLs are used as-is"""
+    if not url:
+        return None
+    if not is_shopify_image(url):
+        return {name: url for name in IMAGE_WIDTHS}
+    return {name: shopify_image_url(url, width) for name, width in IMAGE_WIDTHS.items()}
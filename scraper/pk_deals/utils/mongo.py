@@ -0,0 +1,18 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def get_mongo_uri():
+    return os.getenv("MONGO_URI", "mongodb://127.0.0.1:27017")
+
+
+def get_mongo_db():
+    # Prefer DB_NAME, fallback to MONGO_DB for backward compatibility
+    return os.getenv("DB_NAME") or os.getenv("MONGO_DB") or "fwd_project"
+
+
+def get_mongo_collection():
+    return os.getenv("MONGO_COLLECTION", "products")
@@ -0,0 +1,218 @@
+import json
+import re
+
+from parsel import Selector
+
+# application/ld+json blocks, found with one regex pass instead of a DOM query
+_LD_JSON = re.compile(
+    r"<script[^>]*type=[\"']application/ld\+json[\"'][^>]*>(.*?)</script>",
+    re.IGNORECASE | re.DOTALL,
+)
+
+MAX_REVIEWS = 10
+# Widget HTML parsed after a vendor's marker; badges are small, review lists are not
+BADGE_WINDOW = 8 * 1024
+REVIEWS_WINDOW = 128 * 1024
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _ld_nodes(data):
+    """Every dict in a JSON-LD document, including @graph members and nested values, in document order"""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            yield node
+            stack.extend(reversed([v for v in node.values() if isinstance(v, (dict, list))]))
+
+
+def _from_json_ld(text):
+    """(rating, review_count, reviews) from the first aggregateRating in the page's JSON-LD"""
+    if "application/ld+json" not in text:
+        return None
+    for block in _LD_JSON.findall(text):
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        for node in _ld_nodes(data):
+            agg = node.get("aggregateRating")
+            if not isinstance(agg, dict):
+                continue
+            rating = _to_float(agg.get("ratingValue"))
+            if not rating:
+                continue
+            count = _to_int(agg.get("reviewCount") or agg.get("ratingCount"))
+            reviews = []
+            raw = node.get("review") or []
+            for r in raw if isinstance(raw, list) else [raw]:
+                if not isinstance(r, dict):
+                    continue
+                author = r.get("author")
+                if isinstance(author, dict):
+                    author = author.get("name")
+                score = _to_float((r.get("reviewRating") or {}).get("ratingValue"))
+                if author and score is not None:
+                    reviews.append({
+                        "author": str(author).strip(),
+                        "rating": score,
+                        "text": (r.get("reviewBody") or "").strip(),
+                        "date": r.get("datePublished"),
+                    })
+            return rating, count, reviews
+    return None
+
+
+def _find_class(text, class_name):
+    """Offset of the first tag whose attributes mention ``class_name``, or -1.
+
+    Plain substring search; hits inside theme CSS or scripts are skipped
+    because the text since the last ``<`` is not inside an open tag.
+    """
+    pos = text.find(class_name)
+    while pos != -1:
+        start = text.rfind("<", 0, pos)
+        if start != -1 and ">" not in text[start:pos] and "class" in text[start:pos]:
+            return start
+        pos = text.find(class_name, pos + len(class_name))
+    return -1
+
+
+def _widget(text, class_name, window):
+    """Selector over the HTML starting at the element that carries ``class_name``, or None"""
+    start = _find_class(text, class_name)
+    if start == -1:
+        return None
+    return Selector(text=text[start:start + window])
+
+
+def _judgeme(response):
+    rating = response.css(".jdgm-prev-badge__stars::attr(data-score)").get()
+    count = response.css(".jdgm-prev-badge__text::text").re_first(r"(\d+)")
+    return _to_float(rating), _to_int(count)
+
+
+def _yotpo(response):
+    rating = response.css(".yotpo-bottomline .text-m::text").get()
+    count = response.css(".yotpo-bottomline .text-m::text").re_first(r"(\d+)")
+    return _to_float(rating), _to_int(count)
+
+
+def _stamped(response):
+    rating = response.css(".stamped-product-reviews-badge::attr(data-rating)").get()
+    count = response.css(".stamped-product-reviews-badge::attr(data-count)").get()
+    return _to_float(rating), _to_int(count)
+
+
+def _loox(response):
+    rating = response.css(".loox-rating::attr(data-rating)").get()
+    count = response.css(".loox-rating::attr(data-count)").get()
+    return _to_float(rating), _to_int(count)
+
+
+def _spr(response):
+    rating = response.css(".spr-badge-starrating::attr(aria-label)").re_first(r"([\d.]+)")
+    count = response.css(".spr-badge-caption::text").re_first(r"(\d+)")
+    return _to_float(rating), _to_int(count)
+
+
+# (page marker, extractor) in the order vendors were historically tried
+VENDORS = [
+    ("jdgm-prev-badge", _judgeme),
+    ("yotpo-bottomline", _yotpo),
+    ("stamped-product-reviews-badge", _stamped),
+    ("loox-rating", _loox),
+    ("spr-badge", _spr),
+]
+JUDGEME_FIELDS = ("jdgm-rev__author", "jdgm-rev__rating", "jdgm-rev__body", "jdgm-rev__timestamp")
+
+
+def _first_text(el):
+    """First text node directly under ``el``, like ``::text`` followed by ``.get()``"""
+    if el.text:
+        return el.text
+    for child in el:
+        if child.tail:
+            return child.tail
+    return None
+
+
+def _judgeme_reviews(widget):
+    reviews = []
+    for rev in widget.css(".jdgm-rev"):
+        # One walk over the review's elements instead of a selector query per field
+        fields = {}
+        for el in rev.root.iter():
+            for token in (el.get("class") or "").split():
+                if token in JUDGEME_FIELDS and token not in fields:
+                    fields[token] = el
+        author = _first_text(fields["jdgm-rev__author"]) if "jdgm-rev__author" in fields else None
+        rating = fields.get("jdgm-rev__rating")
+        score = _to_float(rating.get("data-score")) if rating is not None else None
+        if author and score is not None:
+            body = _first_text(fields["jdgm-rev__body"]) if "jdgm-rev__body" in fields else None
+            stamp = fields.get("jdgm-rev__timestamp")
+            reviews.append({
+                "author": author.strip(),
+                "rating": score,
+                "text": body.strip() if body else "",
+                "date": stamp.get("data-content") if stamp is not None else None,
+            })
+            if len(reviews) >= MAX_REVIEWS:
+                break
+    return reviews
+
+
+def extract_reviews(response):
+    """Rating, review count and up to 10 reviews from a Shopify product page.
+
+    Reads JSON-LD ``aggregateRating`` when the page has it; otherwise detects
+    the review app from a class marker in the raw HTML and runs only that
+    vendor's selectors (Judge.me, Yotpo, Stamped.io, Loox, Shopify Product
+    Reviews) over the widget's own HTML instead of the whole page DOM.
+    """
+    text = response.text
+    rating, count, reviews = None, 0, []
+
+    found = _from_json_ld(text)
+    if found:
+        rating, count, reviews = found
+    else:
+        for marker, extract in VENDORS:
+            widget = _widget(text, marker, BADGE_WINDOW)
+            if widget is None:
+                continue
+            rating, count = extract(widget)
+            if not rating:
+                # Badge larger than the window: fall back to the full page
+                rating, count = extract(response)
+            if rating:
+                break
+            rating, count = None, 0
+
+    # Judge.me renders individual reviews in its widget; JSON-LD often carries only the aggregate
+    if not reviews:
+        widget = _widget(text, "jdgm-rev", REVIEWS_WINDOW)
+        if widget is not None:
+            reviews = _judgeme_reviews(widget)
+
+    return {
+        "rating": rating,
+        "review_count": count,
+        "reviews": reviews[:MAX_REVIEWS] or None,
+    }
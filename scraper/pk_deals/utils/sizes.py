@@ -0,0 +1,71 @@
+import re
+
+# Normalized size codes, in display order. backend/sizes.py mirrors this table.
+SIZE_ORDER = ["XXS", "XS", "S", "M", "L", "XL", "XXL", "3XL", "4XL", "5XL", "FREE"]
+
+SIZE_ALIASES = {
+    "XXS": "XXS", "2XS": "XXS",
+    "XS": "XS", "X-SMALL": "XS", "EXTRA SMALL": "XS",
+    "S": "S", "SM": "S", "SMALL": "S",
+    "M": "M", "MED": "M", "MEDIUM": "M",
+    "L": "L", "LG": "L", "LARGE": "L",
+    "XL": "XL", "X-LARGE": "XL", "EXTRA LARGE": "XL",
+    "XXL": "XXL", "2XL": "XXL", "XX-LARGE": "XXL",
+    "XXXL": "3XL", "3XL": "3XL",
+    "XXXXL": "4XL", "4XL": "4XL",
+    "5XL": "5XL",
+    "FREE": "FREE", "FREE SIZE": "FREE", "FREESIZE": "FREE", "ONE SIZE": "FREE", "ONESIZE": "FREE",
+    "OS": "FREE", "STANDARD": "FREE",
+}
+
+_AGE_RANGE = re.compile(r"(\d{1,2})\s*-\s*(\d{1,2})\s*(?:Y|YR|YRS|YEAR|YEARS)")
+_AGE = re.compile(r"(\d{1,2})\s*(?:Y|YR|YRS|YEAR|YEARS)")
+_NUMERIC = re.compile(r"W?(\d{2})")
+
+
+def normalize_size(text):
+    """Size code for a variant title like "M", "Medium", "Black / XL" or "32"; None if there is none"""
+    if not text:
+        return None
+    # Option values are joined with " / " in Shopify variant titles
+    for part in re.split(r"\s*[/|]\s*", str(text)):
+        p = part.strip().upper()
+        if p in SIZE_ALIASES:
+            return SIZE_ALIASES[p]
+        m = _AGE_RANGE.fullmatch(p)
+        if m:
+            return f"{int(m.group(1))}-{int(m.group(2))}Y"
+        m = _AGE.fullmatch(p)
+        if m:
+            return f"{int(m.group(1))}Y"
+        m = _NUMERIC.fullmatch(p)
+        if m and 22 <= int(m.group(1)) <= 50:  # waist / numeric sizes
+            return m.group(1)
+    return None
+
+
+def size_sort_key(code):
+    if code in SIZE_ORDER:
+        return (0, SIZE_ORDER.index(code), "")
+    digits = re.match(r"\d+", code)
+    return (1, int(digits.group()) if digits else 0, code)
+
+
+def available_sizes(variants):
+    """Sorted distinct size codes that have at least one in-stock variant"""
+    codes = {normalize_size(v.get("size")) for v in variants or [] if v.get("in_stock")}
+    codes.discard(None)
+    return sorted(codes, key=size_sort_key)
+
+
+def slim_variants(variants, price):
+    """Drop per-variant fields the site never reads; price only when it differs from the product's"""
+    slim = []
+    for v in variants or []:
+        out = {"size": v.get("size"), "in_stock": bool(v.get("in_stock"))}
+        if v.get("price") and v.get("price") != price:
+            out["price"] = v["price"]
+        if v.get("inventory_quantity"):
+            out["inventory_quantity"] = v["inventory_quantity"]
+        slim.append(out)
+    return slim
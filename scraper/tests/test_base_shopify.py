@@ -0,0 +1,61 @@
+from scrapy.utils.test import get_crawler
+
+from pk_deals.spiders.base_shopify import ShopifyCollectionSpider
+
+DOMAIN = "https://outfitters.com.pk"
+URL = DOMAIN + "/products/polo"
+
+
+def _spider():
+    return ShopifyCollectionSpider.from_crawler(get_crawler(ShopifyCollectionSpider))
+
+
+def _seen(gender_hint=None, type_hint=None, gender=None, category="shirt"):
+    return {"gender_hints": [gender_hint] if gender_hint else [], "type_hint": type_hint,
+            "gender": gender or gender_hint, "category": category, "discounted": True}
+
+
+def test_merge_hints_same_gender_in_another_spelling_is_not_unisex():
+    seen = _seen("Women")
+    assert _spider().merge_hints(seen, "women", None) is False
+    assert seen["gender_hints"] == ["Women"]
+    assert seen["gender"] == "Women"
+
+
+def test_merge_hints_different_genders_make_unisex():
+    seen = _seen("men")
+    assert _spider().merge_hints(seen, "Women", None) is True
+    assert seen["gender"] == "unisex"
+    assert seen["gender_hints"] == ["men", "Women"]
+    # A third listing under an already-seen gender changes nothing
+    assert _spider().merge_hints(seen, "MEN", None) is False
+
+
+def test_merge_hints_first_type_hint_wins():
+    seen = _seen("men", category="shirt")
+    assert _spider().merge_hints(seen, None, "polo") is True
+    assert seen["category"] == "polo"
+    assert _spider().merge_hints(seen, None, "tee") is False
+    assert seen["category"] == "polo"
+
+
+def _product():
+    return {
+        "title": "Basic Polo", "handle": "polo", "tags": ["Sale"],
+        "images": [{"src": "https://cdn.shopify.com/s/files/polo.jpg"}],
+        "variants": [{"title": "M", "price": "1500", "compare_at_price": "3000", "available": True, "id": 1}],
+    }
+
+
+def test_product_in_overlapping_collections_is_built_once_with_merged_hints():
+    spider = _spider()
+    first = list(spider.product_items_from_shopify(_product(), DOMAIN, "Outfitters", "men", None, "men-sale"))
+    again = list(spider.product_items_from_shopify(_product(), DOMAIN, "Outfitters", "Men", None, "new-in"))
+    other = list(spider.product_items_from_shopify(_product(), DOMAIN, "Outfitters", "women", None, "women-sale"))
+
+    # One review request for the first listing; later listings only merge into the pending item
+    assert len(first) == 1 and first[0].url == URL
+    assert again == [] and other == []
+    item = spider.take_item(URL)
+    assert item["gender"] == "unisex"
+    assert item["discount_percent"] == 50
@@ -0,0 +1,77 @@
+import io
+import json
+import os
+from argparse import Namespace
+
+import mongomock
+import pytest
+
+from pk_deals import bulk_import
+from pk_deals.bulk_import import Checkpoint, import_feed, iter_json_array, iter_records
+
+
+def _args(**overrides):
+    args = dict(batch_size=2, workers=2, no_checkpoint=False, jsonl_out=None)
+    args.update(overrides)
+    return Namespace(**args)
+
+
+def test_iter_json_array_across_chunk_boundaries(monkeypatch):
+    monkeypatch.setattr(bulk_import, "READ_CHUNK", 3)
+    records = [{"title": "a, [b]", "price": 1}, {"title": "c\"]", "tags": ["x", "y"]}, [], 7]
+    text = "  \n[ " + " ,\n ".join(json.dumps(r) for r in records) + " ]\n"
+    assert list(iter_json_array(io.StringIO(text))) == records
+
+
+def test_iter_json_array_empty_and_malformed():
+    assert list(iter_json_array(io.StringIO(" [ ] "))) == []
+    assert list(iter_json_array(io.StringIO(""))) == []
+    with pytest.raises(ValueError, match="not a JSON array"):
+        list(iter_json_array(io.StringIO('{"title": "x"}')))
+    with pytest.raises(ValueError, match="missing"):
+        list(iter_json_array(io.StringIO('[{"a": 1}, {"b": 2}')))
+
+
+def test_iter_records_detects_json_lines(tmp_path):
+    path = tmp_path / "feed.jsonl"
+    path.write_text('{"a": 1}\n\n{"a": 2}\n')
+    assert list(iter_records(str(path))) == [{"a": 1}, {"a": 2}]
+
+
+def test_checkpoint_advances_only_over_contiguous_batches(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "feed.checkpoint"), str(tmp_path / "feed.json"))
+    checkpoint.finished(10, 20)
+    checkpoint.finished(20, 30)
+    assert checkpoint.done == 0
+    checkpoint.finished(0, 10)
+    assert checkpoint.done == 30
+    checkpoint.save()
+
+    assert Checkpoint(str(tmp_path / "feed.checkpoint"), str(tmp_path / "feed.json")).done == 30
+    # A checkpoint left by another feed is not resumed from
+    assert Checkpoint(str(tmp_path / "feed.checkpoint"), str(tmp_path / "other.json")).done == 0
+
+
+def _record(i):
+    return {
+        "title": f"Lawn Kurta {i}", "brand": "Bonanza Satrangi", "price": 1000 + i,
+        "original_price": 2000 + i, "url": f"https://bonanzasatrangi.com/products/p{i}",
+        "source": "bonanzasatrangi.com", "gender": "women", "category": "kurta",
+    }
+
+
+def test_import_feed_resumes_from_checkpoint(tmp_path):
+    feed = tmp_path / "feed.json"
+    feed.write_text(json.dumps([_record(i) for i in range(7)]))
+    saved = Checkpoint(str(feed) + ".checkpoint", str(feed))
+    saved.finished(0, 4)
+    saved.save()
+
+    col = mongomock.MongoClient().db.products
+    stats, drops = import_feed(str(feed), col, _args())
+
+    assert stats["resumed_from"] == 4
+    assert stats["read"] == 3
+    assert sorted(d["title"] for d in col.find()) == ["Lawn Kurta 4", "Lawn Kurta 5", "Lawn Kurta 6"]
+    # A finished import leaves no checkpoint behind, so the next run starts over
+    assert not os.path.exists(str(feed) + ".checkpoint")
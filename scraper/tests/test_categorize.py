@@ -0,0 +1,41 @@
+from pk_deals.utils.categorize import detect_gender, normalize_category, normalize_gender, normalize_labels
+
+
+def test_detect_gender_whole_words():
+    assert detect_gender("Women's Lawn Kurta") == "women"  # not men, though "women" contains it
+    assert detect_gender("Menswear Edit") is None
+    assert detect_gender("Mens Polo") == "men"
+    assert detect_gender("Ladies", "Summer") == "women"
+
+
+def test_detect_gender_kids_and_unisex():
+    assert detect_gender("Boys Kurta") == "kids"
+    assert detect_gender("Girls Frock", "women") == "kids"
+    assert detect_gender("Men & Women Tee") == "unisex"
+    assert detect_gender("Unisex Hoodie") == "unisex"
+    assert detect_gender(None, "") is None
+
+
+def test_normalize_gender():
+    assert normalize_gender(" Women ") == "women"
+    assert normalize_gender("Gents") == "men"
+    assert normalize_gender("Accessories") == "other"
+    assert normalize_gender(None) == "other"
+
+
+def test_normalize_category():
+    assert normalize_category("Sweaters") == "sweater"
+    assert normalize_category("Kurti") == "kurta"
+    assert normalize_category("T-Shirt") == "t-shirt"
+    assert normalize_category("Cargo Pant") == "pants"
+    assert normalize_category("pants") == "pants"
+    assert normalize_category("Fragrance") == "other"
+    assert normalize_category("") == "other"
+    assert normalize_category(None) == "other"
+
+
+def test_normalize_labels_detects_missing_gender():
+    assert normalize_labels(None, "Kurti", "Boys Embroidered Kurta", ["new"]) == ("kids", "kurta")
+    assert normalize_labels("", None, "Lawn Suit", ["Women", 3]) == ("women", "other")
+    assert normalize_labels("Men", "Jeans", "Girls Jeans") == ("men", "jeans")
+    assert normalize_labels(None, None) == ("other", "other")
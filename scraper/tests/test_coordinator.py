@@ -0,0 +1,175 @@
+import datetime
+
+import mongomock
+import pytest
+from scrapy.utils.project import get_project_settings
+
+from pk_deals import coordinator
+from pk_deals.coordinator import (
+    claim_unit, enqueue_refresh, finalize_refresh, reap_expired, release_unit, renew_lease, settle_unit,
+)
+
+LEASE = 60
+MAX_ATTEMPTS = 2
+BRANDS = [
+    {"key": "outfitters", "brand": "Outfitters", "platform": "shopify",
+     "collections": [{"url": "https://outfitters.com.pk/collections/men"},
+                     {"url": "https://outfitters.com.pk/collections/women"}]},
+    {"key": "khaadi", "brand": "Khaadi", "platform": "shopify", "collections": [{"url": "https://pk.khaadi.com/sale"}]},
+]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = datetime.datetime(2025, 9, 1, 12, 0)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += datetime.timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(coordinator, "utcnow", clock)
+    return clock
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().db
+
+
+def _enqueue(db, clock, **kwargs):
+    generation = enqueue_refresh(db.crawl_jobs, db.crawl_refreshes, BRANDS, generation="g1", **kwargs)
+    clock.advance(1)
+    return generation
+
+
+def test_units_are_claimed_oldest_first_and_once(db, clock):
+    _enqueue(db, clock)
+    first = claim_unit(db.crawl_jobs, "w1", LEASE, MAX_ATTEMPTS)
+    second = claim_unit(db.crawl_jobs, "w2", LEASE, MAX_ATTEMPTS)
+    assert {first["key"], second["key"]} == {"outfitters", "khaadi"}
+    assert first["status"] == "running" and first["worker"] == "w1" and first["attempts"] == 1
+    assert first["lease_expires_at"] == clock.now + datetime.timedelta(seconds=LEASE)
+    assert claim_unit(db.crawl_jobs, "w3", LEASE, MAX_ATTEMPTS) is None
+
+
+def test_per_collection_refresh_has_a_unit_per_collection(db, clock):
+    _enqueue(db, clock, per_collection=True)
+    assert sorted(u["_id"] for u in db.crawl_jobs.find()) == ["g1:khaadi:0", "g1:outfitters:0", "g1:outfitters:1"]
+    assert db.crawl_refreshes.find_one({"_id": "g1"})["partial"] is False
+
+    enqueue_refresh(db.crawl_jobs, db.crawl_refreshes, BRANDS, generation="g2", only={"outfitters": [1]})
+    assert db.crawl_refreshes.find_one({"_id": "g2"})["partial"] is True
+    assert [u["_id"] for u in db.crawl_jobs.find({"generation": "g2"})] == ["g2:outfitters:1", "g2:khaadi"]
+
+
+def test_heartbeats_keep_the_lease(db, clock):
+    _enqueue(db, clock, only={"outfitters": [0]})
+    unit = claim_unit(db.crawl_jobs, "w1", LEASE, MAX_ATTEMPTS)
+    clock.advance(LEASE - 1)
+    assert renew_lease(db.crawl_jobs, unit["_id"], "w1", LEASE) is True
+    clock.advance(LEASE - 1)
+    # Still leased: not claimable by another worker
+    assert claim_unit(db.crawl_jobs, "w2", LEASE, MAX_ATTEMPTS)["key"] == "khaadi"
+    assert claim_unit(db.crawl_jobs, "w2", LEASE, MAX_ATTEMPTS) is None
+
+
+def test_expired_lease_is_reclaimed_and_the_old_worker_is_fenced_off(db, clock):
+    _enqueue(db, clock)
+    db.crawl_jobs.delete_one({"key": "khaadi"})
+    unit = claim_unit(db.crawl_jobs, "w1", LEASE, MAX_ATTEMPTS)
+    clock.advance(LEASE + 1)
+
+    reclaimed = claim_unit(db.crawl_jobs, "w2", LEASE, MAX_ATTEMPTS)
+    assert reclaimed["_id"] == unit["_id"]
+    assert (reclaimed["worker"], reclaimed["attempts"]) == ("w2", 2)
+    # The first worker's heartbeat and result no longer apply
+    assert renew_lease(db.crawl_jobs, unit["_id"], "w1", LEASE) is False
+    assert settle_unit(db.crawl_jobs, unit, "w1", True, {}, None, MAX_ATTEMPTS) is None
+    assert settle_unit(db.crawl_jobs, reclaimed, "w2", True, {"items": 3}, None, MAX_ATTEMPTS) == "done"
+
+
+def test_failed_units_are_retried_until_attempts_run_out(db, clock):
+    _enqueue(db, clock)
+    db.crawl_jobs.delete_one({"key": "khaadi"})
+    unit = claim_unit(db.crawl_jobs, "w1", LEASE, MAX_ATTEMPTS)
+    assert settle_unit(db.crawl_jobs, unit, "w1", False, {}, "exit code 1", MAX_ATTEMPTS) == "queued"
+    unit = claim_unit(db.crawl_jobs, "w1", LEASE, MAX_ATTEMPTS)
+    assert unit["attempts"] == MAX_ATTEMPTS
+    assert settle_unit(db.crawl_jobs, unit, "w1", False, {}, "exit code 1", MAX_ATTEMPTS) == "failed"
+    assert claim_unit(db.crawl_jobs, "w1", LEASE, MAX_ATTEMPTS) is None
+
+
+def test_reap_fails_expired_units_on_their_last_attempt(db, clock):
+    _enqueue(db, clock)
+    first = claim_unit(db.crawl_jobs, "w1", LEASE, MAX_ATTEMPTS)
+    claim_unit(db.crawl_jobs, "w2", LEASE, MAX_ATTEMPTS)
+    clock.advance(LEASE + 1)
+    # Both leases expired, but each unit has an attempt left: reclaimable, not reaped
+    assert reap_expired(db.crawl_jobs, MAX_ATTEMPTS) == []
+    again = claim_unit(db.crawl_jobs, "w3", LEASE, MAX_ATTEMPTS)
+    assert again["_id"] == first["_id"]
+    clock.advance(LEASE + 1)
+
+    assert reap_expired(db.crawl_jobs, MAX_ATTEMPTS) == ["g1"]
+    reaped = db.crawl_jobs.find_one({"_id": first["_id"]})
+    assert (reaped["status"], reaped["error"]) == ("failed", "lease expired")
+    assert db.crawl_jobs.find_one({"_id": {"$ne": first["_id"]}})["status"] == "running"
+
+
+def test_release_does_not_count_the_attempt(db, clock):
+    _enqueue(db, clock)
+    unit = claim_unit(db.crawl_jobs, "w1", LEASE, MAX_ATTEMPTS)
+    release_unit(db.crawl_jobs, unit, "w1")
+    released = db.crawl_jobs.find_one({"_id": unit["_id"]})
+    assert (released["status"], released["attempts"]) == ("queued", 0)
+    assert "worker" not in released and "lease_expires_at" not in released
+
+
+def _products(db, generation="g1"):
+    db.products.insert_many(
+        [{"brand": brand, "url": f"https://{brand}/p{i}", "crawl_generation": generation, "discount_percent": 20}
+         for brand in ("Outfitters", "Khaadi") for i in range(4)]
+        + [{"brand": brand, "url": f"https://{brand}/old", "crawl_generation": "g0", "discount_percent": 20}
+           for brand in ("Outfitters", "Khaadi")]
+    )
+
+
+def test_refresh_finalizes_once_after_every_unit_settles(db, clock):
+    settings = get_project_settings()
+    _products(db)
+    _enqueue(db, clock)
+    units = [claim_unit(db.crawl_jobs, "w1", LEASE, MAX_ATTEMPTS) for _ in range(2)]
+
+    settle_unit(db.crawl_jobs, units[0], "w1", True, {}, None, MAX_ATTEMPTS)
+    assert finalize_refresh(db, "g1", settings) is None
+    assert db.crawl_refreshes.find_one({"_id": "g1"})["status"] == "running"
+
+    settle_unit(db.crawl_jobs, units[1], "w1", True, {}, None, MAX_ATTEMPTS)
+    summary = finalize_refresh(db, "g1", settings)
+    assert sorted(s["brand"] for s in summary["sweeps"]) == ["Khaadi", "Outfitters"]
+    assert sorted(d["url"] for d in db.products_archive.find()) == ["https://Khaadi/old", "https://Outfitters/old"]
+    assert db.crawl_refreshes.find_one({"_id": "g1"})["status"] == "done"
+    assert db.top_deals.count_documents({}) > 0
+    # A second worker settling late does not finalize again
+    assert finalize_refresh(db, "g1", settings) is None
+
+
+def test_brand_with_a_failed_unit_is_not_swept(db, clock):
+    settings = get_project_settings()
+    _products(db)
+    _enqueue(db, clock)
+    for ok in (True, False):
+        unit = claim_unit(db.crawl_jobs, "w1", LEASE, 1)
+        settle_unit(db.crawl_jobs, unit, "w1", ok, {}, None if ok else "exit code 1", 1)
+    failed = db.crawl_jobs.find_one({"status": "failed"})["brand"]
+
+    summary = finalize_refresh(db, "g1", settings)
+    assert summary["unswept"] == [failed]
+    assert [s["brand"] for s in summary["sweeps"]] == [b for b in ("Outfitters", "Khaadi") if b != failed]
+    assert db.products.count_documents({"brand": failed}) == 5
@@ -0,0 +1,55 @@
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.test import get_crawler
+from twisted.python.failure import Failure
+
+from pk_deals.extensions import CrawlReport
+from pk_deals.signals import mongo_write
+from pk_deals.spiders.base_shopify import ShopifyCollectionSpider
+
+DOMAIN = "https://outfitters.com.pk"
+
+
+def _product(handle):
+    return {
+        "title": "Basic Polo", "handle": handle, "tags": ["Sale"],
+        "images": [{"src": f"https://cdn.shopify.com/s/files/{handle}.jpg"}],
+        "variants": [{"title": "M", "price": "1500", "compare_at_price": "3000", "available": True, "id": 1}],
+    }
+
+
+def _failure(request):
+    failure = Failure(IgnoreRequest("html request budget spent"))
+    failure.request = request  # as Scrapy attaches it before calling the errback
+    return failure
+
+
+def test_items_from_the_errback_are_counted_per_collection():
+    crawler = get_crawler(ShopifyCollectionSpider, {"CRAWL_REPORT_ENABLED": True})
+    crawler.spider = spider = ShopifyCollectionSpider.from_crawler(crawler)
+    report = CrawlReport.from_crawler(crawler)
+
+    for handle in ("polo", "tee"):
+        [request] = spider.product_items_from_shopify(_product(handle), DOMAIN, "Outfitters", "men", None, "men-sale")
+        failure = _failure(request)
+        for item in request.errback(failure):
+            crawler.signals.send_catch_log(mongo_write, item=item, spider=spider, duration=0.01, changed=True)
+            # Scrapy passes the Failure as the response of items an errback yields
+            results = crawler.signals.send_catch_log(signals.item_scraped, item=item, response=failure, spider=spider)
+            assert not any(isinstance(r, Failure) for _, r in results)
+
+    bucket = report.collections[("Outfitters", "men-sale")]
+    assert (bucket.items, bucket.changed) == (2, 2)
+    assert report.brands["Outfitters"].items == 2
+
+
+def test_dropped_errback_items_count_their_reason():
+    crawler = get_crawler(ShopifyCollectionSpider, {"CRAWL_REPORT_ENABLED": True})
+    crawler.spider = spider = ShopifyCollectionSpider.from_crawler(crawler)
+    report = CrawlReport.from_crawler(crawler)
+
+    [request] = spider.product_items_from_shopify(_product("polo"), DOMAIN, "Outfitters", "men", None, "men-sale")
+    failure = _failure(request)
+    [item] = request.errback(failure)
+    report.item_dropped(item, failure, ValueError("Missing price"), spider)
+    assert report.collections[("Outfitters", "men-sale")].drops == {"Missing price": 1}
@@ -0,0 +1,30 @@
+from urllib.parse import parse_qs, urlparse
+
+from pk_deals.utils.images import image_variants, is_shopify_image, shopify_image_url
+
+
+def test_shopify_variants_use_width_parameter():
+    variants = image_variants("https://cdn.shopify.com/s/files/1/0872/files/WUS25P3358_1.jpg?v=1756206896")
+    assert set(variants) == {"thumb", "card", "detail"}
+    card = urlparse(variants["card"])
+    assert card.path == "/s/files/1/0872/files/WUS25P3358_1.jpg"
+    assert parse_qs(card.query) == {"v": ["1756206896"], "width": ["480"]}
+    assert parse_qs(urlparse(variants["thumb"]).query)["width"] == ["160"]
+    assert parse_qs(urlparse(variants["detail"]).query)["width"] == ["1080"]
+
+
+def test_legacy_size_suffix_and_old_resize_params_are_replaced():
+    url = shopify_image_url("//cdn.shopify.com/s/files/1/products/shirt_600x800@2x.png?width=2000&crop=center", 160)
+    assert url == "https://cdn.shopify.com/s/files/1/products/shirt.png?width=160"
+
+
+def test_storefront_cdn_proxy_is_resized():
+    assert is_shopify_image("https://www.outfitters.com.pk/cdn/shop/files/F0123.jpg")
+    assert image_variants("https://www.outfitters.com.pk/cdn/shop/files/F0123.jpg")["thumb"].endswith("?width=160")
+
+
+def test_other_hosts_are_used_as_is():
+    url = "https://images.example.com/p/1.jpg?w=300"
+    assert image_variants(url) == {"thumb": url, "card": url, "detail": url}
+    assert image_variants(None) is None
+    assert image_variants("") is None
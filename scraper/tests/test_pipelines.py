@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import mongomock
+import pytest
+from scrapy.utils.project import get_project_settings
+from scrapy.utils.test import get_crawler
+
+from pk_deals import pipelines
+from pk_deals.pipelines import MongoPipeline
+from pk_deals.sweep import sweep_stale
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(pipelines, "MongoClient", lambda *args, **kwargs: client)
+    return client.scratch
+
+
+def _closed_crawl(mongo, spider):
+    """Four live Outfitters products; this crawl (generation g2) did not see the last one"""
+    mongo.products.insert_many([
+        {"url": f"https://outfitters.com.pk/products/p{i}", "brand": "Outfitters", "title": f"p{i}",
+         "gender": "men", "category": "shirt", "crawl_generation": "g1" if i == 3 else "g2"}
+        for i in range(4)
+    ])
+    crawler = get_crawler(settings_dict=get_project_settings().copy_to_dict())
+    pipeline = MongoPipeline(mongo_db="scratch", mongo_collection="products", crawler=crawler)
+    pipeline.generation = "g2"
+    pipeline.brands_seen = {"Outfitters"}
+    pipeline.spider_closed(spider, "finished")
+
+
+def _spider(**attrs):
+    return SimpleNamespace(logger=SimpleNamespace(info=lambda *a: None, warning=lambda *a: None), **attrs)
+
+
+def test_full_crawl_sweeps_and_ranks(mongo):
+    _closed_crawl(mongo, _spider(collection_indexes=None))
+    assert mongo.products.count_documents({}) == 3
+    assert mongo.products_archive.find_one()["title"] == "p3"
+    assert mongo.top_deals.find_one({"_id": "all:all"}) is not None
+
+
+def test_subset_crawl_leaves_other_collections_alone(mongo):
+    _closed_crawl(mongo, _spider(collection_indexes=[0]))
+    assert mongo.products.count_documents({}) == 4
+    assert mongo.products_archive.count_documents({}) == 0
+    assert mongo.top_deals.count_documents({}) == 0
+
+
+def test_product_back_from_the_archive_keeps_its_id(mongo, monkeypatch):
+    # mongomock has no capped collections
+    monkeypatch.setattr(pipelines, "ensure_events_collection", lambda db, name, size: db[name])
+    crawler = get_crawler(settings_dict=get_project_settings().copy_to_dict())
+    pipeline = MongoPipeline(mongo_db="scratch", mongo_collection="products", crawler=crawler)
+    item = {"url": "https://outfitters.com.pk/products/p0", "brand": "Outfitters", "title": "p0",
+            "discount_percent": 30}
+
+    _closed_crawl(mongo, _spider(collection_indexes=None))  # archives p3
+    archived = mongo.products_archive.find_one()
+    assert mongo.products_archive.count_documents({"url": archived["url"]}) == 1
+
+    spider = _spider(generation="g3")
+    pipeline.open_spider(spider)
+    live_id = mongo.products.find_one({"url": item["url"]})["_id"]
+    pipeline.process_item(dict(item), spider)
+    pipeline.process_item(dict(item, url=archived["url"], title="p3"), spider)
+    pipeline.process_item(dict(item, url="https://outfitters.com.pk/products/new"), spider)
+
+    assert mongo.products.find_one({"url": item["url"]})["_id"] == live_id
+    assert mongo.products.find_one({"url": archived["url"]})["_id"] == archived["_id"]
+    events = {e["product_id"]: e["type"] for e in mongo.deal_events.find()}
+    new_id = mongo.products.find_one({"url": "https://outfitters.com.pk/products/new"})["_id"]
+    assert events == {live_id: "deeper", archived["_id"]: "new", new_id: "new"}
+
+    # Archived again by a later sweep: the entry is replaced, not duplicated
+    mongo.products.update_many({"url": {"$ne": archived["url"]}}, {"$set": {"crawl_generation": "g4"}})
+    sweep_stale(mongo.products, mongo.products_archive, "Outfitters", "g4")
+    assert [d["_id"] for d in mongo.products_archive.find({"url": archived["url"]})] == [archived["_id"]]
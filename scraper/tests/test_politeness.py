@@ -0,0 +1,110 @@
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+from scrapy import Request
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import Response
+
+from pk_deals import politeness
+from pk_deals.politeness import AdaptivePolitenessMiddleware
+
+DEFAULTS = {"concurrency": 4, "delay": 0.5, "html_concurrency": 4, "html_delay": 0.5}
+
+
+class _Stats:
+    def __init__(self):
+        self.values = Counter()
+
+    def inc_value(self, key, count=1):
+        self.values[key] += count
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(politeness.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def mw():
+    downloader = SimpleNamespace(per_slot_settings={}, slots={})
+    crawler = SimpleNamespace(stats=_Stats(), engine=SimpleNamespace(downloader=downloader))
+    return AdaptivePolitenessMiddleware(crawler, DEFAULTS, target_latency=2.0, ramp_after=3, max_delay=30.0)
+
+
+def _spider(**config):
+    return SimpleNamespace(politeness=config)
+
+
+def _send(mw, spider, kind="json", status=200, latency=0.2, headers=None):
+    request = Request("https://www.limelight.pk/products.json", meta={"kind": kind, "download_latency": latency})
+    mw.process_request(request, spider)
+    # The downloader creates the slot from per_slot_settings on the first request
+    slots = mw.crawler.engine.downloader.slots
+    if request.meta["download_slot"] not in slots:
+        saved = mw.crawler.engine.downloader.per_slot_settings[request.meta["download_slot"]]
+        slots[request.meta["download_slot"]] = SimpleNamespace(**saved)
+    mw.process_response(request, Response(request.url, status=status, headers=headers), spider)
+    return slots[request.meta["download_slot"]]
+
+
+def test_lanes_per_kind_from_brand_config(mw):
+    spider = _spider(concurrency=8, delay=0.25, html_concurrency=2, html_delay=1.5)
+    json_slot = _send(mw, spider, "json")
+    html_slot = _send(mw, spider, "html")
+    assert (json_slot.concurrency, json_slot.delay) == (8, 0.25)
+    assert (html_slot.concurrency, html_slot.delay) == (2, 1.5)
+    assert set(mw.lanes) == {"www.limelight.pk:json", "www.limelight.pk:html"}
+
+
+def test_overload_halves_concurrency_and_doubles_delay_once_per_window(mw, clock):
+    spider = _spider(concurrency=8, delay=0.25)
+    slot = _send(mw, spider)
+    _send(mw, spider, status=503)
+    assert (slot.concurrency, slot.delay) == (4, 0.5)
+    # Other responses already in flight report the same overload
+    _send(mw, spider, status=503)
+    assert (slot.concurrency, slot.delay) == (4, 0.5)
+    clock[0] += 1.5
+    _send(mw, spider, status=429, headers={"Retry-After": "10"})
+    assert (slot.concurrency, slot.delay) == (2, 10.0)
+    assert mw.stats.values["politeness/backoff"] == 2
+
+
+def test_network_errors_back_off(mw, clock):
+    spider = _spider(concurrency=4, delay=1.0)
+    slot = _send(mw, spider)
+    request = Request("https://www.limelight.pk/products.json", meta={"download_slot": "www.limelight.pk:json"})
+    mw.process_exception(request, TimeoutError(), spider)
+    assert (slot.concurrency, slot.delay) == (2, 2.0)
+    assert mw.stats.values["politeness/backoff/TimeoutError"] == 1
+
+
+def test_healthy_runs_ramp_back_to_the_configured_ceiling(mw, clock):
+    spider = _spider(concurrency=4, delay=0.5)
+    slot = _send(mw, spider)
+    _send(mw, spider, status=500)
+    assert (slot.concurrency, slot.delay) == (2, 1.0)
+    # A slow response breaks the healthy run
+    _send(mw, spider)
+    _send(mw, spider, latency=5.0)
+    _send(mw, spider)
+    _send(mw, spider)
+    assert slot.concurrency == 2
+    _send(mw, spider)
+    assert (slot.concurrency, slot.delay) == (3, 0.75)
+    for _ in range(30):
+        _send(mw, spider)
+    assert (slot.concurrency, slot.delay) == (4, 0.5)
+
+
+def test_budget_skips_only_review_pages(mw):
+    spider = _spider(budget=2)
+    _send(mw, spider, "json")
+    _send(mw, spider, "html")
+    with pytest.raises(IgnoreRequest):
+        mw.process_request(Request("https://www.limelight.pk/products/a", meta={"kind": "html"}), spider)
+    mw.process_request(Request("https://www.limelight.pk/products.json?page=2", meta={"kind": "json"}), spider)
+    assert mw.stats.values["politeness/budget_skipped"] == 1
@@ -0,0 +1,153 @@
+import pytest
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+from twisted.python.failure import Failure
+
+from pk_deals.product_store import MemoryProductStore, SQLiteProductStore, open_product_store
+from pk_deals.spiders.base_shopify import ShopifyCollectionSpider
+
+DOMAIN = "https://outfitters.com.pk"
+
+
+def _product(handle):
+    return {
+        "title": f"Polo {handle}", "handle": handle, "tags": ["Sale"],
+        "images": [{"src": f"https://cdn.shopify.com/s/files/{handle}.jpg"}],
+        "variants": [{"title": "M", "price": "1500", "compare_at_price": "3000", "available": True, "id": 1}],
+    }
+
+
+def _spider(jobdir, **kwargs):
+    crawler = get_crawler(ShopifyCollectionSpider, {"JOBDIR": str(jobdir)} if jobdir else {})
+    crawler.stats.open_spider(None)
+    return ShopifyCollectionSpider.from_crawler(crawler, **kwargs)
+
+
+def _failure(request):
+    failure = Failure(ConnectionRefusedError())
+    failure.request = request
+    return failure
+
+
+def _reviewed(request):
+    """Items the spider yields for a fetched review page"""
+    response = HtmlResponse(request.url, body=b"<html><body>No reviews</body></html>", request=request)
+    return list(request.callback(response, **request.cb_kwargs))
+
+
+def test_open_product_store(tmp_path):
+    assert isinstance(open_product_store(None), MemoryProductStore)
+    store = open_product_store(str(tmp_path / "job"))
+    assert isinstance(store, SQLiteProductStore)
+    assert (tmp_path / "job" / "products.sqlite").exists()
+    store.close()
+
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_store_keeps_state_and_hands_out_items_once(tmp_path, persistent):
+    store = SQLiteProductStore(str(tmp_path / "p.sqlite")) if persistent else MemoryProductStore()
+    store.add("u1", {"gender": "men"}, {"url": "u1", "brand": "Outfitters", "price": 1500.0})
+    store.add("u2", {"gender": "women"})
+    store.update_state("u1", {"gender": "unisex"})
+    store.update_item("u1", {"gender": "unisex"})
+
+    assert store.seen("u1") == {"gender": "unisex"}
+    assert store.seen("u3") is None
+    assert (store.has_item("u1"), store.has_item("u2"), store.has_item("u3")) == (True, False, False)
+    assert store.take_item("u1") == {"url": "u1", "brand": "Outfitters", "price": 1500.0, "gender": "unisex"}
+    assert store.take_item("u1") is None
+    assert store.has_item("u1") is False
+    assert store.seen("u1") == {"gender": "unisex"}  # the state outlives the item for dedup
+    store.close()
+
+
+def test_sqlite_store_survives_a_restart(tmp_path):
+    path = str(tmp_path / "p.sqlite")
+    store = SQLiteProductStore(path)
+    for url in ("u1", "u2", "u3"):
+        store.add(url, {"collection": "men-sale"}, {"url": url, "brand": "Outfitters"})
+    store.mark_fetching("u2")
+    store.mark_fetching("u3")
+    store.take_item("u3")
+    store.set_meta("generation", "g1")
+    store.set_meta("listing:men-sale", {"page": 2, "done": False})
+    store.close()
+
+    store = SQLiteProductStore(path)
+    assert store.get_meta("generation") == "g1"
+    assert store.get_meta("listing:men-sale") == {"page": 2, "done": False}
+    assert store.get_meta("missing") is None
+    # Taken off the queue but never finished, or every pending item when the queue is gone
+    assert store.pending_fetches() == [("u2", {"collection": "men-sale"}, "Outfitters")]
+    assert sorted(url for url, _, _ in store.pending_fetches(all_pending=True)) == ["u1", "u2"]
+    assert store.take_item("u2") == {"url": "u2", "brand": "Outfitters"}
+    assert store.pending_fetches(all_pending=True)[0][0] == "u1"
+    store.close()
+
+
+def _killed_crawl(jobdir):
+    """A crawl killed with p0 written, p1 being fetched and p2 still queued; returns its requests"""
+    spider = _spider(jobdir)
+    requests = {}
+    for handle in ("p0", "p1", "p2"):
+        [request] = spider.product_items_from_shopify(_product(handle), DOMAIN, "Outfitters", "men", None, "men-sale")
+        requests[handle] = request
+    assert [item["title"] for item in _reviewed(requests["p0"])] == ["Polo p0"]
+    spider.review_page_started(requests["p1"], spider)
+    spider.close_product_store(spider)
+    return spider, requests
+
+
+def test_resume_with_restored_queue_yields_each_pending_item_once(tmp_path):
+    first, requests = _killed_crawl(tmp_path)
+
+    spider = _spider(tmp_path)
+    assert spider.resumed is True
+    assert spider.generation == first.generation
+    # The in-flight request is re-issued; the queued one comes back from the disk queue
+    reissued = list(spider.resume_review_requests())
+    assert [r.url for r in reissued] == [requests["p1"].url]
+    assert spider.crawler.stats.get_value("products/resumed_review_requests") == 1
+    restored = requests["p2"].replace(callback=spider.parse_product_reviews, errback=spider.product_page_failed)
+
+    titles = [item["title"] for r in reissued + [restored] for item in _reviewed(r)]
+    assert titles == ["Polo p1", "Polo p2"]
+    # A request Scrapy also restored for p1 finds its item gone instead of writing it twice
+    assert _reviewed(reissued[0]) == []
+    assert spider.crawler.stats.get_value("products/missing_pending_item") == 1
+    spider.close_product_store(spider)
+
+
+def test_resume_after_a_lost_queue_rebuilds_every_pending_review(tmp_path):
+    _, requests = _killed_crawl(tmp_path)
+
+    spider = _spider(tmp_path)
+    reissued = list(spider.resume_review_requests(rebuild=True))
+    assert sorted(r.url for r in reissued) == [requests["p1"].url, requests["p2"].url]
+    assert all(r.meta == {"brand": "Outfitters", "collection": "men-sale", "kind": "html"} for r in reissued)
+    # Failing pages still hand over their item, once
+    items = [item for r in reissued for item in r.errback(_failure(r))]
+    assert sorted(item["title"] for item in items) == ["Polo p1", "Polo p2"]
+    assert list(spider.resume_review_requests(rebuild=True)) == []
+    spider.close_product_store(spider)
+
+
+def test_rebuilt_listing_continues_after_the_last_parsed_page(tmp_path):
+    spider = _spider(tmp_path)
+    spider.products.set_meta("listing:men-sale", {"page": 2, "done": False})
+    spider.products.set_meta("listing:new-in", {"page": 1, "done": True})
+    collections = [{"handle": "men-sale"}, {"handle": "new-in"}, {"handle": "kids"}, {"handle": "men-sale"}]
+    urls = [r.url for r in spider.add_collection_requests(DOMAIN, collections, "Outfitters", rebuild=True)]
+    assert urls == [f"{DOMAIN}/collections/men-sale/products.json?limit=250&page=3",
+                    f"{DOMAIN}/collections/kids/products.json?limit=250&page=1"]
+    spider.close_product_store(spider)
+
+
+def test_generation_argument_wins_over_the_stored_one(tmp_path):
+    _spider(tmp_path, generation="g1").close_product_store(None)
+    spider = _spider(tmp_path, generation="g2")
+    assert spider.generation == "g2"
+    spider.close_product_store(None)
+    spider = _spider(tmp_path)
+    assert spider.generation == "g2"
+    spider.close_product_store(None)
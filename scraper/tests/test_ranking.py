@@ -0,0 +1,66 @@
+import datetime
+
+import mongomock
+
+from pk_deals.ranking import deal_score, list_keys, materialize_top_deals
+
+NOW = datetime.datetime(2025, 9, 1, 12, 0)
+
+
+def _doc(**overrides):
+    doc = {
+        "price": 3000, "original_price": 6000, "discount_percent": 50,
+        "variants": [{"in_stock": True}, {"in_stock": False}],
+        "rating": 4.5, "review_count": 20, "last_seen_at": NOW,
+    }
+    doc.update(overrides)
+    return doc
+
+
+def test_deal_score_is_bounded():
+    best = _doc(discount_percent=100, price=0, original_price=50000, variants=[{"in_stock": True}],
+                rating=5, review_count=10 ** 6)
+    worst = _doc(discount_percent=0, price=100, original_price=100, variants=[{"in_stock": False}],
+                 rating=0.01, review_count=10 ** 6, last_seen_at=None)
+    assert 99 < deal_score(best, NOW) <= 100
+    assert 0 <= deal_score(worst, NOW) < 1
+
+
+def test_deeper_discount_bigger_saving_and_more_stock_rank_higher():
+    base = deal_score(_doc(), NOW)
+    assert deal_score(_doc(discount_percent=70), NOW) > base
+    assert deal_score(_doc(price=1000), NOW) > base
+    assert deal_score(_doc(variants=[{"in_stock": True}] * 2), NOW) > base
+
+
+def test_freshness_halves_every_half_life():
+    fresh = deal_score(_doc(), NOW)
+    stale = deal_score(_doc(last_seen_at=NOW - datetime.timedelta(hours=72)), NOW)
+    unseen = deal_score(_doc(last_seen_at=None, scraped_at=None), NOW)
+    assert round(fresh - stale, 3) == round(stale - unseen, 3) == 5.0
+
+
+def test_ratings_with_few_reviews_count_for_less():
+    assert deal_score(_doc(review_count=1), NOW) < deal_score(_doc(review_count=100), NOW)
+    # No rating is neutral, between a poor and a good one
+    assert deal_score(_doc(rating=1, review_count=100), NOW) < deal_score(_doc(rating=None), NOW) \
+        < deal_score(_doc(rating=5, review_count=100), NOW)
+
+
+def test_list_keys_cover_every_segment():
+    assert list_keys({"gender": "Women", "category": None}) == ("women:other", "women:all", "all:other", "all:all")
+
+
+def test_materialize_top_deals_keeps_best_per_list():
+    db = mongomock.MongoClient().db
+    db.products.insert_many([
+        _doc(title=f"p{i}", gender="women", category="kurta", discount_percent=10 * i) for i in range(5)
+    ] + [_doc(title="m", gender="men", category="shirt", discount_percent=90)])
+    db.top_deals.insert_one({"_id": "kids:all", "computed_at": NOW - datetime.timedelta(days=1), "products": []})
+
+    assert materialize_top_deals(db.products, db.top_deals, size=3) == 7
+    kurtas = db.top_deals.find_one({"_id": "women:kurta"})["products"]
+    assert [p["title"] for p in kurtas] == ["p4", "p3", "p2"]
+    assert db.top_deals.find_one({"_id": "all:all"})["products"][0]["title"] == "m"
+    # Lists of segments that no longer have products are removed
+    assert db.top_deals.find_one({"_id": "kids:all"}) is None
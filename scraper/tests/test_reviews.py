@@ -0,0 +1,124 @@
+import json
+
+from scrapy.http import HtmlResponse
+
+from pk_deals.utils import reviews
+from pk_deals.utils.reviews import extract_reviews
+
+URL = "https://outfitters.com.pk/products/polo"
+
+
+def _page(body, head=""):
+    html = f"<html><head>{head}</head><body><h1>Basic Polo</h1>{body}</body></html>"
+    return HtmlResponse(URL, body=html.encode(), encoding="utf-8")
+
+
+def _ld(data):
+    return f'<script type="application/ld+json">{json.dumps(data)}</script>'
+
+
+def test_json_ld_product_with_reviews():
+    product = {
+        "@type": "Product", "name": "Basic Polo",
+        "aggregateRating": {"@type": "AggregateRating", "ratingValue": "4.5", "reviewCount": "12"},
+        "review": [
+            {"author": {"name": " Ayesha "}, "reviewRating": {"ratingValue": 5},
+             "reviewBody": " Great fit ", "datePublished": "2026-09-01"},
+            {"author": "Bilal", "reviewRating": {"ratingValue": "4"}},
+            {"author": "No rating"},
+        ],
+    }
+    assert extract_reviews(_page("", _ld(product))) == {
+        "rating": 4.5,
+        "review_count": 12,
+        "reviews": [
+            {"author": "Ayesha", "rating": 5.0, "text": "Great fit", "date": "2026-09-01"},
+            {"author": "Bilal", "rating": 4.0, "text": "", "date": None},
+        ],
+    }
+
+
+def test_json_ld_graph_takes_the_first_rating_in_document_order():
+    graph = {"@context": "https://schema.org", "@graph": [
+        {"@type": "Product", "name": "Basic Polo",
+         "aggregateRating": {"ratingValue": 4.8, "ratingCount": 120}},
+        {"@type": "Product", "name": "Related Tee",
+         "aggregateRating": {"ratingValue": 3.1, "reviewCount": 2}},
+    ]}
+    page = _page("", '<script type="application/ld+json">not json</script>' + _ld(graph))
+    assert extract_reviews(page) == {"rating": 4.8, "review_count": 120, "reviews": None}
+
+
+def test_json_ld_without_a_rating_falls_back_to_the_widget():
+    page = _page('<div class="loox-rating" data-rating="4.2" data-count="9"></div>',
+                 _ld({"@type": "Product", "aggregateRating": {"ratingValue": 0}}))
+    assert extract_reviews(page)["rating"] == 4.2
+
+
+def test_judgeme_badge_and_reviews():
+    body = """
+    <div class="jdgm-prev-badge"><span class="jdgm-prev-badge__stars" data-score="4.67"></span>
+      <span class="jdgm-prev-badge__text">3 reviews</span></div>
+    <div class="jdgm-rev-widg">
+      <div class="jdgm-rev"><span class="jdgm-rev__rating" data-score="5"></span>
+        <span class="jdgm-rev__timestamp" data-content="2026-08-30"></span>
+        <span class="jdgm-rev__author"> Sara </span><div class="jdgm-rev__body">Soft</div></div>
+      <div class="jdgm-rev"><span class="jdgm-rev__rating" data-score="4"></span>
+        <span class="jdgm-rev__author">Omar</span></div>
+      <div class="jdgm-rev"><span class="jdgm-rev__author">No score</span></div>
+    </div>"""
+    assert extract_reviews(_page(body)) == {
+        "rating": 4.67,
+        "review_count": 3,
+        "reviews": [
+            {"author": "Sara", "rating": 5.0, "text": "Soft", "date": "2026-08-30"},
+            {"author": "Omar", "rating": 4.0, "text": "", "date": None},
+        ],
+    }
+
+
+def test_judgeme_reviews_are_capped():
+    rev = '<div class="jdgm-rev"><span class="jdgm-rev__rating" data-score="5"></span>' \
+          '<span class="jdgm-rev__author">A</span></div>'
+    assert len(extract_reviews(_page(rev * 15))["reviews"]) == reviews.MAX_REVIEWS
+
+
+def test_yotpo_badge():
+    body = '<div class="yotpo-bottomline"><span class="text-m">4.3</span></div>'
+    assert extract_reviews(_page(body))["rating"] == 4.3
+
+
+def test_stamped_badge():
+    body = '<span class="stamped-product-reviews-badge" data-rating="3.9" data-count="41"></span>'
+    assert extract_reviews(_page(body))["rating"] == 3.9
+    assert extract_reviews(_page(body))["review_count"] == 41
+
+
+def test_loox_badge():
+    body = '<div class="loox-rating" data-rating="4.9" data-count="7"></div>'
+    assert (extract_reviews(_page(body))["rating"], extract_reviews(_page(body))["review_count"]) == (4.9, 7)
+
+
+def test_shopify_product_reviews_badge():
+    body = '<span class="spr-badge"><span class="spr-badge-starrating" aria-label="4.0 of 5 stars"></span>' \
+           '<span class="spr-badge-caption">Based on 15 reviews</span></span>'
+    assert extract_reviews(_page(body)) == {"rating": 4.0, "review_count": 15, "reviews": None}
+
+
+def test_no_reviews():
+    assert extract_reviews(_page("<p>No reviews yet</p>")) == {"rating": None, "review_count": 0, "reviews": None}
+
+
+def test_find_class_skips_css_and_scripts():
+    text = "<style>.loox-rating { color: red }</style><script>var c = 'loox-rating';</script>" \
+           '<div id="x" class="loox-rating" data-rating="4"></div>'
+    assert reviews._find_class(text, "loox-rating") == text.index('<div id="x"')
+    assert reviews._find_class("<style>.loox-rating {}</style>", "loox-rating") == -1
+
+
+def test_badge_larger_than_the_window_falls_back_to_the_full_page(monkeypatch):
+    monkeypatch.setattr(reviews, "BADGE_WINDOW", 64)
+    body = '<div class="stamped-product-reviews-badge-wrapper">' + "<i></i>" * 20 + "</div>" \
+           '<span class="stamped-product-reviews-badge" data-rating="4.4" data-count="18"></span>'
+    assert extract_reviews(_page(body))["rating"] == 4.4
+    assert extract_reviews(_page(body))["review_count"] == 18
@@ -0,0 +1,82 @@
+import datetime
+
+import mongomock
+from scrapy.utils.project import get_project_settings
+
+from pk_deals.scheduler import Scheduler, next_interval
+
+HOUR = 3600
+NOW = datetime.datetime(2025, 9, 1, 12, 0)
+
+
+def test_interval_tracks_target_change_ratio():
+    # Changing exactly the target ratio keeps the interval
+    assert next_interval(4 * HOUR, 0.10, 0.10, HOUR, 24 * HOUR) == 4 * HOUR
+    # Busier than the target: crawl sooner, quieter: crawl later
+    assert next_interval(4 * HOUR, 0.16, 0.10, HOUR, 24 * HOUR) == 2.5 * HOUR
+    assert next_interval(4 * HOUR, 0.08, 0.10, HOUR, 24 * HOUR) == 5 * HOUR
+
+
+def test_interval_moves_at_most_one_step_per_run():
+    assert next_interval(4 * HOUR, 0.9, 0.10, HOUR, 24 * HOUR) == 2 * HOUR
+    assert next_interval(4 * HOUR, 0.0, 0.10, HOUR, 24 * HOUR) == 8 * HOUR
+
+
+def test_interval_stays_within_bounds():
+    assert next_interval(1.5 * HOUR, 0.9, 0.10, HOUR, 24 * HOUR) == HOUR
+    assert next_interval(20 * HOUR, 0.0, 0.10, HOUR, 24 * HOUR) == 24 * HOUR
+
+
+def _scheduler():
+    db = mongomock.MongoClient().db
+    return db, Scheduler(db, get_project_settings())
+
+
+def _state(scheduler, collections=2):
+    cfg = {"key": "outfitters", "brand": "Outfitters",
+           "collections": [{"url": f"https://outfitters.com.pk/collections/c{i}"} for i in range(collections)]}
+    state = scheduler.sync(cfg, NOW)
+    state["inflight"] = {"generation": "g1", "collections": list(range(collections)), "partial": False, "at": NOW}
+    return state
+
+
+def test_collect_waits_for_pending_units():
+    db, scheduler = _scheduler()
+    state = _state(scheduler)
+    db.crawl_jobs.insert_many([
+        {"generation": "g1", "status": "done", "collections": [0], "result": {"items": 100, "changed": 5}},
+        {"generation": "g1", "status": "running", "collections": [1]},
+    ])
+    assert scheduler.collect(state, NOW) is False
+    assert state["inflight"] is not None
+
+
+def test_collect_learns_per_collection_change_ratios():
+    db, scheduler = _scheduler()
+    state = _state(scheduler)
+    state["collections"][1]["change_ratio"] = 0.5
+    db.crawl_jobs.insert_many([
+        {"generation": "g1", "status": "done", "collections": [0], "result": {"items": 100, "changed": 2}},
+        {"generation": "g1", "status": "done", "collections": [1], "result": {"items": 100, "changed": 30}},
+    ])
+    default = scheduler.default_interval
+
+    assert scheduler.collect(state, NOW) is True
+    quiet, busy = state["collections"]
+    assert quiet["change_ratio"] == 0.02
+    # Averaged with the previous ratio
+    assert busy["change_ratio"] == 0.4
+    assert quiet["interval_seconds"] > default > busy["interval_seconds"]
+    assert quiet["next_run_at"] == NOW + datetime.timedelta(seconds=quiet["interval_seconds"])
+    assert state["inflight"] is None and state["last_full_at"] == NOW
+
+
+def test_failed_refreshes_pause_the_brand():
+    db, scheduler = _scheduler()
+    state = _state(scheduler, collections=1)
+    state["consecutive_failures"] = scheduler.pause_after - 1
+    db.crawl_jobs.insert_one({"generation": "g1", "status": "failed", "collections": [0]})
+
+    assert scheduler.collect(state, NOW) is True
+    assert state["paused_until"] == NOW + scheduler.pause
+    assert scheduler.due_collections(state, NOW) == ([], False)
@@ -0,0 +1,39 @@
+from pk_deals.utils.sizes import available_sizes, normalize_size
+
+
+def test_letter_sizes_and_aliases():
+    assert normalize_size("M") == "M"
+    assert normalize_size("medium") == "M"
+    assert normalize_size("X-Large") == "XL"
+    assert normalize_size("XXXL") == "3XL"
+    assert normalize_size("One Size") == "FREE"
+
+
+def test_variant_titles_with_other_options():
+    assert normalize_size("Black / XL") == "XL"
+    assert normalize_size("32 | Blue") == "32"
+    assert normalize_size("Red / Cotton") is None
+
+
+def test_numeric_and_age_sizes():
+    assert normalize_size("W34") == "34"
+    assert normalize_size("12") is None  # outside the waist/numeric range
+    assert normalize_size("5-6 Years") == "5-6Y"
+    assert normalize_size("07 yrs") == "7Y"
+
+
+def test_empty_values():
+    assert normalize_size(None) is None
+    assert normalize_size("") is None
+
+
+def test_available_sizes_only_in_stock_in_display_order():
+    variants = [
+        {"size": "XL", "in_stock": True},
+        {"size": "Small", "in_stock": True},
+        {"size": "M", "in_stock": False},
+        {"size": "Black / s", "in_stock": True},
+        {"size": "34", "in_stock": True},
+        {"size": "Unknown", "in_stock": True},
+    ]
+    assert available_sizes(variants) == ["S", "XL", "34"]